@@ -0,0 +1,3 @@
+"""
+Benchmarks of life_recorder, see `benchmarks.run`.
+"""
@@ -0,0 +1,92 @@
+"""
+Module that generates synthetic journals used by the benchmarks.
+
+Records look like the ones people write: a handful of tags that are used
+most of the time, short titles and contents of mostly a few sentences with
+an occasional long entry, written a few times a day over the years.
+"""
+
+import argparse
+import random
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from life_recorder.helper import TIMESTAMP_FORMAT
+from life_recorder.storage import get_storage
+
+TAGS = (
+    "", "work", "family", "health", "idea", "travel", "reading", "sport",
+    "food", "music", "friends", "money", "home", "learning", "mood",
+    "project", "garden", "movie", "dream", "gratitude",
+)  # fmt: skip
+WORDS = (
+    "morning evening walk coffee meeting call friend park book chapter "
+    "train station city rain sun wind quiet loud happy tired long short "
+    "plan idea note list garden dinner lunch breakfast run swim bike "
+    "office code review bug release family mother father sister brother "
+    "trip hotel flight ticket museum concert song album movie series "
+    "dream sleep early late week month year today tomorrow yesterday "
+    "remember forget write read learn teach think feel said thought "
+    "the a and of to in on with for at from about after before again"
+).split()
+START = datetime(2015, 1, 1, 7, 0)
+
+
+def generate_records(count: int, seed: int = 0) -> Iterator[dict[str, str]]:
+    """Yields count records with sequential identifiers and timestamps."""
+    generator = random.Random(seed)
+    # Tag popularity follows Zipf's law, the empty tag being most popular.
+    tag_weights = [1 / rank for rank in range(1, len(TAGS) + 1)]
+    moment = START
+    for number in range(1, count + 1):
+        moment += timedelta(minutes=generator.randint(30, 12 * 60))
+        title_words = generator.randint(2, 8)
+        # Content length is log-normal: mostly a few sentences, with a long
+        # tail of entries that run over a few pages.
+        content_words = min(int(generator.lognormvariate(3.5, 1.0)), 5000)
+        yield {
+            "id": f"lr-{number}",
+            "timestamp": moment.strftime(TIMESTAMP_FORMAT),
+            "tag": generator.choices(TAGS, tag_weights)[0],
+            "title": " ".join(
+                generator.choices(WORDS, k=title_words)
+            ).capitalize(),
+            "content": " ".join(generator.choices(WORDS, k=content_words)),
+        }
+
+
+def write_database(
+    path: Path, count: int, storage: str = "json", seed: int = 0
+) -> Path:
+    """Write a database of count generated records with the storage."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    backend = get_storage(storage)(path)
+    backend.init()
+    backend.save(
+        {
+            "last_id": count,
+            "records": {
+                record["id"]: record
+                for record in generate_records(count, seed)
+            },
+        }
+    )
+    backend.close()
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("count", type=int, help="number of records")
+    parser.add_argument("path", type=Path, help="database file to write")
+    parser.add_argument("--storage", default="json", help="storage backend")
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+    write_database(
+        arguments.path, arguments.count, arguments.storage, arguments.seed
+    )
+
+
+if __name__ == "__main__":
+    main()
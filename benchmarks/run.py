@@ -0,0 +1,261 @@
+"""
+Module that runs the benchmarks of `LifeRecorder` and the TUI against
+generated journals of several sizes and writes the results as JSON.
+
+Run it from the repository root, e.g.
+
+    poetry run python -m benchmarks.run --sizes 1000 100000
+
+and compare two runs with
+
+    poetry run python -m benchmarks.run --compare old.json new.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+
+from life_recorder import codec, config
+from life_recorder.base import LifeRecorder
+from life_recorder.storage import get_storage
+
+from .generate import write_database
+
+SIZES = (1_000, 10_000, 100_000)
+RESULTS_DIR = Path(__file__).parent / "results"
+THRESHOLD = 1.2
+
+Result = dict[str, float | int]
+"""Statistics of a benchmark in seconds, together with number of runs."""
+
+
+def measure(function: Callable[[], object], runs: int) -> Result:
+    """Returns statistics of the time function takes, over runs."""
+    times = []
+    for _ in range(runs):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        "runs": runs,
+        "min": times[0],
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "p95": times[min(len(times) - 1, int(len(times) * 0.95))],
+        "max": times[-1],
+    }
+
+
+def measure_tui(path: Path, storage: str, runs: int) -> Result:
+    """
+    Measure time from start of the TUI until it's idle with the first page
+    of notes painted, including opening the database.
+    """
+    from textual.widgets import ListView
+
+    from life_recorder import app
+
+    async def start() -> None:
+        # Opened the way the TUI opens its database by default.
+        life_recorder = LifeRecorder(
+            str(path), storage=storage, write_behind=True, lazy=True
+        )
+        tui = app.LifeRecorderApp(life_recorder)
+        async with tui.run_test(size=(160, 50)) as pilot:
+            await pilot.pause()
+            if not tui.query_one(ListView).children:
+                raise RuntimeError("TUI started without notes.")
+        life_recorder.close()
+
+    return measure(lambda: asyncio.run(start()), runs)
+
+
+def run_size(
+    size: int, directory: Path, storage: str, runs: int, operations: int
+) -> dict[str, Result]:
+    """Run all benchmarks against a journal of size records."""
+    # Every database gets a directory of its own, since some backends keep
+    # more than one file.
+    filename = Path(get_storage(storage).filename).name
+    generated = write_database(
+        directory / f"journal-{size}" / filename, size, storage
+    )
+    path = directory / f"life_records-{size}" / filename
+    shutil.copytree(generated.parent, path.parent)
+    generator = random.Random(size)
+    identifiers = [
+        f"lr-{generator.randint(1, size)}" for _ in range(operations)
+    ]
+    results = {}
+
+    def construct() -> None:
+        LifeRecorder(str(path), storage=storage).close()
+
+    results["construct"] = measure(construct, runs)
+
+    def construct_indexed() -> None:
+        # Indexes are built anew instead of loaded from their sidecars.
+        sidecars = [
+            path.with_name(path.name + suffix)
+            for suffix in (".search", ".query")
+        ]
+        for sidecar in sidecars:
+            sidecar.unlink(missing_ok=True)
+        life_recorder = LifeRecorder(str(path), storage=storage, indexed=True)
+        life_recorder.search_index, life_recorder.query_index
+        life_recorder.close()
+        for sidecar in sidecars:
+            sidecar.unlink(missing_ok=True)
+
+    results["construct_indexed"] = measure(construct_indexed, runs)
+
+    life_recorder = LifeRecorder(str(path), storage=storage)
+    results["read_all"] = measure(
+        lambda: [record["title"] for record in life_recorder.read().values()],
+        runs,
+    )
+    results["read_tag"] = measure(
+        lambda: life_recorder.read(tag="work", limit=50), runs
+    )
+    results["read_one"] = measure(
+        lambda: [life_recorder.read_one(i) for i in identifiers], runs
+    )
+
+    def read_one_lazy() -> None:
+        lazy = LifeRecorder(str(path), storage=storage, lazy=True)
+        lazy.read_one(identifiers[0])
+        lazy.close()
+
+    results["read_one_lazy"] = measure(read_one_lazy, runs)
+
+    note = {"tag": "benchmark", "title": "Title", "content": "Content."}
+    created = []
+    results["create"] = measure(
+        lambda: created.append(life_recorder.create(note)["id"]), operations
+    )
+    updates = iter(identifiers * runs)
+    results["update"] = measure(
+        lambda: life_recorder.update(next(updates), note), operations
+    )
+    deletes = iter(created)
+    results["delete"] = measure(
+        lambda: life_recorder.delete(next(deletes)), operations
+    )
+    life_recorder.close()
+
+    if storage != "sqlite":
+        shutil.rmtree(path.parent)
+        shutil.copytree(generated.parent, path.parent)
+        results["tui_first_paint"] = measure_tui(path, storage, runs)
+    return results
+
+
+def run(sizes: list[int], storage: str, runs: int, operations: int) -> dict:
+    """Run benchmarks for every size and return the report."""
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "json_library": codec.JSON_LIBRARY,
+        "database_format": config.DATABASE_FORMAT or "json",
+        "load_workers": config.LOAD_WORKERS,
+        "storage": storage,
+        "runs": runs,
+        "operations": operations,
+        "results": {},
+    }
+    workdir = Path.cwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            for size in sizes:
+                print(f"Benchmarking {size} records...", file=sys.stderr)
+                report["results"][str(size)] = run_size(
+                    size, Path(directory), storage, runs, operations
+                )
+        finally:
+            os.chdir(workdir)
+    return report
+
+
+def compare(old: dict, new: dict, threshold: float) -> list[str]:
+    """
+    Returns lines comparing median times of two reports, marking the
+    benchmarks that got slower than threshold times as regressions.
+    """
+    lines = []
+    for size, results in new["results"].items():
+        for name, result in results.items():
+            previous = old["results"].get(size, {}).get(name)
+            if previous is None:
+                continue
+            ratio = result["median"] / previous["median"]
+            mark = "  REGRESSION" if ratio > threshold else ""
+            lines.append(
+                f"{size:>9} {name:<16} {previous['median']:>10.4f}s "
+                f"{result['median']:>10.4f}s {ratio:>6.2f}x{mark}"
+            )
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=list(SIZES),
+        help="numbers of records in generated journals",
+    )  # fmt: skip
+    parser.add_argument("--storage", default="json", help="storage backend")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--operations", type=int, default=20,
+        help="number of creates, updates, deletes and reads of one record",
+    )  # fmt: skip
+    parser.add_argument("--output", type=Path, help="file to write results")
+    parser.add_argument(
+        "--compare", type=Path, nargs=2, metavar=("OLD", "NEW"),
+        help="compare two result files instead of running benchmarks",
+    )  # fmt: skip
+    parser.add_argument(
+        "--threshold", type=float, default=THRESHOLD,
+        help="slowdown ratio reported as a regression",
+    )  # fmt: skip
+    arguments = parser.parse_args()
+
+    if arguments.compare:
+        old, new = (json.loads(path.read_text()) for path in arguments.compare)
+        lines = compare(old, new, arguments.threshold)
+        print("\n".join(lines))
+        sys.exit(
+            1 if any(line.endswith("REGRESSION") for line in lines) else 0
+        )
+
+    report = run(
+        arguments.sizes,
+        arguments.storage,
+        arguments.runs,
+        arguments.operations,
+    )
+    output = arguments.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"{report['started'].replace(':', '-')}.json"
+    output.write_text(json.dumps(report, indent=4))
+    print(f"Results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import asyncio
+
 from textual.app import App, ComposeResult
 from textual.message import Message
 from textual.containers import (
@@ -18,12 +20,14 @@ from textual.widgets import (
     Input,
     Static,
 )
+from textual.css.query import NoMatches
 from textual.validation import Length
-from textual import log, on
+from textual.worker import Worker, WorkerState
+from textual import log, on, work
 
 from life_recorder.base import LifeRecorder
-
-DB = LifeRecorder()
+from life_recorder.feed import CREATED, DELETED, Change
+from life_recorder.render import render_cache
 
 
 class NoteForm(Static):
@@ -127,6 +131,7 @@ class NoteForm(Static):
         else:
             note = await self.create_note()
             self.post_message(self.Created(note))
+        self.app.schedule_save()
         await self.reset()
 
     async def validate_form(self):
@@ -179,7 +184,7 @@ class NoteForm(Static):
         log.info(f"Tag: {self.tag_input.value}")
         log.info(f"Title: {self.title_input.value}")
         log.info(f"Content: {self.content_input.value}")
-        note = DB.create(
+        note = self.app.db.create(
             {
                 "tag": self.tag_input.value,
                 "title": self.title_input.value,
@@ -197,7 +202,7 @@ class NoteForm(Static):
         log.info(f"Title: {self.title_input.value}")
         log.info(f"Content: {self.content_input.value}")
 
-        note = DB.update(
+        note = self.app.db.update(
             identifier=self.record_id,
             record={
                 "tag": self.tag_input.value,
@@ -247,11 +252,38 @@ class NoteForm(Static):
         content_error_label.styles.display = "none"
 
 
+class CachedMarkdownParser:
+    """
+    Markdown parser of the viewing pane that keeps parsed content of notes
+    in the render cache, so a note shown again isn't parsed again.
+    """
+
+    def __init__(self, pane: "ViewingPane"):
+        self.pane = pane
+        # Taken now, parsing happens later in a worker thread.
+        self.rendered = pane.rendered
+
+    def parse(self, markdown: str) -> list:
+        from markdown_it import MarkdownIt
+
+        def parse() -> tuple[str, list]:
+            return markdown, MarkdownIt("gfm-like").parse(markdown)
+
+        if self.rendered is None:
+            return parse()[1]
+        source, tokens = render_cache.get("markdown", *self.rendered, parse)
+        if source != markdown:
+            return parse()[1]
+        return tokens
+
+
 class ViewingPane(VerticalScroll):
     """A pane to view the details of a selected note."""
 
     def __init__(self, *args, **kwargs):
         self.record_id = kwargs.pop("record_id", "default")
+        self.rendered: tuple[str, int] | None = None
+        """Identifier and version of the note whose content is shown."""
         super().__init__(*args, **kwargs)
 
     def compose(self) -> ComposeResult:
@@ -261,7 +293,9 @@ class ViewingPane(VerticalScroll):
         yield Label("⏳ soon...", expand=True, id="note-timestamp")
         yield Rule()
         yield Markdown(
-            "\n\nNote details will be displayed here.", id="note-content"
+            "\n\nNote details will be displayed here.",
+            id="note-content",
+            parser_factory=lambda: CachedMarkdownParser(self),
         )
         with HorizontalGroup(id="note-view-actions"):
             yield Button(
@@ -274,6 +308,7 @@ class ViewingPane(VerticalScroll):
     def reset(self):
         """Reset the viewing pane to its default state."""
         self.record_id = "default"
+        self.rendered = None
         self.query_one("#note-title", Markdown).update("# Note View")
         self.query_one("#note-tag", Label).update("🏷️ new-note")
         self.query_one("#note-timestamp", Label).update("⏳ soon...")
@@ -288,14 +323,41 @@ class ViewingPane(VerticalScroll):
 class Notes(HorizontalScroll):
     BINDINGS = [("escape", "reset_view", "Reset the viewing pane")]
 
+    PAGE_SIZE = 50
+    """Number of notes mounted or unmounted at once as the list scrolls."""
+
+    WINDOW_PAGES = 3
+    """Pages of notes kept mounted, notes scrolled far away are unmounted."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.identifiers: list[str] = []
+        self.start = 0
+        """Position in `identifiers` of the first mounted note."""
+        self.loaded = 0
+        """Position in `identifiers` after the last mounted note."""
+        self._paging = asyncio.Lock()
+        self._unsubscribe = None
+
+    class RecordChanged(Message):
+        """Record changed message, posted for every change in the feed."""
+
+        def __init__(self, change: Change) -> None:
+            self.change = change
+            super().__init__()
+
     def compose(self) -> ComposeResult:
         with VerticalScroll(can_focus=False, can_focus_children=True):
             yield Button("New Note", id="button-new", variant="primary")
             yield NoteForm()
-            yield ListView(
-                *[self.create_list_item(x) for x in DB.records.values()],
-                id="list-view",
+            yield Input(
+                placeholder='Search notes (prefix*, "phrase")',
+                id="search-input",
             )
+            self.identifiers = self.app.db.identifiers()
+            items = self.page(0, self.PAGE_SIZE)
+            self.loaded = min(self.PAGE_SIZE, len(self.identifiers))
+            yield ListView(*items, id="list-view")
 
         yield ViewingPane(
             record_id="default",
@@ -304,6 +366,145 @@ class Notes(HorizontalScroll):
             can_focus_children=True,
         )
 
+    def on_mount(self) -> None:
+        self.watch(self.list_view, "scroll_y", self.check_scroll, init=False)
+        # Changes may be published from worker threads, messages are safe to
+        # post from any of them.
+        self._unsubscribe = self.app.db.subscribe(
+            lambda change: self.post_message(self.RecordChanged(change))
+        )
+
+    def on_unmount(self) -> None:
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+
+    def page(self, start: int, stop: int) -> list[ListItem]:
+        """
+        Create list items of notes from `start` to `stop` in the list. Notes
+        deleted meanwhile are skipped, they're dropped from the list once
+        their change comes through the feed.
+        """
+        records = self.app.db.records
+        items = []
+        for identifier in self.identifiers[start:stop]:
+            record = records.get(identifier)
+            if record is not None:
+                items.append(self.create_list_item(record))
+        return items
+
+    async def load_more(self) -> None:
+        """
+        Mount the next page of notes at the end of the list, and unmount
+        the first page if the window is full. Called with paging locked.
+        """
+        if self.loaded >= len(self.identifiers):
+            return
+        stop = min(self.loaded + self.PAGE_SIZE, len(self.identifiers))
+        items = self.page(self.loaded, stop)
+        self.loaded = stop
+        if items:
+            await self.list_view.extend(items)
+        if self.loaded - self.start > self.WINDOW_PAGES * self.PAGE_SIZE:
+            stop = self.start + self.PAGE_SIZE
+            await self.unmount_notes(self.start, stop)
+            self.start = stop
+        log.debug(
+            f"Mounted {self.start} to {self.loaded} "
+            f"of {len(self.identifiers)} notes"
+        )
+
+    async def load_previous(self) -> None:
+        """
+        Mount the page of notes before the first mounted one, and unmount
+        the last page if the window is full. Called with paging locked.
+        """
+        if self.start <= 0:
+            return
+        start = max(self.start - self.PAGE_SIZE, 0)
+        items = self.page(start, self.start)
+        self.start = start
+        if self.loaded - self.start > self.WINDOW_PAGES * self.PAGE_SIZE:
+            start = self.loaded - self.PAGE_SIZE
+            await self.unmount_notes(start, self.loaded)
+            self.loaded = start
+        if not items:
+            return
+
+        list_view = self.list_view
+        await list_view.mount(*items, before=0)
+        # The highlighted note is the same, only further down the list.
+        if list_view.index is not None:
+            list_view.set_reactive(
+                ListView.index, list_view.index + len(items)
+            )
+        # Notes in view stay where they are, once heights of the mounted
+        # ones are known.
+        await list_view.wait_for_refresh()
+        height = sum(item.outer_size.height for item in items)
+        list_view.scroll_to(
+            y=list_view.scroll_y + height, animate=False, immediate=True
+        )
+
+    async def unmount_notes(self, start: int, stop: int) -> None:
+        """Unmount list items of notes from `start` to `stop` in the list."""
+        list_view = self.list_view
+        unmounted = set(self.identifiers[start:stop])
+        children = list(list_view.children)
+        items = [item for item in children if item.id in unmounted]
+        if not items:
+            return
+
+        index = list_view.index
+        highlighted = list_view.highlighted_child
+        # Notes in view stay where they are when notes above are unmounted.
+        above = children.index(items[0]) == 0
+        height = sum(item.outer_size.height for item in items)
+        await list_view.remove_children(items)
+        if index is not None:
+            list_view.set_reactive(
+                ListView.index,
+                None if highlighted in items else index - len(items) * above,
+            )
+        if above:
+            list_view.scroll_to(
+                y=max(list_view.scroll_y - height, 0),
+                animate=False,
+                immediate=True,
+            )
+
+    def check_scroll(self) -> None:
+        """Mount more notes once the list is scrolled close to either end."""
+        self.call_later(self.page_in_view)
+
+    async def page_in_view(self) -> None:
+        """Mount a page of notes if the list is close to either end."""
+        # Scrolling and the cursor may both ask for a page at once, what's
+        # needed is decided only once the previous page is mounted.
+        async with self._paging:
+            list_view = self.list_view
+            if (
+                self.loaded < len(self.identifiers)
+                and list_view.scroll_y
+                >= list_view.max_scroll_y - list_view.size.height
+            ):
+                await self.load_more()
+            elif (
+                self.start > 0 and list_view.scroll_y <= list_view.size.height
+            ):
+                await self.load_previous()
+
+    @on(ListView.Highlighted, "#list-view")
+    async def check_cursor(self, event: ListView.Highlighted) -> None:
+        """Mount more notes once the cursor gets close to either end."""
+        async with self._paging:
+            index = event.list_view.index
+            if index is None:
+                return
+            if index >= len(event.list_view.children) - self.PAGE_SIZE // 2:
+                await self.load_more()
+            elif index < self.PAGE_SIZE // 2:
+                await self.load_previous()
+
     def toggle_button_new(self):
         new_note_button = self.query_one("#button-new", Button)
         if new_note_button.disabled:
@@ -329,15 +530,64 @@ class Notes(HorizontalScroll):
             new_note_form.variant = "new"
             new_note_form.query_one("#new-note-title", Input).focus()
 
+    @on(Input.Changed, "#search-input")
+    async def filter_list_view(self, event: Input.Changed) -> None:
+        """Show only notes matching the search query."""
+        query = event.value.strip()
+        if query:
+            self.identifiers = [
+                record["id"] for record in self.app.db.search(query)
+            ]
+        else:
+            self.identifiers = self.app.db.identifiers()
+        self.start = 0
+        self.loaded = min(self.PAGE_SIZE, len(self.identifiers))
+        log.debug(f"Filtering list view with query: {query!r}")
+
+        list_view = self.list_view
+        await list_view.clear()
+        await list_view.extend(self.page(0, self.loaded))
+
+    @on(RecordChanged)
+    async def apply_change(self, event: RecordChanged) -> None:
+        """Patch the list items of a note changed here or elsewhere."""
+        kind, identifier, version = event.change
+        log.debug(f"Note {identifier} {kind}, version {version}")
+        record = self.app.db.records.get(identifier)
+        list_item = self.find_list_item(identifier)
+
+        if kind == CREATED:
+            # Whether a new note matches the search is not known, it shows up
+            # once the search is cleared.
+            if record is None or self.search_input.value.strip():
+                return
+            # Unless the end of the list is mounted, the note comes with the
+            # last page.
+            self.identifiers.append(identifier)
+            if self.loaded == len(self.identifiers) - 1:
+                self.loaded += 1
+                await self.list_view.mount(self.create_list_item(record))
+        elif kind == DELETED:
+            if identifier in self.identifiers:
+                position = self.identifiers.index(identifier)
+                if position < self.start:
+                    self.start -= 1
+                if position < self.loaded:
+                    self.loaded -= 1
+                del self.identifiers[position]
+            if list_item is not None:
+                await list_item.remove()
+            if self.viewing_pane.record_id == identifier:
+                self.viewing_pane.reset()
+        elif record is not None:
+            if list_item is not None:
+                self.update_list_view_item(record, list_item)
+            if self.viewing_pane.record_id == identifier:
+                self.show_note(dict(record))
+
     @on(NoteForm.Created)
     async def update_list_view(self, event: NoteForm.Created) -> None:
-        log.debug(
-            f"New note created, updating list view for {event.record['id']}"
-        )
-
-        list_item = self.create_list_item(event.record)
-        self.list_view.mount(list_item)
-        log.debug("List view updated with new note")
+        log.debug(f"New note created: {event.record['id']}")
 
         new_note_form = self.query_one(NoteForm)
         new_note_form.styles.display = "none"
@@ -355,12 +605,14 @@ class Notes(HorizontalScroll):
         viewing_pane.query_one("#note-title", Markdown).update(
             f"# {event.record['title']} [ #{event.record['id']} ]"
         )
+        viewing_pane.rendered = (
+            event.record["id"],
+            self.app.db.feed.version_of(event.record["id"]),
+        )
         viewing_pane.query_one("#note-content", Markdown).update(
             event.record["content"]
         )
 
-        self.update_list_view_item(event.record)
-
         log.debug("Note content updated successfully.")
 
         new_note_form = self.query_one(NoteForm)
@@ -384,20 +636,30 @@ class Notes(HorizontalScroll):
         if not list_view.highlighted_child.id:
             raise ValueError("No ID found for highlighted child in ListView.")
 
-        details = DB.records[list_view.highlighted_child.id]
+        details = self.app.db.read_one(list_view.highlighted_child.id)
+        if details is None:
+            log.warning(
+                f"Note {list_view.highlighted_child.id} was deleted elsewhere."
+            )
+            list_view.highlighted_child.remove()
+            return
+
         if sorted(details.keys()) != sorted(
             ["id", "timestamp", "tag", "title", "content"]
         ):
             raise ValueError("Record details do not match expected structure.")
 
+        self.show_note(details)
+
+    def show_note(self, details: dict[str, str]) -> None:
+        """Show details of the note in the viewing pane."""
         viewing_pane = self.query_one("#note-view", ViewingPane)
         viewing_pane.record_id = details.get("id", "default")
 
         title = self.query_one("#note-title", Markdown)
-        if title.source != details.get("title", ""):
-            title.update(
-                f"# {details.get('title', '')} [ #{details.get('id', '')} ]"
-            )
+        heading = f"# {details.get('title', '')} [ #{details.get('id', '')} ]"
+        if title.source != heading:
+            title.update(heading)
 
         tag = self.query_one("#note-tag", Label)
         if tag.renderable != details.get("tag", ""):
@@ -409,6 +671,10 @@ class Notes(HorizontalScroll):
 
         content = self.query_one("#note-content", Markdown)
         if content.source != details.get("content", ""):
+            viewing_pane.rendered = (
+                viewing_pane.record_id,
+                self.app.db.feed.version_of(viewing_pane.record_id),
+            )
             content.update(details.get("content", ""))
 
         buttons = viewing_pane.query(Button)
@@ -422,13 +688,11 @@ class Notes(HorizontalScroll):
 
         log.info(f"Deleting note with ID of {viewing_pane.record_id}")
         try:
-            DB.delete(viewing_pane.record_id)
+            self.app.db.delete(viewing_pane.record_id)
         except ValueError as e:
             log.error(f"Invalid record ID: {e}")
             return
-
-        list_item = self.query_one(f"#{viewing_pane.record_id}", ListItem)
-        list_item.remove()
+        self.app.schedule_save()
 
         log.info(f"Deleted record with ID: {viewing_pane.record_id}")
         viewing_pane.reset()
@@ -450,7 +714,7 @@ class Notes(HorizontalScroll):
         if not list_view.highlighted_child.id:
             raise ValueError("No ID found for highlighted child in ListView.")
 
-        record = DB.records[list_view.highlighted_child.id]
+        record = self.app.db.read_one(list_view.highlighted_child.id)
         await new_note_form.reset(record=record)
 
         new_note_form.query_one("#new-note-title", Input).focus()
@@ -463,11 +727,21 @@ class Notes(HorizontalScroll):
         list_item = ListItem(label, id=record["id"])
         return list_item
 
-    def update_list_view_item(self, record: dict[str, str]) -> None:
-        list_item = self.query_one(f"#{record['id']}", ListItem)
+    def update_list_view_item(
+        self, record: dict[str, str], list_item: ListItem | None = None
+    ) -> None:
+        if list_item is None:
+            list_item = self.query_one(f"#{record['id']}", ListItem)
         label = list_item.query_one(Label)
         label.update(f"[ #{record['id']} ] {record['title']}")
 
+    def find_list_item(self, identifier: str) -> ListItem | None:
+        """Return list item of the note, if it's mounted."""
+        try:
+            return self.list_view.get_child_by_id(identifier, ListItem)
+        except NoMatches:
+            return None
+
     @property
     def list_view(self) -> ListView:
         return self.query_one("#list-view", ListView)
@@ -476,12 +750,32 @@ class Notes(HorizontalScroll):
     def viewing_pane(self):
         return self.query_one("#note-view", ViewingPane)
 
+    @property
+    def search_input(self) -> Input:
+        return self.query_one("#search-input", Input)
+
 
 class LifeRecorderApp(App):
     """A Textual app to manage life records"""
 
     CSS_PATH = "styles/app.tcss"
-    BINDINGS = [("d", "toggle_dark", "Toggle dark mode")]
+    BINDINGS = [
+        ("d", "toggle_dark", "Toggle dark mode"),
+        ("c", "show_cache_stats", "Render cache"),
+    ]
+
+    SAVE_DELAY = 0.5
+    """Seconds without new changes after which changes are saved."""
+
+    POLL_INTERVAL = 1.0
+    """Seconds between checks for changes made by other processes."""
+
+    def __init__(self, life_recorder: LifeRecorder | None = None, **kwargs):
+        super().__init__(**kwargs)
+        # Changes are saved in the background by `save_changes`, and notes
+        # are read from the file as they're listed.
+        self.db = life_recorder or LifeRecorder(write_behind=True, lazy=True)
+        self._save_timer = None
 
     def compose(self) -> ComposeResult:
         """Create child widgets for the app."""
@@ -497,6 +791,53 @@ class LifeRecorderApp(App):
         )
         yield Footer()
 
+    def on_mount(self) -> None:
+        self.set_interval(self.POLL_INTERVAL, self.poll_changes)
+        self.db.subscribe(render_cache.on_change)
+
+    @work(thread=True, group="poll", exclusive=True, exit_on_error=False)
+    def poll_changes(self) -> None:
+        """
+        Reload the database if another process changed it, which publishes
+        its changes to the feed, in a background thread.
+        """
+        self.db.refresh()
+
+    def schedule_save(self) -> None:
+        """Save changes once no new changes are made for a while."""
+        self.sub_title = "Saving..."
+        if self._save_timer is not None:
+            self._save_timer.stop()
+        self._save_timer = self.set_timer(self.SAVE_DELAY, self.save_changes)
+
+    @work(thread=True, group="save", exit_on_error=False)
+    def save_changes(self) -> None:
+        """Save changes of the database in a background thread."""
+        self.db.flush()
+
+    def on_worker_state_changed(self, event: Worker.StateChanged) -> None:
+        if event.worker.group != "save":
+            return
+        if event.state == WorkerState.SUCCESS and not self.db.unsaved:
+            self.sub_title = "Saved"
+        elif event.state == WorkerState.ERROR:
+            log.error(f"Failed to save changes: {event.worker.error}")
+            self.sub_title = "Saving failed"
+
+    def on_unmount(self) -> None:
+        """Save pending changes and loaded indexes of the database on exit."""
+        self.db.close()
+
+    def action_show_cache_stats(self) -> None:
+        """Show size and hit rate of the render cache."""
+        stats = render_cache.stats()
+        self.notify(
+            f"{stats['size']} of {stats['maxsize']} notes rendered, "
+            f"hit rate {stats['hit_rate']:.0%} "
+            f"({stats['hits']} of {stats['hits'] + stats['misses']})",
+            title="Render cache",
+        )
+
     def action_toggle_dark(self) -> None:
         """An action to toggle dark mode."""
         self.theme = (
@@ -2,16 +2,57 @@
 Module that provides `LifeRecorder` class for life record management.
 """
 
-import json
 import os
+import threading
+from collections.abc import Iterable, Iterator, Mapping
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from itertools import islice
 from pathlib import Path
+from typing import Any
 
-from .helper import get_data_dir, get_timestamp
+from .feed import CREATED, DELETED, UPDATED, ChangeFeed, Listener, diff
+from .helper import get_data_dir, get_epoch, get_timestamp
+from .history import FIELDS as HISTORY_FIELDS
+from .history import History, make_revision
+from .metrics import metrics, metrics_path, timed
+from .query import QueryIndex
+from .record import compact, compress
+from .search import SearchIndex
+from .storage import Changes, get_storage
 from . import config
 
 
 class LifeRecorder:
-    def __init__(self, path_to_db: str | None = None):
+    """
+    Manages life records in the database.
+
+    In `write_behind` mode changes are applied in memory right away, but
+    they are saved only by `flush()`, so that a series of changes is saved
+    at once, e.g. from a background thread. Until then the database stays
+    locked against other processes.
+
+    Every change of records is published to the `feed`, including changes
+    made by other processes, which are found when the database is reloaded,
+    e.g. by `refresh()`.
+
+    Previous versions of updated records are kept in the history file next
+    to the database, see `history()`.
+
+    `indexed` tells that search and tag indexes will be needed right away,
+    e.g. by the daemon. With `config.LOAD_WORKERS` set, large databases are
+    then loaded and indexed by worker processes, see `parallel`.
+    """
+
+    def __init__(
+        self,
+        path_to_db: str | None = None,
+        storage: str | None = None,
+        lazy: bool = False,
+        write_behind: bool = False,
+        indexed: bool = False,
+    ):
+        storage_class = get_storage(storage or config.STORAGE_BACKEND)
         if path_to_db:
             self.path_to_db = Path(path_to_db)
             if not self.path_to_db.exists():
@@ -19,53 +60,413 @@ class LifeRecorder:
                     f"Database file not found: {self.path_to_db}"
                 )
         else:
-            init_path_to_db = Path(
-                os.path.join(get_data_dir(), "life_records.json")
-            )
-            if not init_path_to_db.exists():
-                self._init_db(init_path_to_db)
-            self.path_to_db = init_path_to_db
-        self._db = self._load_database()
+            self.path_to_db = self.default_path(storage)
+        self._storage = storage_class(self.path_to_db, lazy=lazy)
+        self._history = History.for_database(self.path_to_db)
+        self.indexed = indexed
+        if not self.path_to_db.exists():
+            self.path_to_db.parent.mkdir(parents=True, exist_ok=True)
+            with self._storage.lock():
+                self._init_db()
+        self._search_index: SearchIndex | None = None
+        self._query_index: QueryIndex | None = None
+        with self._storage.lock(shared=True):
+            self._db = self._load_database()
+            self._stamp = self._storage.stamp()
+        self._pending: Changes | None = None
+        self._undo: dict[str, dict[str, str] | None] = {}
+        self.write_behind = write_behind
+        self._unsaved: Changes = {}
+        self._unsaved_undo: dict[str, dict[str, str] | None] = {}
+        self._unsaved_revisions: list[dict[str, Any]] = []
+        self._held_lock: ExitStack | None = None
+        self._mutex = threading.RLock()
+        self.feed = ChangeFeed()
+        if metrics.enabled:
+            metrics.persist(metrics_path(self.path_to_db))
 
-    def create(self, record: dict[str, str]) -> dict[str, str]:
-        if not isinstance(record, dict):
-            raise TypeError(
-                "Record must be a dictionary, but it's {}".format(type(record))
-            )
+    @staticmethod
+    def default_path(storage: str | None = None) -> Path:
+        """Returns path of the database in the data directory."""
+        storage_class = get_storage(storage or config.STORAGE_BACKEND)
+        return Path(os.path.join(get_data_dir(), storage_class.filename))
 
-        if (
-            "tag" not in record
-            or "title" not in record
-            or "content" not in record
-        ):
-            raise ValueError(
-                "Record must contain 'tag', 'title', and 'content'."
-            )
+    @timed("create")
+    def create(self, record: dict[str, str]) -> Mapping[str, str]:
+        self._validate_record(record)
 
-        record_id = f"lr-{self.db['last_id'] + 1}"
-        new_record = record.copy()
-        new_record.update({"id": record_id, "timestamp": get_timestamp()})
-        self.records.update({record_id: new_record})
-        self.db["last_id"] += 1
-        self._save_database()
-        return self.db["records"][record_id]
+        with self.batch():
+            record_id = f"lr-{self.db['last_id'] + 1}"
+            new_record = record.copy()
+            new_record.update({"id": record_id, "timestamp": get_timestamp()})
+            new_record = self._compact(new_record)
+            self.db["last_id"] += 1
+            self._apply(record_id, None, new_record)
+        return new_record
 
-    def read(self):
-        """Read all life records."""
-        return self.records
+    @timed("create_many")
+    def create_many(
+        self, records: Iterable[dict[str, str]], keep_timestamps: bool = False
+    ) -> list[Mapping[str, str]]:
+        """
+        Create life records with a single save, all or none of them.
+
+        Identifiers are assigned to all records at once. If `keep_timestamps`
+        is set, records that already have a timestamp keep it, e.g. when they
+        are imported from another database.
+        """
+        records = list(records)
+        for record in records:
+            self._validate_record(record)
+
+        timestamp = get_timestamp()
+        created = []
+        with self.batch():
+            first_id = self.db["last_id"] + 1
+            self.db["last_id"] += len(records)
+            for number, record in enumerate(records, start=first_id):
+                new_record = record.copy()
+                new_record["id"] = f"lr-{number}"
+                if not (keep_timestamps and record.get("timestamp")):
+                    new_record["timestamp"] = timestamp
+                new_record = self._compact(new_record)
+                self._apply(new_record["id"], None, new_record)
+                created.append(new_record)
+        return created
+
+    @timed("read")
+    def read(
+        self,
+        tag: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        limit: int | None = None,
+    ) -> Mapping[str, Mapping[str, str]]:
+        """
+        Read all life records, or only records with the given tag that were
+        created at or after `since` and before `until`, in chronological
+        order.
+        """
+        self.refresh()
+        if tag is None and since is None and until is None:
+            if limit is None:
+                return self.records
+            return dict(islice(self.records.items(), limit))
+
+        since_epoch = get_epoch(since) if since is not None else None
+        until_epoch = get_epoch(until) if until is not None else None
+        records = self._storage.query(tag, since_epoch, until_epoch, limit)
+        if records is not None:
+            return records
+
+        identifiers = self.query_index.query(
+            tag, since_epoch, until_epoch, limit
+        )
+        return {
+            identifier: self.records[identifier] for identifier in identifiers
+        }
 
+    @timed("read_one")
     def read_one(self, identifier: str) -> dict[str, str] | None:
-        """Read a single life record by its identifier."""
-        return self.records.get(identifier, None)
+        """Read a single life record by its identifier, as a dict."""
+        self.refresh()
+        record = self.records.get(identifier, None)
+        return dict(record) if record is not None else None
 
+    def identifiers(self) -> list[str]:
+        """
+        Returns identifiers of all life records in the order of `read()`.
+        A lazily loaded database lists them without reading the records.
+        """
+        self.refresh()
+        return list(self.records)
+
+    @timed("update")
     def update(
         self, identifier: str, record: dict[str, str]
-    ) -> dict[str, str]:
+    ) -> Mapping[str, str]:
         """Update a life record by its identifier."""
 
         if isinstance(identifier, str) is False:
             raise TypeError("Identifier must be a string.")
 
+        self._validate_record(record)
+
+        with self.batch():
+            if identifier not in self.records:
+                raise ValueError(
+                    f"No record found with identifier: {identifier}"
+                )
+
+            # Keep the original id and timestamp, update the rest
+            old_record = self.records[identifier]
+            updated_record = record.copy()
+            updated_record.update(
+                {"id": old_record["id"], "timestamp": old_record["timestamp"]}
+            )
+            updated_record = self._compact(updated_record)
+
+            self._apply(identifier, old_record, updated_record)
+        return updated_record
+
+    @timed("update_many")
+    def update_many(
+        self, records: Mapping[str, dict[str, str]]
+    ) -> list[Mapping[str, str]]:
+        """
+        Update life records by their identifiers with a single save, all or
+        none of them.
+        """
+        with self.batch():
+            return [
+                self.update(identifier, record)
+                for identifier, record in records.items()
+            ]
+
+    @timed("delete")
+    def delete(self, identifier: str):
+        """Delete a life record by its identifier."""
+
+        if isinstance(identifier, str) is False:
+            raise TypeError("Identifier must be a string.")
+
+        with self.batch():
+            if identifier in self.records:
+                self._apply(identifier, self.records[identifier], None)
+            else:
+                raise ValueError(
+                    f"No record found with identifier: {identifier}"
+                )
+
+    @timed("delete_many")
+    def delete_many(self, identifiers: Iterable[str]) -> None:
+        """Delete life records with a single save, all or none of them."""
+        with self.batch():
+            for identifier in identifiers:
+                self.delete(identifier)
+
+    @timed("history")
+    def history(self, identifier: str) -> list[dict[str, Any]]:
+        """
+        Returns versions of a life record, newest first, each with its
+        `revision` number and the time it was `saved`. Revision `0` is the
+        current version, `1` the one before it and so on, at most
+        `config.HISTORY_LIMIT` of them.
+        """
+        if isinstance(identifier, str) is False:
+            raise TypeError("Identifier must be a string.")
+
+        self.refresh()
+        with self._mutex:
+            record = self.records.get(identifier)
+            if record is None:
+                raise ValueError(
+                    f"No record found with identifier: {identifier}"
+                )
+            versions = self._history.versions(
+                record, config.HISTORY_LIMIT, self._unsaved_revisions
+            )
+        return [
+            {**version, "revision": revision}
+            for revision, version in enumerate(versions)
+        ]
+
+    @timed("revert")
+    def revert(self, identifier: str, revision: int) -> dict[str, str]:
+        """
+        Restore tag, title and content of a life record as they were in the
+        revision, see `history()`. The current version is kept in history,
+        so a revert can be reverted too.
+        """
+        with self.batch():
+            versions = self.history(identifier)
+            if not 0 <= revision < len(versions):
+                raise ValueError(
+                    f"No revision {revision} of record: {identifier}"
+                )
+            version = versions[revision]
+            return self.update(
+                identifier, {field: version[field] for field in HISTORY_FIELDS}
+            )
+
+    def prune_history(self, keep: int | None = None) -> int:
+        """
+        Drop all but the newest `keep` previous versions of every record,
+        `config.HISTORY_LIMIT` by default, and history of deleted records.
+        Returns number of dropped versions.
+        """
+        if keep is None:
+            keep = config.HISTORY_LIMIT
+        with self.batch():
+            return self._history.prune(keep, self.records)
+
+    @contextmanager
+    def batch(self) -> Iterator["LifeRecorder"]:
+        """
+        Buffer changes made inside the block and save them once at exit.
+
+        The database is locked against other processes for the whole block
+        and reloaded first if they changed it. If the block raises, changes
+        are reverted and the database on disk is left untouched. Nested
+        batches are part of the outermost one.
+
+        In `write_behind` mode changes are kept for `flush()` instead, and
+        the lock is held until then.
+        """
+        changes = None
+        with self._mutex, ExitStack() as stack:
+            if self._pending is not None:
+                yield self
+                return
+
+            if self._held_lock is None:
+                stack.enter_context(self._storage.lock())
+                self._reload()
+            self._pending = {}
+            self._undo = {}
+            last_id = self.db["last_id"]
+            self._storage.begin()
+            try:
+                yield self
+                if not self._pending:
+                    self._storage.discard()
+                elif self.write_behind:
+                    self._unsaved.update(self._pending)
+                    for identifier, old_record in self._undo.items():
+                        self._unsaved_undo.setdefault(identifier, old_record)
+                    self._unsaved_revisions.extend(self._revisions())
+                    if self._held_lock is None:
+                        self._held_lock = stack.pop_all()
+                else:
+                    self._save_revisions(self._revisions())
+                    self._save_database(self._pending)
+                    self._save_indexes(self._pending, self._undo)
+                changes = [
+                    (self._change_kind(identifier), identifier)
+                    for identifier in self._pending
+                    if self._pending[identifier] is not None
+                    or self._undo[identifier] is not None
+                ]
+            except BaseException:
+                self._rollback(last_id)
+                raise
+            finally:
+                self._pending = None
+                self._undo = {}
+        if changes:
+            self.feed.publish(changes)
+
+    def flush(self) -> bool:
+        """
+        Save changes kept back in `write_behind` mode and release the lock
+        of the database. Returns `True` if there was anything to save.
+        """
+        with self._mutex:
+            if not self._unsaved:
+                return False
+            self._save_revisions(self._unsaved_revisions)
+            self._unsaved_revisions = []
+            self._save_database(self._unsaved)
+            self._save_indexes(self._unsaved, self._unsaved_undo)
+            self._unsaved = {}
+            self._unsaved_undo = {}
+            held_lock, self._held_lock = self._held_lock, None
+            held_lock.close()
+            return True
+
+    def subscribe(self, listener: Listener):
+        """
+        Call the listener with every change published to the `feed`, returns
+        function that unsubscribes it.
+        """
+        return self.feed.subscribe(listener)
+
+    @property
+    def unsaved(self) -> bool:
+        """Return whether there are changes waiting for `flush()`."""
+        return bool(self._unsaved)
+
+    def refresh(self) -> bool:
+        """
+        Reload the database if another process has changed it since it was
+        loaded. Returns `True` if it was reloaded.
+        """
+        # While changes are being made or saved, the database is locked by
+        # this instance and nobody else could have changed it.
+        if not self._mutex.acquire(blocking=False):
+            return False
+        try:
+            if self._pending is not None or self._held_lock is not None:
+                return False
+            with self._storage.lock(shared=True):
+                return self._reload()
+        finally:
+            self._mutex.release()
+
+    @timed("search")
+    def search(
+        self, query: str, limit: int | None = None
+    ) -> list[dict[str, str]]:
+        """
+        Search life records by their title, content and tag, best match
+        first. Supports prefix (`dre*`) and phrase (`"a duck"`) queries.
+        """
+        if not isinstance(query, str):
+            raise TypeError("Query must be a string.")
+
+        self.refresh()
+        identifiers = self.search_index.search(query, limit)
+        # Postings read from the saved index may already have changes of
+        # another process that haven't been loaded yet.
+        return [
+            self.records[identifier]
+            for identifier in identifiers
+            if identifier in self.records
+        ]
+
+    def warm(self) -> tuple[SearchIndex, QueryIndex]:
+        """
+        Load the search and query indexes now instead of on first use, e.g.
+        before serving requests that would wait for them, and return them.
+        """
+        self.search_index.preload()
+        self.query_index.preload()
+        return self.search_index, self.query_index
+
+    def close(self) -> None:
+        """
+        Save kept back changes and loaded indexes, then release resources
+        held by the storage.
+        """
+        self.flush()
+        if self._search_index is not None and self._search_index.dirty:
+            with self._storage.lock(shared=True):
+                # An index of outdated records must not pass for a fresh one.
+                if self._storage.stamp() == self._stamp:
+                    self._search_index.save(self._search_path, self._stamp)
+        if self._query_index is not None and self._query_index.dirty:
+            with self._storage.lock(shared=True):
+                if self._storage.stamp() == self._stamp:
+                    self._query_index.save(self._query_path, self._stamp)
+        if self._search_index is not None:
+            self._search_index.close()
+        if self._query_index is not None:
+            self._query_index.close()
+        self._storage.close()
+
+    @staticmethod
+    def _compact(record: dict[str, str]) -> Mapping[str, str]:
+        """
+        Returns record in its compact form, with long content compressed
+        if `config.COMPRESS_THRESHOLD` is set.
+        """
+        return compress(
+            compact(record), config.COMPRESS_THRESHOLD, config.COMPRESSION
+        )
+
+    @staticmethod
+    def _validate_record(record: dict[str, str]) -> None:
+        """Check that the record has all fields that can be set by user."""
         if not isinstance(record, dict):
             raise TypeError(
                 "Record must be a dictionary, but it's {}".format(type(record))
@@ -80,51 +481,214 @@ class LifeRecorder:
                 "Record must contain 'tag', 'title', and 'content'."
             )
 
-        if identifier not in self.records:
-            raise ValueError(f"No record found with identifier: {identifier}")
+    def _apply(
+        self,
+        identifier: str,
+        old_record: dict[str, str] | None,
+        new_record: dict[str, str] | None,
+    ) -> None:
+        """Apply a change to records and indexes, buffered by the batch."""
+        if new_record is None:
+            del self.records[identifier]
+        else:
+            self.records[identifier] = new_record
+        self._index_change(old_record, new_record)
+        self._undo.setdefault(identifier, old_record)
+        self._pending[identifier] = new_record
+
+    def _revisions(self) -> list[dict[str, Any]]:
+        """Returns previous versions of records updated by the batch."""
+        if config.HISTORY_LIMIT <= 0:
+            return []
+        saved = get_timestamp()
+        revisions = []
+        for identifier, new_record in self._pending.items():
+            old_record = self._undo[identifier]
+            if old_record is None or new_record is None:
+                continue
+            revision = make_revision(old_record, new_record, saved)
+            if revision is not None:
+                revisions.append(revision)
+        return revisions
+
+    def _save_revisions(self, revisions: list[dict[str, Any]]) -> None:
+        """
+        Add revisions to history, before the changes they belong to are
+        saved, and prune it once it has grown enough.
+        """
+        if not revisions:
+            return
+        self._history.append(revisions)
+        if self._history.oversized():
+            self._history.prune(config.HISTORY_LIMIT, self.records)
 
-        # Keep the original id and timestamp, update the rest
-        old_record = self.records[identifier]
-        updated_record = record.copy()
-        updated_record.update(
-            {"id": old_record["id"], "timestamp": old_record["timestamp"]}
+    def _save_indexes(
+        self, changes: Changes, undo: dict[str, dict[str, str] | None]
+    ) -> None:
+        """
+        Take the stamp of the saved changes and write them to the saved
+        search and query indexes if they matched the database before, so
+        that they're not built again from all records. Must be called with
+        the storage locked.
+        """
+        stamp, self._stamp = self._stamp, self._storage.stamp()
+        pairs = [
+            (undo[identifier], new_record)
+            for identifier, new_record in changes.items()
+        ]
+        patched = SearchIndex.patch(
+            self._search_path, stamp, self._stamp, pairs
         )
+        index = self._search_index
+        if not patched and index is not None:
+            if index.lazy:
+                # Postings it hasn't read yet are not up to date any more.
+                index.close()
+                self._search_index = None
+            else:
+                index.dirty = True
 
-        self.records[identifier] = updated_record
-        self._save_database()
-        return self.records[identifier]
+        patched = QueryIndex.patch(self._query_path, stamp, self._stamp, pairs)
+        index = self._query_index
+        if not patched and index is not None:
+            if index.lazy:
+                index.close()
+                self._query_index = None
+            else:
+                index.dirty = True
 
-    def delete(self, identifier: str):
-        """Delete a life record by its identifier."""
+    def _change_kind(self, identifier: str) -> str:
+        """Returns kind of change made to the record by the batch."""
+        if self._undo[identifier] is None:
+            return CREATED
+        if self._pending[identifier] is None:
+            return DELETED
+        return UPDATED
 
-        if isinstance(identifier, str) is False:
-            raise TypeError("Identifier must be a string.")
+    def _rollback(self, last_id: int) -> None:
+        """Revert changes buffered by the current batch."""
+        for identifier, old_record in self._undo.items():
+            current_record = self.records.get(identifier)
+            if old_record is None:
+                self.records.pop(identifier, None)
+            else:
+                self.records[identifier] = old_record
+            self._index_change(current_record, old_record)
+        self.db["last_id"] = last_id
+        self._storage.discard()
 
-        if identifier in self.records:
-            del self.records[identifier]
-            self._save_database()
-        else:
-            raise ValueError(f"No record found with identifier: {identifier}")
+    def _index_change(
+        self,
+        old_record: dict[str, str] | None,
+        new_record: dict[str, str] | None,
+    ) -> None:
+        """Keep loaded indexes in sync with a changed record."""
+        for index in (self._search_index, self._query_index):
+            if index is None:
+                continue
+            if old_record is not None:
+                index.remove(old_record)
+            if new_record is not None:
+                index.add(new_record)
+
+    def _reload(self) -> bool:
+        """
+        Load the database again if its files changed, dropping indexes of
+        the old records. Must be called with the storage locked.
+        """
+        stamp = self._storage.stamp()
+        if stamp == self._stamp:
+            return False
+        if metrics.enabled:
+            metrics.inc("reloads_total")
+        old_records = self.records
+        if self._search_index is not None:
+            self._search_index.close()
+        if self._query_index is not None:
+            self._query_index.close()
+        self._search_index = None
+        self._query_index = None
+        self._db = self._load_database()
+        self._stamp = stamp
+        # Comparing records is skipped when nobody would be told about it.
+        if self.feed.active:
+            self.feed.publish(list(diff(old_records, self.records)))
+        return True
 
+    @timed("load")
     def _load_database(self):
-        """Load the database from the JSON file."""
-        with open(self.path_to_db, "r") as f:
-            return json.load(f)
-
-    def _save_database(self):
-        """Save the current state of the database to the JSON file."""
-        with open(self.path_to_db, "w") as f:
-            if config.DEBUG:
-                json.dump(self._db, f, indent=4)
-            else:
-                json.dump(self._db, f)
+        """
+        Load the database through the storage backend, by worker processes
+        that build its indexes too if they're wanted right away.
+        """
+        if self.indexed and config.LOAD_WORKERS > 1 and not self._storage.lazy:
+            from . import parallel
+
+            loaded = parallel.load(self._storage, config.LOAD_WORKERS)
+            if loaded is not None:
+                db, self._search_index, self._query_index = loaded
+                return db
+        return self._storage.load()
 
-    def _init_db(self, init_path_to_db: Path) -> None:
+    @timed("save")
+    def _save_database(self, changes: Changes | None = None):
+        """
+        Save the current state of the database through the storage backend.
+
+        If changes are given, backends may persist only those records.
+        """
+        if metrics.enabled:
+            metrics.inc(
+                "records_written_total",
+                len(self.records) if changes is None else len(changes),
+            )
+        if changes is None:
+            self._storage.save(self._db)
+        else:
+            self._storage.write(self._db, changes)
+
+    def _init_db(self) -> None:
         """Initialize the database with default values."""
-        init_path_to_db.parent.mkdir(parents=True, exist_ok=True)
-        init_path_to_db.touch()
-        with open(init_path_to_db, "w") as f:
-            json.dump({"last_id": 0, "records": {}}, f)
+        self._storage.init()
+
+    @property
+    def search_index(self) -> SearchIndex:
+        """
+        Return the full-text search index, loaded from its sidecar file or
+        built from records if the sidecar doesn't match the database.
+        """
+        if self._search_index is None:
+            index = SearchIndex.load(self._search_path, self._stamp)
+            if index is None:
+                index = SearchIndex.build(self.records.values())
+                # Records changed by a running batch are not saved yet.
+                if self._pending is None and not self._unsaved:
+                    index.save(self._search_path, self._stamp)
+            self._search_index = index
+        return self._search_index
+
+    @property
+    def query_index(self) -> QueryIndex:
+        """
+        Return the tag and timeline index, loaded from its sidecar file or
+        built from records if the sidecar doesn't match the database.
+        """
+        if self._query_index is None:
+            index = QueryIndex.load(self._query_path, self._stamp)
+            if index is None:
+                index = QueryIndex.build(self.records.values())
+                if self._pending is None and not self._unsaved:
+                    index.save(self._query_path, self._stamp)
+            self._query_index = index
+        return self._query_index
+
+    @property
+    def _search_path(self) -> Path:
+        return self.path_to_db.with_name(self.path_to_db.name + ".search")
+
+    @property
+    def _query_path(self) -> Path:
+        return self.path_to_db.with_name(self.path_to_db.name + ".query")
 
     @property
     def db(self):
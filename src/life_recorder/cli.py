@@ -1,31 +1,45 @@
 """Module is used to run LifeRecorder class and record some memories."""
 
+import os
 import sys
-from typing import Union
-from loguru import logger
+import time
+from datetime import datetime
+from pathlib import Path
 import click
-from rich import print
 
 from life_recorder.base import LifeRecorder
+from life_recorder.storage import JsonStorage, get_storage, migrate_database
 from life_recorder import helper as h
+from life_recorder import metrics
+from life_recorder import output
+from life_recorder import transfer
+
+STORAGE_NAMES = {"sqlite": "SQLite", "sharded": "Sharded"}
+"""Names of storage backends that `migrate` imports databases into."""
 
 
 @click.group()
 @click.version_option(version="0.1.0", prog_name="life_recorder")
-@logger.catch
-def main() -> None:
+@click.option(
+    "--profile-startup",
+    is_flag=True,
+    help="Run the command and report import time of the modules.",
+)
+@h.catch
+def main(profile_startup: bool) -> None:
     """
     Utility to record life events.
     """
-    pass
+    if profile_startup:
+        sys.exit(_profile_startup(sys.argv[1:]))
 
 
 @main.command()
-@logger.catch
+@h.catch
 def create() -> None:
     """Creates the new record."""
 
-    life_recorder = LifeRecorder()
+    life_recorder = _open_database()
 
     # Get user inputs
     tag = click.prompt(
@@ -48,16 +62,74 @@ def create() -> None:
     sys.exit()
 
 
+DATE_FORMATS = ["%Y-%m-%d", "%Y-%m-%d %H:%M", "%d-%b-%Y", h.TIMESTAMP_FORMAT]
+
+
 @main.command()
 @click.argument("identifier", required=False, type=click.STRING)
-@logger.catch
-def read(identifier: Union[str, None]) -> None:
+@click.option("--tag", type=click.STRING, help="Only records with the tag.")
+@click.option(
+    "--since",
+    type=click.DateTime(formats=DATE_FORMATS),
+    help="Only records created at or after the date.",
+)
+@click.option(
+    "--until",
+    type=click.DateTime(formats=DATE_FORMATS),
+    help="Only records created before the date.",
+)
+@click.option(
+    "--limit", "-n", type=click.IntRange(min=1), help="Maximum records."
+)
+@click.option(
+    "--offset",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Skip the first records.",
+)
+@click.option(
+    "--sort",
+    type=click.Choice(output.SORTS),
+    help="Field to sort by, records are in chronological order by default.",
+)
+@click.option(
+    "--reverse", "-r", is_flag=True, help="Print records in reverse order."
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(output.FORMATS),
+    default="pretty",
+    show_default=True,
+    help="Format of printed records.",
+)
+@click.option(
+    "--pager/--no-pager",
+    default=None,
+    help="Page the output, by default when it doesn't fit the terminal.",
+)
+@h.catch
+def read(
+    identifier: str | None,
+    tag: str | None,
+    since: datetime | None,
+    until: datetime | None,
+    limit: int | None,
+    offset: int,
+    sort: str | None,
+    reverse: bool,
+    output_format: str,
+    pager: bool | None,
+) -> None:
     """
     Reads the record.
 
-    IDENTIFIER is id of the record. If not provided, it will read all records.
+    IDENTIFIER is id of the record. If not provided, it will read all records
+    that match the given filters.
     """
-    life_recorder = LifeRecorder()
+    # Single record is read through the offset index without parsing the
+    # whole database.
+    life_recorder = _open_database(lazy=identifier is not None)
     if identifier is not None:
         record = life_recorder.read_one(identifier)
         if record is None:
@@ -65,24 +137,61 @@ def read(identifier: Union[str, None]) -> None:
             h.add_breakline(print, func_args=[message], both=True)
             sys.exit()
 
-        h.add_breakline(h.print_pretty_record, func_args=[record], after=True)
+        _print_records([record], 1, output_format, pager)
+        sys.exit()
+
+    # Storage stops after the printed records, unless all of them have to
+    # be ordered first.
+    ordered = sort is None and not reverse
+    records = life_recorder.read(
+        tag=tag,
+        since=since,
+        until=until,
+        limit=offset + limit if limit is not None and ordered else None,
+    )
+    count = max(len(records) - offset, 0)
+    if limit is not None:
+        count = min(count, limit)
+    selected = output.select(records, sort, reverse, offset, limit)
+    _print_records(selected, count, output_format, pager)
+    sys.exit()
+
+
+@main.command()
+@click.argument("query", required=True, type=click.STRING)
+@click.option(
+    "--limit", "-n", type=click.IntRange(min=1), help="Maximum records."
+)
+@h.catch
+def search(query: str, limit: int | None) -> None:
+    """
+    Searches records by title, content and tag.
+
+    QUERY is words to search, best match is printed first. Words ending
+    with "*" match as prefixes and words in double quotes as a phrase.
+    """
+    life_recorder = _open_database()
+    records = life_recorder.search(query, limit=limit)
+    if not records:
+        message = "Provided query didn't match with any record."
+        h.add_breakline(print, func_args=[message], both=True)
         sys.exit()
 
-    for record in life_recorder.read().values():
+    for record in records:
         h.add_breakline(h.print_pretty_record, func_args=[record], after=True)
     sys.exit()
 
 
 @main.command()
 @click.argument("identifier", required=True, type=click.STRING)
-@logger.catch
+@h.catch
 def update(identifier: str) -> None:
     """
     Updates the record.
 
     IDENTIFIER is id of the record.
     """
-    life_recorder = LifeRecorder()
+    life_recorder = _open_database()
 
     # Get the existing record
     old_record = life_recorder.read_one(identifier)
@@ -134,7 +243,7 @@ def update(identifier: str) -> None:
 
 @main.command()
 @click.argument("identifier", required=True, type=click.STRING)
-@logger.catch
+@h.catch
 def delete(identifier: str) -> None:
     """
     Deletes the record.
@@ -142,7 +251,7 @@ def delete(identifier: str) -> None:
     IDENTIFIER is id of the record.
     """
 
-    life_recorder = LifeRecorder()
+    life_recorder = _open_database()
     record = life_recorder.read_one(identifier)
     if record is None:
         message = "There is no record with the given identifier."
@@ -179,5 +288,431 @@ def delete(identifier: str) -> None:
     sys.exit()
 
 
+@main.command()
+@click.argument("identifier", required=False, type=click.STRING)
+@click.option(
+    "--prune",
+    is_flag=True,
+    help="Drop old revisions of every record instead of showing history.",
+)
+@click.option(
+    "--keep",
+    type=click.IntRange(min=0),
+    help="Revisions of every record kept by --prune, HISTORY_LIMIT by "
+    "default.",
+)
+@h.catch
+def history(identifier: str | None, prune: bool, keep: int | None) -> None:
+    """
+    Shows previous versions of the record, newest first.
+
+    IDENTIFIER is id of the record. Revision 0 is the current version,
+    revision 1 is the one before it and so on.
+    """
+    life_recorder = _open_database()
+    if prune:
+        dropped = life_recorder.prune_history(keep)
+        message = f"Dropped {dropped} old revisions."
+        click.echo(click.style(message, fg="green"))
+        sys.exit()
+    if identifier is None:
+        message = "Provide identifier of the record, or --prune."
+        h.add_breakline(print, func_args=[message], both=True)
+        sys.exit()
+
+    if life_recorder.read_one(identifier) is None:
+        message = "Provided identifier didn't match with any record."
+        h.add_breakline(print, func_args=[message], both=True)
+        sys.exit()
+    versions = life_recorder.history(identifier)
+
+    for version in versions:
+        label = f"Revision {version['revision']}, saved {version['saved']}"
+        click.echo(click.style(label, fg="green"))
+        h.add_breakline(h.print_pretty_record, func_args=[version], after=True)
+    sys.exit()
+
+
+@main.command()
+@click.argument("identifier", required=True, type=click.STRING)
+@click.argument("revision", required=True, type=click.IntRange(min=1))
+@h.catch
+def revert(identifier: str, revision: int) -> None:
+    """
+    Restores the record as it was in the revision.
+
+    IDENTIFIER is id of the record and REVISION is number of the revision
+    shown by the `history` command. The current version is kept in history.
+    """
+    life_recorder = _open_database()
+    if life_recorder.read_one(identifier) is None:
+        message = "Provided identifier didn't match with any record."
+        h.add_breakline(print, func_args=[message], both=True)
+        sys.exit()
+    versions = life_recorder.history(identifier)
+    if revision >= len(versions):
+        message = f"Record #{identifier} has no revision {revision}."
+        h.add_breakline(print, func_args=[message], both=True)
+        sys.exit()
+
+    click.echo(click.style("\nRecord will be restored as:\n", fg="green"))
+    click.echo(f"{h.pretty_record(versions[revision])}\n")
+    if not click.confirm(
+        click.style("Are you sure you want to revert this record?", fg="red"),
+        default=None,
+    ):
+        sys.exit()
+
+    reverted = life_recorder.revert(identifier, revision)
+    click.echo(
+        click.style(
+            f"\nRecord #{identifier} reverted successfully:\n", fg="green"
+        )
+    )
+    click.echo(f"{h.pretty_record(reverted)}\n")
+    sys.exit()
+
+
+@main.command()
+@click.argument(
+    "source",
+    required=False,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "--storage",
+    type=click.Choice(list(STORAGE_NAMES)),
+    default="sqlite",
+    show_default=True,
+    help="Storage backend to import the database into.",
+)
+@h.catch
+def migrate(source: Path | None, storage: str) -> None:
+    """
+    Imports JSON database into SQLite or sharded database.
+
+    SOURCE is path to the JSON database. If not provided, the default
+    database is used.
+    """
+    if source is None:
+        source = Path(os.path.join(h.get_data_dir(), JsonStorage.filename))
+        if not source.exists():
+            message = "There is no JSON database to migrate."
+            h.add_breakline(print, func_args=[message], both=True)
+            sys.exit()
+
+    life_recorder = LifeRecorder(storage=storage)
+    has_records = len(life_recorder.records) > 0
+    life_recorder.close()
+    if has_records and (
+        click.confirm(
+            click.style(
+                f"{STORAGE_NAMES[storage]} database already has records. "
+                "Replace them?",
+                fg="red",
+            ),
+            default=None,
+        )
+        is False
+    ):
+        sys.exit()
+
+    target = get_storage(storage)(life_recorder.path_to_db)
+    count = migrate_database(JsonStorage(source), target)
+    target.close()
+
+    message = f"Migrated {count} records into {life_recorder.path_to_db}."
+    click.echo(click.style(message, fg="green"))
+    sys.exit()
+
+
+@main.command(name="import")
+@click.argument("input_file", metavar="INPUT", type=click.File("r"))
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(transfer.FORMATS),
+    help="Format of INPUT, guessed from its extension by default.",
+)
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    default=transfer.CHUNK_SIZE,
+    show_default=True,
+    help="Records saved at once.",
+)
+@h.catch
+def import_(input_file, file_format: str | None, chunk_size: int) -> None:
+    """
+    Imports records from NDJSON or CSV file.
+
+    INPUT is path to the file, "-" reads from standard input. Imported
+    records get new identifiers and keep their timestamps.
+    """
+    file_format = file_format or _guess_format(input_file.name)
+    life_recorder = _open_database()
+
+    started = time.perf_counter()
+    count = transfer.import_records(
+        life_recorder,
+        transfer.read_records(input_file, file_format),
+        chunk_size=chunk_size,
+        progress=_report_progress("Imported"),
+    )
+    _report_throughput("Imported", count, time.perf_counter() - started)
+    sys.exit()
+
+
+@main.command()
+@click.argument(
+    "output_file", metavar="OUTPUT", type=click.File("w"), default="-"
+)
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(transfer.FORMATS),
+    help="Format of OUTPUT, guessed from its extension by default.",
+)
+@h.catch
+def export(output_file, file_format: str | None) -> None:
+    """
+    Exports all records to NDJSON or CSV file.
+
+    OUTPUT is path to the file, standard output by default.
+    """
+    if file_format is None:
+        if output_file.name == "<stdout>":
+            file_format = "ndjson"
+        else:
+            file_format = _guess_format(output_file.name)
+    life_recorder = _open_database()
+
+    started = time.perf_counter()
+    count = transfer.write_records(
+        life_recorder.read().values(),
+        output_file,
+        file_format,
+        progress=_report_progress("Exported"),
+    )
+    output_file.flush()
+    _report_throughput("Exported", count, time.perf_counter() - started)
+    sys.exit()
+
+
+@main.command()
+@h.catch
+def serve() -> None:
+    """
+    Serves the database from memory until interrupted.
+
+    Other commands use the running daemon instead of loading the database
+    themselves.
+    """
+    import signal
+
+    from life_recorder.daemon import Daemon
+
+    daemon = Daemon(LifeRecorder(indexed=True))
+    try:
+        daemon.start()
+    except RuntimeError as error:
+        h.add_breakline(print, func_args=[str(error)], both=True)
+        sys.exit(1)
+
+    # Stop the same way on termination as on Ctrl+C.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    click.echo(f"Serving {daemon.life_recorder.path_to_db} at {daemon.path}")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    sys.exit()
+
+
+@main.command()
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(metrics.FORMATS),
+    help="Format of the metrics, guessed from extension of the output file "
+    "or text by default.",
+)
+@click.option(
+    "--output",
+    "-o",
+    "output_file",
+    type=click.File("w"),
+    help="File to export the metrics to.",
+)
+@click.option("--reset", is_flag=True, help="Forget collected metrics.")
+@h.catch
+def stats(output_format: str | None, output_file, reset: bool) -> None:
+    """
+    Reports timings and counters of database operations.
+
+    Metrics are collected by commands and the terminal app run with
+    METRICS=1 and added up when they exit. Metrics of the running daemon
+    are included as well.
+    """
+    from life_recorder.daemon import connect
+
+    path = metrics.metrics_path(LifeRecorder.default_path())
+    if reset:
+        path.unlink(missing_ok=True)
+        click.echo(click.style("Metrics were reset.", fg="green"))
+        sys.exit()
+
+    snapshot = metrics.load(path)
+    client = connect(LifeRecorder.default_path())
+    if client is not None:
+        snapshot = metrics.merge(snapshot, client.metrics())
+        client.close()
+    if not (snapshot["counters"] or snapshot["histograms"]):
+        message = "No metrics were collected, run commands with METRICS=1."
+        h.add_breakline(print, func_args=[message], both=True)
+        sys.exit()
+
+    if output_file is None:
+        click.echo(metrics.export(snapshot, output_format or "text"), nl=False)
+        sys.exit()
+    if output_format is None:
+        try:
+            output_format = metrics.guess_format(output_file.name)
+        except ValueError as error:
+            raise click.BadParameter(
+                str(error), param_hint="'--format'"
+            ) from error
+    output_file.write(metrics.export(snapshot, output_format))
+    message = f"Exported metrics to {output_file.name}."
+    click.echo(click.style(message, fg="green"), err=True)
+    sys.exit()
+
+
+def _open_database(lazy: bool = False):
+    """
+    Returns client of the daemon serving the database, if it's running, or
+    `LifeRecorder` reading the database itself. It's closed when the command
+    exits, however it exits.
+    """
+    from life_recorder.daemon import connect
+
+    life_recorder = connect(LifeRecorder.default_path())
+    if life_recorder is None:
+        life_recorder = LifeRecorder(lazy=lazy)
+    click.get_current_context().call_on_close(life_recorder.close)
+    return life_recorder
+
+
+def _print_records(
+    records, count: int, output_format: str, pager: bool | None
+) -> None:
+    """
+    Print records to standard output, through the pager if it's asked for or
+    if the records don't fit the terminal.
+    """
+    import shutil
+
+    terminal = sys.stdout.isatty()
+    size = shutil.get_terminal_size()
+    if pager is None:
+        lines = count * output.LINES_PER_RECORD.get(output_format, 0)
+        pager = terminal and lines > size.lines
+    if pager:
+        click.echo_via_pager(
+            output.chunks(
+                output.format_records(
+                    records, output_format, color=terminal, width=size.columns
+                )
+            )
+        )
+        return
+
+    try:
+        output.write(
+            records,
+            sys.stdout,
+            output_format,
+            color=terminal,
+            width=size.columns,
+        )
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # Reader of the output has quit, e.g. `head`. Standard output is
+        # pointed to `/dev/null`, so flushing it on exit doesn't fail again.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+
+
+def _profile_startup(arguments: list[str], limit: int = 25) -> int:
+    """
+    Run the command again with `-X importtime` and report the modules that
+    took longest to import, including the ones they imported. Returns exit
+    code of the command.
+    """
+    import subprocess
+
+    arguments = [x for x in arguments if x != "--profile-startup"]
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", __spec__.name, *arguments],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+
+    imports = []
+    for line in process.stderr.splitlines():
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3 or not line.startswith("import time:"):
+            click.echo(line, err=True)
+            continue
+        if not fields[0].strip().isdigit():
+            continue  # header
+        imports.append((int(fields[1]), int(fields[0]), fields[2]))
+
+    total = sum(
+        cumulative
+        for cumulative, _, name in imports
+        if not name.startswith("   ")
+    )
+    click.echo(
+        f"\nImported {len(imports)} modules in {total / 1000:.1f}ms, "
+        f"command took {elapsed * 1000:.1f}ms.",
+        err=True,
+    )
+    click.echo(f"{'cumulative':>12} {'self':>10}  module", err=True)
+    for cumulative, self_time, name in sorted(imports, reverse=True)[:limit]:
+        click.echo(
+            f"{cumulative / 1000:>10.1f}ms {self_time / 1000:>8.1f}ms "
+            f"{name.rstrip()}",
+            err=True,
+        )
+    return process.returncode
+
+
+def _guess_format(path: str) -> str:
+    try:
+        return transfer.guess_format(path)
+    except ValueError as error:
+        raise click.BadParameter(
+            str(error), param_hint="'--format'"
+        ) from error
+
+
+def _report_progress(action: str):
+    def report(count: int) -> None:
+        click.echo(f"{action} {count} records ...", err=True)
+
+    return report
+
+
+def _report_throughput(action: str, count: int, seconds: float) -> None:
+    rate = count / seconds if seconds > 0 else float(count)
+    message = (
+        f"{action} {count} records in {seconds:.2f}s ({rate:.0f} records/sec)."
+    )
+    click.echo(click.style(message, fg="green"), err=True)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,250 @@
+"""
+Module that provides encoding of the database files.
+
+JSON is encoded and decoded with `orjson` when it's installed and with the
+standard `json` module otherwise. The database can also be kept in a binary
+snapshot, which stores packed records as they are kept in memory, see
+`record.Record`, so they are restored without parsing. The format of a file
+is told by its first bytes, see `detect`.
+"""
+
+import gc
+import json
+import struct
+import sys
+from array import array
+from collections.abc import Iterator
+from contextlib import contextmanager
+from importlib.util import find_spec
+from itertools import accumulate
+from typing import Any
+
+from .record import Record, Records, compact, to_json, to_plain_json
+
+FORMATS = ("json", "binary")
+# `orjson` is imported on first use, commands that don't parse the database
+# shouldn't pay for it on startup.
+JSON_LIBRARY = "orjson" if find_spec("orjson") is not None else "json"
+
+
+def dumps(value: Any, indent: bool = False, decompress: bool = False) -> bytes:
+    """
+    Returns value as UTF-8 encoded JSON, indented if asked. Compressed
+    contents of records are kept compressed, unless `decompress` is set.
+    """
+    default = to_plain_json if decompress else to_json
+    if indent:
+        # Keep the layout of debug databases, `orjson` indents by 2 only.
+        return json.dumps(value, indent=4, default=default).encode()
+    if JSON_LIBRARY == "orjson":
+        import orjson
+
+        return orjson.dumps(value, default=default)
+    # `json.dump` with `default` falls back to the pure Python encoder,
+    # while `json.dumps` keeps using the C one.
+    return json.dumps(value, default=default).encode()
+
+
+def loads(data: bytes | str) -> Any:
+    """Returns value decoded from JSON, raises `json.JSONDecodeError`."""
+    if JSON_LIBRARY == "orjson":
+        import orjson
+
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def detect(data: bytes) -> str:
+    """Returns format of the database file based on its first bytes."""
+    return "binary" if data.startswith(Snapshot.MAGIC) else "json"
+
+
+def decode(data: bytes) -> dict:
+    """Returns database decoded from file content in either format."""
+    with _paused_gc():
+        if detect(data) == "binary":
+            return Snapshot.load(data)
+        db = loads(data)
+        if not isinstance(db, dict) or not isinstance(db.get("records"), dict):
+            raise ValueError("Database file has no records.")
+        records = db["records"]
+        if all(
+            type(record) is dict and record.get("id") == identifier
+            for identifier, record in records.items()
+        ):
+            db["records"] = Records.of(map(compact, records.values()))
+        else:
+            db["records"] = Records(
+                {
+                    identifier: (
+                        compact(record) if type(record) is dict else record
+                    )
+                    for identifier, record in records.items()
+                }
+            )
+        return db
+
+
+def encode(db: dict, format: str, indent: bool = False) -> bytes:
+    """Returns database encoded in the format."""
+    if format == "binary":
+        return Snapshot.dump(db)
+    if format == "json":
+        return dumps(db, indent=indent)
+    raise ValueError(
+        f"Unknown database format: {format}. "
+        f"Available formats: {', '.join(FORMATS)}"
+    )
+
+
+class Snapshot:
+    """
+    Binary snapshot of the database.
+
+    The header is followed by JSON sections with distinct tags and with the
+    records that can't be packed, and by arrays with packed identifiers,
+    timestamps, tag numbers and lengths of titles and contents. Titles and
+    contents are stored one after another as a single UTF-8 text.
+    """
+
+    MAGIC = b"LRDB"
+    VERSION = 1
+    HEADER = struct.Struct("<4sB3xQQQQQ")
+
+    @classmethod
+    def dump(cls, db: dict) -> bytes:
+        numbers, epochs = array("q"), array("q")
+        tag_numbers, lengths = array("I"), array("I")
+        tags: dict[str, int] = {}
+        texts = []
+        others = []
+        for position, (identifier, record) in enumerate(db["records"].items()):
+            if type(record) is not Record:
+                record = compact(record)
+            if not cls._packable(identifier, record):
+                others.append([position, identifier, record])
+                continue
+            numbers.append(record.number)
+            epochs.append(record.epoch)
+            tag_numbers.append(tags.setdefault(record.tag, len(tags)))
+            lengths.append(len(record.title))
+            lengths.append(len(record.content))
+            texts.append(record.title)
+            texts.append(record.content)
+
+        sections = [
+            dumps(list(tags)),
+            dumps(others),
+            *(_to_bytes(a) for a in (numbers, epochs, tag_numbers, lengths)),
+            "".join(texts).encode("utf-8", "surrogatepass"),
+        ]
+        header = cls.HEADER.pack(
+            cls.MAGIC,
+            cls.VERSION,
+            db["last_id"],
+            len(numbers),
+            len(sections[0]),
+            len(sections[1]),
+            len(sections[-1]),
+        )
+        return b"".join([header, *sections])
+
+    @classmethod
+    def load(cls, data: bytes) -> dict:
+        if len(data) < cls.HEADER.size:
+            raise ValueError("Snapshot is cut off.")
+        magic, version, last_id, count, tags_size, others_size, text_size = (
+            cls.HEADER.unpack_from(data)
+        )
+        if magic != cls.MAGIC:
+            raise ValueError("Not a database snapshot.")
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported snapshot version: {version}")
+        expected = cls.HEADER.size + tags_size + others_size
+        expected += count * 8 * 2 + count * 4 * 3 + text_size
+        if len(data) != expected:
+            raise ValueError("Snapshot is cut off.")
+
+        view = memoryview(data)
+        position = cls.HEADER.size
+
+        def take(size: int) -> memoryview:
+            nonlocal position
+            position += size
+            return view[position - size : position]
+
+        tags = loads(bytes(take(tags_size)))
+        others = loads(bytes(take(others_size)))
+        numbers = _from_bytes("q", take(count * 8))
+        epochs = _from_bytes("q", take(count * 8))
+        tag_numbers = _from_bytes("I", take(count * 4))
+        lengths = _from_bytes("I", take(count * 4 * 2))
+        text = str(take(text_size), "utf-8", "surrogatepass")
+
+        offsets = [0, *accumulate(lengths)]
+        texts = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+        records = Records.of(
+            map(
+                Record.from_packed,
+                numbers,
+                epochs,
+                [tags[number] for number in tag_numbers],
+                texts[0::2],
+                texts[1::2],
+            )
+        )
+        if others:
+            records = cls._insert(records, others)
+        return {"last_id": last_id, "records": records}
+
+    @staticmethod
+    def _packable(identifier: str, record: Any) -> bool:
+        return (
+            type(record) is Record
+            and record.number is not None
+            and record.epoch is not None
+            and type(record.tag) is str
+            and type(record.title) is str
+            and type(record.content) is str
+            and identifier == record.id
+        )
+
+    @staticmethod
+    def _insert(records: Records, others: list) -> Records:
+        """Returns records with the unpacked ones at their positions."""
+        items = list(records.items())
+        for position, identifier, record in others:
+            if type(record) is dict:
+                record = compact(record)
+            items.insert(position, (identifier, record))
+        return Records(dict(items))
+
+
+@contextmanager
+def _paused_gc() -> Iterator[None]:
+    """
+    Pause garbage collection while the database is built: a million new
+    records would trigger it over and over without anything to collect.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _to_bytes(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode: str, data: memoryview) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
@@ -1,6 +1,38 @@
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+
+def find_dotenv() -> str | None:
+    """
+    Returns path of `.env` file in the directory of the package or above it,
+    same as `dotenv.find_dotenv` looks it up when called from here.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, ".env")
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+# `dotenv` is imported only if there is something to load, it takes a good
+# part of the CLI startup time.
+if (dotenv_path := find_dotenv()) is not None:
+    from dotenv import load_dotenv
+
+    load_dotenv(dotenv_path)
 
 DEBUG = os.getenv("DEBUG", "0") == "1"
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+LOG_COMPACT_THRESHOLD = int(os.getenv("LOG_COMPACT_THRESHOLD", "1000"))
+BACKUPS = int(os.getenv("BACKUPS", "0"))
+DATABASE_FORMAT = os.getenv("DATABASE_FORMAT", "")
+COMPRESS_THRESHOLD = int(os.getenv("COMPRESS_THRESHOLD", "0"))
+COMPRESSION = os.getenv("COMPRESSION", "zlib")
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "256"))
+METRICS = os.getenv("METRICS", "0") == "1"
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", "0"))
+HISTORY_LIMIT = int(os.getenv("HISTORY_LIMIT", "50"))
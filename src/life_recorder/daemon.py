@@ -0,0 +1,252 @@
+"""
+Module that provides a daemon keeping the database in memory and serving it
+over a Unix domain socket, and a client with the interface of
+`LifeRecorder`.
+
+The socket is created next to the database, see `socket_path`. Requests and
+responses are single lines of JSON: `{"op": name, "args": {...}}` is
+answered with `{"result": value}` or `{"error": {"type": ..., "message":
+...}}`. Requests are handled one at a time, so writes are serialized and
+reads never see a half-applied change.
+"""
+
+import os
+import socket
+import threading
+from collections.abc import Callable, Iterable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from . import codec
+from .base import LifeRecorder
+from .metrics import metrics
+
+ERRORS: dict[str, type[Exception]] = {
+    "KeyError": KeyError,
+    "TypeError": TypeError,
+    "ValueError": ValueError,
+}
+"""Exceptions raised by the daemon that are raised again by the client."""
+
+TIMEOUT = 30.0
+
+
+def socket_path(path_to_db: Path) -> Path:
+    """Returns path of the daemon socket of the database."""
+    return path_to_db.with_name(path_to_db.name + ".sock")
+
+
+def connect(path_to_db: Path) -> "RemoteLifeRecorder | None":
+    """
+    Returns client of the daemon serving the database, or `None` if no
+    daemon is running.
+    """
+    connection = _connect(socket_path(path_to_db))
+    if connection is None:
+        return None
+    return RemoteLifeRecorder(connection, path_to_db)
+
+
+def _connect(path: Path) -> socket.socket | None:
+    if not hasattr(socket, "AF_UNIX") or not path.exists():
+        return None
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(str(path))
+    except OSError:
+        # The socket was left behind by a daemon that didn't exit cleanly.
+        connection.close()
+        return None
+    connection.settimeout(TIMEOUT)
+    return connection
+
+
+class RemoteLifeRecorder:
+    """
+    Client of the daemon with the same interface as `LifeRecorder` for
+    reading, searching and changing records.
+    """
+
+    def __init__(self, connection: socket.socket, path_to_db: Path):
+        self.path_to_db = path_to_db
+        self._connection = connection
+        self._file = connection.makefile("rb")
+
+    def create(self, record: dict[str, str]) -> dict[str, str]:
+        return self._call("create", record=record)
+
+    def create_many(
+        self, records: Iterable[dict[str, str]], keep_timestamps: bool = False
+    ) -> list[dict[str, str]]:
+        return self._call(
+            "create_many",
+            records=list(records),
+            keep_timestamps=keep_timestamps,
+        )
+
+    def read(
+        self,
+        tag: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        limit: int | None = None,
+    ) -> dict[str, dict[str, str]]:
+        return self._call(
+            "read",
+            tag=tag,
+            since=since.isoformat() if since is not None else None,
+            until=until.isoformat() if until is not None else None,
+            limit=limit,
+        )
+
+    def read_one(self, identifier: str) -> dict[str, str] | None:
+        return self._call("read_one", identifier=identifier)
+
+    def update(
+        self, identifier: str, record: dict[str, str]
+    ) -> dict[str, str]:
+        return self._call("update", identifier=identifier, record=record)
+
+    def delete(self, identifier: str) -> None:
+        self._call("delete", identifier=identifier)
+
+    def search(
+        self, query: str, limit: int | None = None
+    ) -> list[dict[str, str]]:
+        return self._call("search", query=query, limit=limit)
+
+    def history(self, identifier: str) -> list[dict[str, Any]]:
+        return self._call("history", identifier=identifier)
+
+    def revert(self, identifier: str, revision: int) -> dict[str, str]:
+        return self._call("revert", identifier=identifier, revision=revision)
+
+    def prune_history(self, keep: int | None = None) -> int:
+        return self._call("prune_history", keep=keep)
+
+    def ping(self) -> bool:
+        return self._call("ping")
+
+    def metrics(self) -> dict:
+        """Returns metrics collected by the daemon since it was started."""
+        return self._call("metrics")
+
+    def close(self) -> None:
+        self._file.close()
+        self._connection.close()
+
+    def _call(self, op: str, **args: Any) -> Any:
+        self._connection.sendall(codec.dumps({"op": op, "args": args}) + b"\n")
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Daemon closed the connection.")
+        response = codec.loads(line)
+        if "error" in response:
+            error = response["error"]
+            raise ERRORS.get(error["type"], RuntimeError)(error["message"])
+        return response["result"]
+
+
+class Daemon:
+    """
+    Server that keeps `LifeRecorder` with its indexes in memory and answers
+    requests of `RemoteLifeRecorder` clients.
+    """
+
+    def __init__(self, life_recorder: LifeRecorder, path: Path | None = None):
+        self.life_recorder = life_recorder
+        self.path = path or socket_path(life_recorder.path_to_db)
+        self._lock = threading.Lock()
+        self._server = None
+        self.operations: dict[str, Callable[..., Any]] = {
+            "ping": lambda: True,
+            "create": life_recorder.create,
+            "create_many": life_recorder.create_many,
+            "read": self._read,
+            "read_one": life_recorder.read_one,
+            "update": life_recorder.update,
+            "delete": life_recorder.delete,
+            "search": life_recorder.search,
+            "history": life_recorder.history,
+            "revert": life_recorder.revert,
+            "prune_history": life_recorder.prune_history,
+            "metrics": metrics.snapshot,
+        }
+
+    def start(self) -> None:
+        """Bind the socket and build indexes, so first requests are fast."""
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("Unix domain sockets are not supported.")
+        running = _connect(self.path)
+        if running is not None:
+            running.close()
+            raise RuntimeError(f"Daemon is already running at {self.path}")
+        self.path.unlink(missing_ok=True)
+
+        # Imported only here, clients don't need it.
+        import socketserver
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                for line in self.rfile:
+                    self.wfile.write(daemon.handle(line) + b"\n")
+
+        self._server = socketserver.ThreadingUnixStreamServer(
+            str(self.path), Handler
+        )
+        self._server.daemon_threads = True
+        os.chmod(self.path, 0o600)
+        self.life_recorder.warm()
+
+    def serve_forever(self) -> None:
+        """Answer requests until `shutdown` is called."""
+        if self._server is None:
+            self.start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self.path.unlink(missing_ok=True)
+            self.life_recorder.close()
+
+    def shutdown(self) -> None:
+        """Stop serving requests, from another thread."""
+        if self._server is not None:
+            self._server.shutdown()
+
+    def handle(self, line: bytes) -> bytes:
+        """Returns encoded response to the encoded request."""
+        try:
+            request = codec.loads(line)
+            operation = self.operations.get(request["op"])
+            if operation is None:
+                raise ValueError(f"Unknown operation: {request['op']}")
+            with self._lock:
+                result = operation(**request.get("args", {}))
+                return codec.dumps({"result": result}, decompress=True)
+        except Exception as error:
+            return codec.dumps(
+                {
+                    "error": {
+                        "type": type(error).__name__,
+                        "message": str(error),
+                    }
+                }
+            )
+
+    def _read(
+        self,
+        tag: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        limit: int | None = None,
+    ) -> dict[str, dict[str, str]]:
+        return self.life_recorder.read(
+            tag=tag,
+            since=datetime.fromisoformat(since) if since else None,
+            until=datetime.fromisoformat(until) if until else None,
+            limit=limit,
+        )
@@ -0,0 +1,104 @@
+"""
+Module that provides the feed of changes made to life records, both by this
+process and, once the database is reloaded, by other processes.
+"""
+
+import threading
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from typing import NamedTuple
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+
+class Change(NamedTuple):
+    """
+    Change of a single record. `version` is the version of the feed after
+    the change, which is also the version of the record until it changes
+    again.
+    """
+
+    kind: str
+    identifier: str
+    version: int
+
+
+Listener = Callable[[Change], None]
+"""Callback receiving every change published by the feed."""
+
+
+class ChangeFeed:
+    """
+    Publishes changes of records to subscribed listeners and keeps version
+    of every record changed since the feed was created.
+
+    Listeners are called in the thread that made or loaded the change, with
+    the database locked, so they should only hand the change over, e.g. post
+    a message to the UI.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.versions: dict[str, int] = {}
+        self._listeners: list[Listener] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: Listener) -> Callable[[], None]:
+        """Subscribe the listener, returns function that unsubscribes it."""
+        with self._lock:
+            self._listeners.append(listener)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+
+        return unsubscribe
+
+    @property
+    def active(self) -> bool:
+        """Return whether anyone is listening to the feed."""
+        return bool(self._listeners)
+
+    def version_of(self, identifier: str) -> int:
+        """
+        Returns version of the record, `0` if it hasn't changed since the
+        feed was created.
+        """
+        return self.versions.get(identifier, 0)
+
+    def publish(self, changes: Iterable[tuple[str, str]]) -> list[Change]:
+        """
+        Assign versions to changes given as `(kind, identifier)` pairs and
+        pass them to listeners. Returns published changes.
+        """
+        with self._lock:
+            published = []
+            for kind, identifier in changes:
+                self.version += 1
+                if kind == DELETED:
+                    self.versions.pop(identifier, None)
+                else:
+                    self.versions[identifier] = self.version
+                published.append(Change(kind, identifier, self.version))
+            listeners = list(self._listeners)
+        for change in published:
+            for listener in listeners:
+                listener(change)
+        return published
+
+
+def diff(
+    old: Mapping[str, Mapping[str, str]], new: Mapping[str, Mapping[str, str]]
+) -> Iterator[tuple[str, str]]:
+    """Yields `(kind, identifier)` pairs that turn old records into new."""
+    for identifier, record in new.items():
+        previous = old.get(identifier)
+        if previous is None:
+            yield CREATED, identifier
+        elif previous is not record and previous != record:
+            yield UPDATED, identifier
+    for identifier in old:
+        if identifier not in new:
+            yield DELETED, identifier
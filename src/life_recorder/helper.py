@@ -1,18 +1,66 @@
 """Module contains helper functions for LifeRecorder class."""
 
-from datetime import datetime
+from datetime import datetime, timezone
+import functools
 import os
-import click
-from rich import print
 from typing import Dict, List
 
 from . import config
 
+TIMESTAMP_FORMAT = "%d-%b-%Y %H:%M"
+LABELS = ("Id:", "Timestamp:", "Tag:", "Title:", "Content:")
+
+
+class LazyLogger:
+    """
+    Proxy of `loguru.logger` that imports it on first use, since importing
+    `loguru` takes longer than everything else the CLI does on startup.
+    """
+
+    def __getattr__(self, name: str):
+        from loguru import logger
+
+        return getattr(logger, name)
+
+
+logger = LazyLogger()
+
+
+def catch(function):
+    """
+    Decorator that logs and swallows exceptions of the function, same as
+    `logger.catch`, but imports `loguru` only once something is raised.
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        except Exception as error:
+            logger.opt(exception=error).error(
+                "An error has been caught in function '{}'",
+                function.__qualname__,
+            )
+
+    return wrapper
+
 
 def get_timestamp() -> str:
     """Function returns the timestamp."""
 
-    return datetime.now().strftime("%d-%b-%Y %H:%M")
+    return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+
+def parse_timestamp(timestamp: str) -> int:
+    """Returns record timestamp as seconds since epoch, read as UTC time."""
+
+    return get_epoch(datetime.strptime(timestamp, TIMESTAMP_FORMAT))
+
+
+def get_epoch(moment: datetime) -> int:
+    """Returns naive datetime as seconds since epoch, read as UTC time."""
+
+    return int(moment.replace(tzinfo=timezone.utc).timestamp())
 
 
 def update_database(database: Dict, record: Dict) -> Dict:
@@ -67,19 +115,32 @@ def add_breakline(func, func_args: List, before: bool = False,
         func(*func_args)
         print()
 
-def pretty_record(record: dict) -> str:
-    """Returns a pretty-printed string of a record."""
-
+def pretty_record(record: dict, color: bool = True) -> str:
+    """
+    Returns a pretty-printed string of a record, with styled labels unless
+    `color` is unset.
+    """
+    labels = _styled_labels() if color else LABELS
     return (
-        f"{click.style('Id:', fg='white')} #{record['id']} \n"
-        f"{click.style('Timestamp:', fg='white')} {record['timestamp']} \n"
-        f"{click.style('Tag:', fg='white')} {record['tag']} \n"
-        f"{click.style('Title:', fg='white')} {record['title']} \n"
-        f"{click.style('Content:', fg='white')} {record['content']}"
+        f"{labels[0]} #{record['id']} \n"
+        f"{labels[1]} {record['timestamp']} \n"
+        f"{labels[2]} {record['tag']} \n"
+        f"{labels[3]} {record['title']} \n"
+        f"{labels[4]} {record['content']}"
     )
 
 
+@functools.cache
+def _styled_labels() -> tuple[str, ...]:
+    """Returns field labels of pretty-printed records, styled once."""
+    import click
+
+    return tuple(click.style(label, fg="white") for label in LABELS)
+
+
 def print_pretty_record(record: dict) -> None:
+    import click
+
     click.echo(pretty_record(record))
 
 
@@ -0,0 +1,237 @@
+"""
+Module that keeps revision history of life records.
+
+Every update appends the previous version of the record to the history file
+next to the database, e.g. `life_records.json.history`, as a line of JSON
+with a delta that turns the new version back into the old one rather than a
+copy of it. Versions are restored by applying the deltas to the current
+record one after another, newest first, so a note edited many times costs
+only the text that was changed. The file is read only when history of a
+record is asked for, loading the database doesn't touch it.
+
+Every delta is checked against the version it applies to, so revisions
+written for a change that wasn't saved after all are skipped.
+"""
+
+import re
+import zlib
+from collections.abc import Container, Iterable, Mapping
+from pathlib import Path
+from typing import Any
+
+from . import codec
+from .storage import write_atomic
+
+FIELDS = ("tag", "title", "content")
+"""Fields of records that can be changed, and are kept in history."""
+
+TOKEN = re.compile(r"\s*\S+\s*|\s+")
+
+PRUNE_SIZE = 1024 * 1024
+"""History is pruned once it's bigger than this and twice its pruned size."""
+
+Delta = dict[str, list[list]]
+"""Start, end and replacement of every changed run of text, by field."""
+
+
+def make_delta(new: Mapping[str, str], old: Mapping[str, str]) -> Delta:
+    """Returns delta that turns fields of the new version into the old."""
+    # Imported only here, it isn't needed until a record is updated.
+    import difflib
+
+    delta = {}
+    for field in FIELDS:
+        new_text, old_text = new[field], old[field]
+        if new_text == old_text:
+            continue
+        # Texts are compared word by word, which is much faster than by
+        # characters and keeps deltas of edited notes small all the same.
+        new_words, old_words = TOKEN.findall(new_text), TOKEN.findall(old_text)
+        starts = [0]
+        for word in new_words:
+            starts.append(starts[-1] + len(word))
+        # Edits are usually in one place, only the words between the common
+        # beginning and end are matched. Words that are frequent in long
+        # runs are ignored by the matcher, which keeps it fast but may make
+        # the delta bigger.
+        first = 0
+        limit = min(len(new_words), len(old_words))
+        while first < limit and new_words[first] == old_words[first]:
+            first += 1
+        last = 0
+        while (
+            last < limit - first
+            and new_words[-1 - last] == old_words[-1 - last]
+        ):
+            last += 1
+        new_words = new_words[first : len(new_words) - last]
+        old_words = old_words[first : len(old_words) - last]
+        matcher = difflib.SequenceMatcher(None, new_words, old_words)
+        delta[field] = [
+            [
+                starts[first + i1],
+                starts[first + i2],
+                "".join(old_words[j1:j2]),
+            ]
+            for operation, i1, i2, j1, j2 in matcher.get_opcodes()
+            if operation != "equal"
+        ]
+    return delta
+
+
+def apply_delta(record: Mapping[str, str], delta: Delta) -> dict[str, str]:
+    """Returns copy of the record with the delta applied to its fields."""
+    version = dict(record)
+    for field, changes in delta.items():
+        text = version[field]
+        parts = []
+        position = 0
+        for start, end, replacement in changes:
+            parts.append(text[position:start])
+            parts.append(replacement)
+            position = end
+        parts.append(text[position:])
+        version[field] = "".join(parts)
+    return version
+
+
+def checksum(record: Mapping[str, str]) -> int:
+    """Returns checksum of the fields of the record kept in history."""
+    text = "\0".join(record[field] for field in FIELDS)
+    return zlib.crc32(text.encode("utf-8", "surrogatepass"))
+
+
+def make_revision(
+    old: Mapping[str, str], new: Mapping[str, str], saved: str
+) -> dict[str, Any] | None:
+    """
+    Returns revision with the old version of the record, replaced by the
+    new one at the time `saved`, or `None` if no kept field has changed.
+    """
+    delta = make_delta(new, old)
+    if not delta:
+        return None
+    return {
+        "id": new["id"],
+        "saved": saved,
+        "of": checksum(new),
+        "delta": delta,
+    }
+
+
+class History:
+    """Revision history of records of the database, kept in its file."""
+
+    VERSION = 1
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    @classmethod
+    def for_database(cls, path_to_db: Path) -> "History":
+        return cls(path_to_db.with_name(path_to_db.name + ".history"))
+
+    def append(self, revisions: Iterable[dict[str, Any]]) -> None:
+        """Add revisions to the end of the history file."""
+        data = b"".join(
+            codec.dumps(revision) + b"\n" for revision in revisions
+        )
+        if not data:
+            return
+        with open(self.path, "a+b") as f:
+            # A line cut off by a killed process is left on a line of its
+            # own, so the revisions after it can still be read.
+            if f.seek(0, 2) > 0:
+                f.seek(-1, 2)
+                if f.read(1) != b"\n":
+                    data = b"\n" + data
+            f.write(data)
+
+    def versions(
+        self,
+        record: Mapping[str, str],
+        limit: int | None = None,
+        unsaved: Iterable[dict[str, Any]] = (),
+    ) -> list[dict[str, str]]:
+        """
+        Returns versions of the record, newest first, starting with the
+        record itself, each with the time it was saved as `saved`. At most
+        `limit` previous versions are returned. Unsaved revisions are taken
+        as if they were appended to the file.
+        """
+        identifier = record["id"]
+        revisions = [
+            revision
+            for revision in (*self._read(), *unsaved)
+            if revision["id"] == identifier
+        ]
+        version = dict(record)
+        versions = []
+        for revision in reversed(revisions):
+            if limit is not None and len(versions) >= limit:
+                break
+            # Left by a change that failed to be saved.
+            if revision["of"] != checksum(version):
+                continue
+            versions.append({**version, "saved": revision["saved"]})
+            version = apply_delta(version, revision["delta"])
+        versions.append({**version, "saved": record["timestamp"]})
+        return versions
+
+    def oversized(self) -> bool:
+        """Returns whether the history has grown enough to be pruned."""
+        try:
+            with open(self.path, "rb") as f:
+                header = self._decode(f.readline()) or {}
+                size = f.seek(0, 2)
+        except FileNotFoundError:
+            return False
+        return size > max(PRUNE_SIZE, 2 * header.get("pruned", 0))
+
+    def prune(self, keep: int, identifiers: Container[str]) -> int:
+        """
+        Keep only the newest `keep` revisions of every record and drop the
+        history of records that are not among identifiers. Returns number
+        of dropped revisions.
+        """
+        revisions = self._read()
+        counts: dict[str, int] = {}
+        kept = []
+        for revision in reversed(revisions):
+            identifier = revision["id"]
+            count = counts.get(identifier, 0)
+            if count < keep and identifier in identifiers:
+                kept.append(revision)
+                counts[identifier] = count + 1
+        kept.reverse()
+
+        lines = b"".join(codec.dumps(revision) + b"\n" for revision in kept)
+        # Size after pruning is kept in the header, so that history that
+        # is big with only kept revisions isn't pruned on every change.
+        header = {"version": self.VERSION, "pruned": len(lines)}
+        data = codec.dumps(header) + b"\n" + lines
+        write_atomic(self.path, lambda f: f.write(data), binary=True)
+        return len(revisions) - len(kept)
+
+    def _read(self) -> list[dict[str, Any]]:
+        """Returns revisions in the history file, oldest first."""
+        try:
+            with open(self.path, "rb") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        revisions = []
+        for line in lines:
+            revision = self._decode(line)
+            if revision is not None and "id" in revision:
+                revisions.append(revision)
+        return revisions
+
+    @staticmethod
+    def _decode(line: bytes) -> dict[str, Any] | None:
+        try:
+            value = codec.loads(line)
+        except ValueError:
+            # The last line of a process that was killed while writing it.
+            return None
+        return value if isinstance(value, dict) else None
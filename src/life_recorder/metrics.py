@@ -0,0 +1,340 @@
+"""
+Module that provides counters and timings of database operations, collected
+when `config.METRICS` is set.
+
+Every process keeps its metrics in memory and adds them to the metrics file
+next to the database on exit, see `Metrics.persist`, which is what the
+`stats` command reports. Metrics are reported as text, in Prometheus text
+format or as JSON.
+
+When metrics are disabled, an instrumented call costs a single check of
+`Metrics.enabled`.
+"""
+
+import functools
+import json
+import threading
+import time
+from collections.abc import Callable, Mapping
+from pathlib import Path
+from typing import Any, TypeVar
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from . import config
+
+T = TypeVar("T")
+
+FORMATS = ("text", "prometheus", "json")
+PREFIX = "life_recorder_"
+BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+"""Upper bounds of histogram buckets in seconds, the last one is infinite."""
+
+Snapshot = dict[str, dict[str, Any]]
+"""Counters and histograms as saved in the metrics file."""
+
+
+class Histogram:
+    """Distribution of durations, counted in `BUCKETS`."""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for number, bound in enumerate(BUCKETS):
+            if value <= bound:
+                break
+        else:
+            number = len(BUCKETS)
+        self.counts[number] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "counts": list(self.counts),
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+class Metrics:
+    """Counters and histograms of durations of a single process."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.path: Path | None = None
+        self.counters: dict[str, float] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self._collectors: list[Callable[[], Mapping[str, float]]] = []
+        # Values of collected counters at the last reset.
+        self._baselines: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1) -> None:
+        """Add amount to the counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Add duration to the histogram."""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def register(self, collector: Callable[[], Mapping[str, float]]) -> None:
+        """
+        Add counters returned by the collector to every snapshot, e.g. hits
+        of a cache that counts them itself.
+        """
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Snapshot:
+        """Returns counters and histograms collected so far."""
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {
+                name: histogram.to_dict()
+                for name, histogram in self.histograms.items()
+            }
+        for name, value in self._collect().items():
+            baseline = self._baselines.get(name, 0)
+            # Counts reset by their owner since then are taken as they are.
+            if value >= baseline:
+                value -= baseline
+            if value > 0:
+                counters[name] = counters.get(name, 0) + value
+        return {"counters": counters, "histograms": histograms}
+
+    def reset(self) -> None:
+        """Forget collected counters and histograms."""
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self._baselines = self._collect()
+
+    def _collect(self) -> dict[str, float]:
+        counters: dict[str, float] = {}
+        for collector in self._collectors:
+            counters.update(collector())
+        return counters
+
+    def persist(self, path: Path) -> None:
+        """
+        Add metrics of this process to the metrics file when it exits. Only
+        the first database opened by the process gets them.
+        """
+        if self.path is not None:
+            return
+        import atexit
+
+        self.path = path
+        atexit.register(self.save)
+
+    def save(self, path: Path | None = None) -> None:
+        """Add metrics collected so far to the metrics file and reset them."""
+        path = path or self.path
+        snapshot = self.snapshot()
+        if path is None or not (
+            snapshot["counters"] or snapshot["histograms"]
+        ):
+            return
+        # Other processes add their metrics to the same file, it's changed
+        # in place under the lock.
+        with open(path, "a+") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            merged = merge(_decode(f.read()), snapshot)
+            f.seek(0)
+            f.truncate()
+            json.dump(merged, f)
+        self.reset()
+
+
+def timed(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    Decorator that records duration of the function in the `<name>_seconds`
+    histogram and counts its errors in `<name>_errors_total`.
+    """
+
+    def decorate(function: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs) -> T:
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                metrics.inc(f"{name}_errors_total")
+                raise
+            finally:
+                metrics.observe(
+                    f"{name}_seconds", time.perf_counter() - started
+                )
+
+        return wrapper
+
+    return decorate
+
+
+def metrics_path(path_to_db: Path) -> Path:
+    """Returns path of the metrics file of the database."""
+    return path_to_db.with_name(path_to_db.name + ".metrics")
+
+
+def load(path: Path) -> Snapshot:
+    """Returns metrics saved in the file, empty if there are none."""
+    try:
+        with open(path, "r") as f:
+            return _decode(f.read())
+    except FileNotFoundError:
+        return _decode("")
+
+
+def merge(first: Snapshot, second: Snapshot) -> Snapshot:
+    """Returns sum of counters and histograms of both snapshots."""
+    counters = dict(first["counters"])
+    for name, value in second["counters"].items():
+        counters[name] = counters.get(name, 0) + value
+    histograms = {
+        name: dict(histogram)
+        for name, histogram in first["histograms"].items()
+    }
+    for name, histogram in second["histograms"].items():
+        if name not in histograms:
+            histograms[name] = dict(histogram)
+            continue
+        total = histograms[name]
+        total["counts"] = [
+            x + y for x, y in zip(total["counts"], histogram["counts"])
+        ]
+        total["sum"] += histogram["sum"]
+        total["count"] += histogram["count"]
+    return {"counters": counters, "histograms": histograms}
+
+
+def to_prometheus(snapshot: Snapshot) -> str:
+    """Returns metrics in Prometheus text exposition format."""
+    lines = []
+    for name, value in sorted(snapshot["counters"].items()):
+        lines.append(f"# TYPE {PREFIX}{name} counter")
+        lines.append(f"{PREFIX}{name} {_number(value)}")
+    for name, histogram in sorted(snapshot["histograms"].items()):
+        lines.append(f"# TYPE {PREFIX}{name} histogram")
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, "+Inf"), histogram["counts"]):
+            cumulative += count
+            lines.append(f'{PREFIX}{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{PREFIX}{name}_sum {_number(histogram['sum'])}")
+        lines.append(f"{PREFIX}{name}_count {histogram['count']}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def to_json(snapshot: Snapshot) -> str:
+    """Returns metrics as JSON, with bounds of histogram buckets."""
+    return json.dumps({**snapshot, "buckets": BUCKETS}, indent=4) + "\n"
+
+
+def to_text(snapshot: Snapshot) -> str:
+    """Returns metrics as a table meant to be read by people."""
+    lines = []
+    if snapshot["histograms"]:
+        lines.append(
+            f"{'operation':<20} {'calls':>8} {'mean':>10} {'p95':>10} "
+            f"{'total':>10}"
+        )
+        for name, histogram in sorted(snapshot["histograms"].items()):
+            count = histogram["count"]
+            lines.append(
+                f"{name.removesuffix('_seconds'):<20} {count:>8} "
+                f"{_duration(histogram['sum'] / count if count else 0):>10} "
+                f"{_percentile(histogram, 0.95):>10} "
+                f"{_duration(histogram['sum']):>10}"
+            )
+    if snapshot["counters"]:
+        if lines:
+            lines.append("")
+        width = max(map(len, snapshot["counters"]))
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"{name:<{width}} {_number(value):>12}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def export(snapshot: Snapshot, format: str) -> str:
+    """Returns metrics in the format, one of `FORMATS`."""
+    if format == "text":
+        return to_text(snapshot)
+    if format == "prometheus":
+        return to_prometheus(snapshot)
+    if format == "json":
+        return to_json(snapshot)
+    raise ValueError(f"Unknown format: {format}")
+
+
+def guess_format(path: str | Path) -> str:
+    """Returns the format of the export file based on its extension."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".json":
+        return "json"
+    if suffix == ".prom":
+        return "prometheus"
+    if suffix == ".txt":
+        return "text"
+    raise ValueError(
+        f"Can't guess format of {path}, use one of: {', '.join(FORMATS)}"
+    )
+
+
+def _decode(data: str) -> Snapshot:
+    try:
+        snapshot = json.loads(data)
+    except ValueError:
+        # Metrics of a process that was killed while saving them are lost.
+        snapshot = None
+    if not isinstance(snapshot, dict):
+        return {"counters": {}, "histograms": {}}
+    return {
+        "counters": snapshot.get("counters", {}),
+        "histograms": {
+            name: histogram
+            for name, histogram in snapshot.get("histograms", {}).items()
+            if len(histogram.get("counts", ())) == len(BUCKETS) + 1
+        },
+    }
+
+
+def _percentile(histogram: Mapping[str, Any], share: float) -> str:
+    """Returns upper bound of the bucket the share of durations falls in."""
+    if not histogram["count"]:
+        return "-"
+    cumulative = 0
+    for bound, count in zip(BUCKETS, histogram["counts"]):
+        cumulative += count
+        if cumulative >= share * histogram["count"]:
+            return f"<{_duration(bound)}"
+    return f">{_duration(BUCKETS[-1])}"
+
+
+def _duration(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    return f"{seconds * 1000:.2f}ms"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+metrics = Metrics(enabled=config.METRICS)
+"""Metrics of this process."""
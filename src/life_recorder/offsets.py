@@ -0,0 +1,396 @@
+"""
+Module that provides offset index of records in the JSON database.
+
+The index is kept in a sidecar file next to the database and maps numeric
+part of record identifiers, i.e. `N` in `lr-N`, to the byte range of the
+record in the database file. Entries have fixed size and are sorted, so a
+single record is found with a binary search over the sidecar without reading
+it as a whole.
+
+Databases saved with the index keep every record in a slot padded with
+spaces and `last_id` in a field of fixed width, so that a changed record
+that still fits its slot, a new record or a new `last_id` can be written in
+place and a deleted record can be blanked out, see `JsonStorage.write`.
+"""
+
+import json
+import os
+import re
+import struct
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from . import codec
+
+IDENTIFIER = re.compile(r"lr-(\d+)")
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+SLOT = 64
+"""Records are padded to a multiple of `SLOT` bytes, leaving room to grow."""
+LAST_ID_WIDTH = 20
+LAST_ID_OFFSET = len(b'{"last_id": ')
+HEAD = re.compile(rb'\{"last_id": \d+ *, "records": \{')
+HEAD_SIZE = LAST_ID_OFFSET + LAST_ID_WIDTH + len(b', "records": {')
+
+Entry = tuple[int, int, int]
+"""Numeric identifier, byte offset and byte length of the record."""
+
+
+def get_number(identifier: str) -> int | None:
+    """Returns numeric part of `lr-N` identifier or `None`."""
+    match = IDENTIFIER.fullmatch(identifier)
+    return int(match.group(1)) if match else None
+
+
+class OffsetIndex:
+    """Sidecar index of record offsets in the JSON database."""
+
+    MAGIC = b"LRIX"
+    VERSION = 1
+    HEADER = struct.Struct("<4sB3xQQQQ")
+    ENTRY = struct.Struct("<IQI")
+
+    def __init__(self, path: Path, path_to_db: Path):
+        self.path = path
+        self.path_to_db = path_to_db
+        self.last_id = 0
+        self.count = 0
+
+    @classmethod
+    def for_database(cls, path_to_db: Path) -> "OffsetIndex":
+        return cls(path_to_db.with_name(path_to_db.name + ".idx"), path_to_db)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def remove(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+    def load(self) -> bool:
+        """
+        Read index header, return `False` if the index is missing or does
+        not match the current database file.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                header = f.read(self.HEADER.size)
+        except FileNotFoundError:
+            return False
+        if len(header) != self.HEADER.size:
+            return False
+
+        magic, version, size, mtime_ns, last_id, count = self.HEADER.unpack(
+            header
+        )
+        if magic != self.MAGIC or version != self.VERSION:
+            return False
+        if (size, mtime_ns) != self._stamp():
+            return False
+
+        self.last_id = last_id
+        self.count = count
+        return True
+
+    def build(self) -> bool:
+        """
+        Scan the database file and write the index, return `False` if the
+        database can't be indexed.
+        """
+        scanned = scan_database(self.path_to_db)
+        if scanned is None:
+            self.remove()
+            return False
+        self.write(*scanned)
+        return self.load()
+
+    def write(self, last_id: int, entries: list[Entry]) -> None:
+        """Write the index for the current state of the database file."""
+        entries = sorted(entries)
+        size, mtime_ns = self._stamp()
+        with open(self.path, "wb") as f:
+            f.write(
+                self.HEADER.pack(
+                    self.MAGIC,
+                    self.VERSION,
+                    size,
+                    mtime_ns,
+                    last_id,
+                    len(entries),
+                )
+            )
+            f.write(b"".join(self.ENTRY.pack(*entry) for entry in entries))
+
+    def extend(self, last_id: int, entries: list[Entry]) -> None:
+        """
+        Add entries of records appended to the database file, numbered
+        after all indexed ones, and stamp the index with the current state
+        of the file.
+        """
+        size, mtime_ns = self._stamp()
+        with open(self.path, "r+b") as f:
+            f.seek(self.HEADER.size + self.count * self.ENTRY.size)
+            f.write(b"".join(self.ENTRY.pack(*entry) for entry in entries))
+            self.last_id = last_id
+            self.count += len(entries)
+            f.seek(0)
+            f.write(
+                self.HEADER.pack(
+                    self.MAGIC,
+                    self.VERSION,
+                    size,
+                    mtime_ns,
+                    last_id,
+                    self.count,
+                )
+            )
+
+    def last_number(self) -> int:
+        """Returns the highest indexed numeric identifier, `0` if none."""
+        if self.count == 0:
+            return 0
+        with open(self.path, "rb") as f:
+            f.seek(self.HEADER.size + (self.count - 1) * self.ENTRY.size)
+            return self.ENTRY.unpack(f.read(self.ENTRY.size))[0]
+
+    def entries(self) -> list[Entry]:
+        """Returns all entries of the index, sorted by numeric identifier."""
+        with open(self.path, "rb") as f:
+            f.seek(self.HEADER.size)
+            data = f.read(self.count * self.ENTRY.size)
+        return list(self.ENTRY.iter_unpack(data))
+
+    def lookup(self, identifier: str) -> tuple[int, int] | None:
+        """Returns byte offset and length of the record, if it's indexed."""
+        number = get_number(identifier)
+        if number is None or self.count == 0:
+            return None
+
+        with open(self.path, "rb") as f:
+            low, high = 0, self.count
+            while low < high:
+                middle = (low + high) // 2
+                f.seek(self.HEADER.size + middle * self.ENTRY.size)
+                entry = self.ENTRY.unpack(f.read(self.ENTRY.size))
+                if entry[0] < number:
+                    low = middle + 1
+                elif entry[0] > number:
+                    high = middle
+                else:
+                    return entry[1], entry[2]
+        return None
+
+    def read(self, identifier: str) -> dict[str, str] | None:
+        """Read a single record from the database file by its offset."""
+        location = self.lookup(identifier)
+        if location is None:
+            return None
+
+        offset, length = location
+        with open(self.path_to_db, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def _stamp(self) -> tuple[int, int]:
+        stat = os.stat(self.path_to_db)
+        return stat.st_size, stat.st_mtime_ns
+
+
+def dump_database(db: dict, f) -> tuple[int, list[Entry]] | None:
+    """
+    Write db as JSON to the binary file f, with records in slots and
+    `last_id` padded to `LAST_ID_WIDTH`, and return the offsets of the
+    records, or `None` if some identifier is not indexable.
+    """
+    entries = []
+    position = 0
+    chunk = []
+
+    def write(data: bytes) -> None:
+        nonlocal position
+        chunk.append(data)
+        position += len(data)
+        if len(chunk) >= 1024:
+            f.write(b"".join(chunk))
+            chunk.clear()
+
+    indexable = db.keys() == {"last_id", "records"}
+    write(b'{"last_id": ' + pad_last_id(db["last_id"]) + b', "records": {')
+    for i, (identifier, record) in enumerate(db["records"].items()):
+        number = get_number(identifier)
+        if number is None:
+            indexable = False
+        write(b"%s%s: " % (b", " if i else b"", codec.dumps(identifier)))
+        value = slot(codec.dumps(record))
+        if number is not None:
+            entries.append((number, position, len(value)))
+        write(value)
+    write(b"}}")
+    f.write(b"".join(chunk))
+
+    if not indexable:
+        return None
+    return db["last_id"], entries
+
+
+def blank_records(
+    entries: list[Entry], removed: set[int]
+) -> list[tuple[int, int]]:
+    """
+    Returns byte ranges of the database file to fill with spaces to delete
+    the removed records in place, given entries of all indexed records.
+
+    Every record but the first one is preceded by the comma before its key,
+    so a run of removed records is blanked together with the comma before
+    it, or with the comma before the next record if the run comes first.
+    """
+    entries = sorted(entries, key=lambda entry: entry[1])
+    ranges = []
+    kept_before = False
+    i = 0
+    while i < len(entries):
+        if entries[i][0] not in removed:
+            kept_before = True
+            i += 1
+            continue
+        first = entries[i]
+        while i < len(entries) and entries[i][0] in removed:
+            i += 1
+        number, offset, length = entries[i - 1]
+        if kept_before:
+            ranges.append((_key_offset(first) - 2, offset + length))
+        elif i < len(entries):
+            ranges.append((_key_offset(first), _key_offset(entries[i])))
+        else:
+            ranges.append((_key_offset(first), offset + length))
+    return ranges
+
+
+def _key_offset(entry: Entry) -> int:
+    number, offset, _ = entry
+    return offset - len(b'"lr-%d": ' % number)
+
+
+def slot(value: bytes) -> bytes:
+    """Returns encoded record padded with spaces to its slot."""
+    return value.ljust((len(value) // SLOT + 1) * SLOT)
+
+
+def pad_last_id(last_id: int) -> bytes:
+    """Returns `last_id` padded to its field, raises if it doesn't fit."""
+    field = str(int(last_id)).encode().ljust(LAST_ID_WIDTH)
+    if len(field) > LAST_ID_WIDTH:
+        raise ValueError(f"Last identifier is too big: {last_id}")
+    return field
+
+
+def is_slotted(path_to_db: Path) -> bool:
+    """Returns whether the database file was written by `dump_database`."""
+    with open(path_to_db, "rb") as f:
+        return HEAD.fullmatch(f.read(HEAD_SIZE)) is not None
+
+
+def scan_database(path_to_db: Path) -> tuple[int, list[Entry]] | None:
+    """
+    Find byte offsets of all records in the database file with a single
+    pass. Returns `None` if some identifier is not indexable.
+    """
+    with open(path_to_db, "rb") as f:
+        data = f.read()
+    text = data.decode("utf-8")
+    to_bytes = _ByteOffsets(text, ascii=len(text) == len(data))
+
+    last_id = 0
+    entries = []
+    for key, value, start, end, is_record in walk_database(text):
+        if not is_record:
+            if key == "last_id":
+                last_id = value
+            continue
+        number = get_number(key)
+        if number is None:
+            return None
+        offset = to_bytes(start)
+        entries.append((number, offset, to_bytes(end) - offset))
+
+    return last_id, entries
+
+
+def salvage_database(text: str) -> dict:
+    """
+    Returns database with records that were completely written before the
+    text got cut off or corrupted.
+    """
+    db = {"last_id": 0, "records": {}}
+    try:
+        for key, value, _, _, is_record in walk_database(text):
+            if is_record:
+                db["records"][key] = value
+            elif key == "last_id" and isinstance(value, int):
+                db["last_id"] = value
+    except (ValueError, IndexError):
+        pass
+
+    numbers = [get_number(identifier) for identifier in db["records"]]
+    db["last_id"] = max([db["last_id"], *filter(None, numbers)])
+    return db
+
+
+def walk_database(text: str) -> Iterator[tuple[str, Any, int, int, bool]]:
+    """
+    Yields key, value and character range of the value for top-level keys
+    of the database and for each record, flagged as `is_record`.
+    """
+    decoder = json.JSONDecoder()
+
+    def skip(position: int) -> int:
+        return WHITESPACE.match(text, position).end()
+
+    def expect(position: int, character: str) -> int:
+        if text[position] != character:
+            raise json.JSONDecodeError(
+                f"Expecting '{character}'", text, position
+            )
+        return skip(position + 1)
+
+    position = expect(skip(0), "{")
+    while text[position] != "}":
+        key, position = decoder.raw_decode(text, position)
+        position = expect(skip(position), ":")
+        if key != "records":
+            start = position
+            value, position = decoder.raw_decode(text, position)
+            yield key, value, start, position, False
+            position = skip(position)
+        else:
+            position = expect(position, "{")
+            while text[position] != "}":
+                identifier, position = decoder.raw_decode(text, position)
+                position = expect(skip(position), ":")
+                start = position
+                record, position = decoder.raw_decode(text, position)
+                # Padding after the record belongs to its slot.
+                position = skip(position)
+                yield identifier, record, start, position, True
+                if text[position] == ",":
+                    position = skip(position + 1)
+            position = skip(position + 1)
+        if text[position] == ",":
+            position = skip(position + 1)
+
+
+class _ByteOffsets:
+    """Converts increasing character positions in text into byte offsets."""
+
+    def __init__(self, text: str, ascii: bool):
+        self.text = text
+        self.ascii = ascii
+        self.position = 0
+        self.offset = 0
+
+    def __call__(self, position: int) -> int:
+        if self.ascii:
+            return position
+        self.offset += len(self.text[self.position : position].encode())
+        self.position = position
+        return self.offset
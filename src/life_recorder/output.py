@@ -0,0 +1,169 @@
+"""
+Module that provides streaming output of life records for the `read`
+command, as pretty-printed records, JSON, NDJSON, a table or tab-separated
+lines.
+
+Records are formatted one by one and written in large chunks, so printing
+many records neither calls the terminal for every line nor builds the whole
+output in memory.
+"""
+
+import heapq
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from itertools import islice
+from typing import TextIO
+
+from . import helper as h
+from .record import pack_identifier, pack_timestamp
+
+FORMATS = ("pretty", "json", "ndjson", "table", "plain")
+FIELDS = ("id", "timestamp", "tag", "title", "content")
+SORTS = ("id", "timestamp", "tag", "title")
+CHUNK_SIZE = 64 * 1024
+"""Number of characters written at once."""
+
+TABLE_WIDTHS = {"id": 10, "timestamp": 17, "tag": 12, "title": 30}
+"""Widths of table columns, content takes the rest of the line."""
+
+LINES_PER_RECORD = {"pretty": 6, "table": 1, "plain": 1}
+"""Lines taken by every record in the formats meant to be read by people."""
+
+_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def select(
+    records: Mapping[str, Mapping[str, str]],
+    sort: str | None = None,
+    reverse: bool = False,
+    offset: int = 0,
+    limit: int | None = None,
+) -> Iterator[Mapping[str, str]]:
+    """
+    Yields records sorted by the field, in chronological order by default,
+    skipping the first `offset` and stopping after `limit` of them.
+    """
+    stop = offset + limit if limit is not None else None
+    if sort is None:
+        values = records.values()
+        if reverse:
+            values = reversed(list(values))
+        return islice(values, offset, stop)
+
+    key = _SORT_KEYS[sort]
+    if stop is not None:
+        # Only the records that are printed are kept in order.
+        pick = heapq.nlargest if reverse else heapq.nsmallest
+        return iter(pick(stop, records.values(), key=key)[offset:])
+    return iter(sorted(records.values(), key=key, reverse=reverse))
+
+
+def format_records(
+    records: Iterable[Mapping[str, str]],
+    format: str,
+    color: bool = False,
+    width: int = 80,
+) -> Iterator[str]:
+    """
+    Yields records formatted one by one, together with opening and closing
+    text of the format. Pretty records are styled if `color` is set and
+    table rows are cut to `width` characters.
+    """
+    if format == "pretty":
+        for record in records:
+            yield f"{h.pretty_record(record, color=color)}\n\n"
+    elif format == "json":
+        from .codec import dumps
+
+        separator = "[\n    "
+        for record in records:
+            yield separator + dumps(record, decompress=True).decode()
+            separator = ",\n    "
+        yield "[]\n" if separator.startswith("[") else "\n]\n"
+    elif format == "ndjson":
+        from .codec import dumps
+
+        for record in records:
+            yield dumps(record, decompress=True).decode() + "\n"
+    elif format == "table":
+        widths = dict(TABLE_WIDTHS)
+        widths["content"] = max(width - sum(widths.values()) - 4, 10)
+        yield _table_row({field: field.title() for field in widths}, widths)
+        for record in records:
+            yield _table_row(record, widths)
+    elif format == "plain":
+        for record in records:
+            fields = (record[field].translate(_ESCAPES) for field in FIELDS)
+            yield "\t".join(fields) + "\n"
+    else:
+        raise ValueError(f"Unknown format: {format}")
+
+
+def chunks(texts: Iterable[str], size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yields texts joined into chunks of at least `size` characters."""
+    buffer: list[str] = []
+    length = 0
+    for text in texts:
+        buffer.append(text)
+        length += len(text)
+        if length >= size:
+            yield "".join(buffer)
+            buffer.clear()
+            length = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def write(
+    records: Iterable[Mapping[str, str]],
+    f: TextIO,
+    format: str,
+    color: bool = False,
+    width: int = 80,
+) -> None:
+    """Write formatted records to the file, a chunk at a time."""
+    for chunk in chunks(format_records(records, format, color, width)):
+        f.write(chunk)
+
+
+def _table_row(record: Mapping[str, str], widths: dict[str, int]) -> str:
+    return (
+        " ".join(
+            _fit(record[field], width) for field, width in widths.items()
+        ).rstrip()
+        + "\n"
+    )
+
+
+def _fit(text: str, width: int) -> str:
+    """Returns text on a single line, cut or padded to the width."""
+    text = " ".join(text.split())
+    if len(text) > width:
+        return text[: width - 1] + "…"
+    return text.ljust(width)
+
+
+def _packed(value: int | str) -> tuple[int, int | str]:
+    # Values that couldn't be packed are sorted after the packed ones.
+    return (0, value) if type(value) is int else (1, value)
+
+
+def _by_id(record: Mapping[str, str]) -> tuple[int, int | str]:
+    number = getattr(record, "number", None)
+    if number is None:
+        number = pack_identifier(record["id"])
+    return _packed(number)
+
+
+def _by_timestamp(record: Mapping[str, str]) -> tuple[int, int | str]:
+    epoch = getattr(record, "epoch", None)
+    if epoch is None:
+        epoch = pack_timestamp(record["timestamp"])
+    return _packed(epoch)
+
+
+_SORT_KEYS: dict[str, Callable[[Mapping[str, str]], object]] = {
+    "id": _by_id,
+    "timestamp": _by_timestamp,
+    "tag": lambda record: record["tag"].casefold(),
+    "title": lambda record: record["title"].casefold(),
+}
@@ -0,0 +1,140 @@
+"""
+Module that loads large databases with a pool of worker processes, see
+`config.LOAD_WORKERS`.
+
+The database is split into parts: shard files of `ShardedStorage`, or runs
+of records of a JSON file found by its offset index. Every worker parses
+its part and builds the search and query indexes of its records, so the
+parent only merges them. Records are sent back as binary snapshots, see
+`codec.Snapshot`, which are restored without parsing.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from . import codec
+from .query import QueryIndex
+from .record import Records
+from .search import SearchIndex
+from .storage import JsonStorage, ShardedStorage
+
+MIN_RECORDS = 10_000
+"""Smaller databases are loaded in a single process, it's faster."""
+
+PARTS_PER_WORKER = 4
+"""JSON files are split into more parts than workers to even them out."""
+
+Part = tuple[bytes, SearchIndex, QueryIndex]
+"""Snapshot of records of the part, with their search and query indexes."""
+
+Loaded = tuple[dict, SearchIndex, QueryIndex]
+
+
+def load(storage, workers: int) -> Loaded | None:
+    """
+    Returns the database of the storage loaded by the workers, together
+    with its search and query indexes, or `None` if it can't be split into
+    parts or it's too small for that to pay off.
+    """
+    # Spawned workers would import the main module again, and the TUI opens
+    # its database on import. Workers only read files, so they're forked.
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    if isinstance(storage, ShardedStorage):
+        return _load_shards(storage, workers)
+    # The log storage replays its log over the file, it's loaded as usual.
+    if type(storage) is JsonStorage:
+        return _load_json(storage, workers)
+    return None
+
+
+def read_part(
+    path: str, head: bytes | None = None, start: int = 0, end: int = 0
+) -> Part:
+    """
+    Reads and indexes records of the part in a worker process. The part is
+    the whole file, or the bytes of a JSON file from the first record to
+    the end of the last one, when the head with the key of the first record
+    is given.
+    """
+    try:
+        with open(path, "rb") as f:
+            if head is None:
+                data = f.read()
+            else:
+                f.seek(start)
+                data = head + f.read(end - start) + b"}}"
+    except FileNotFoundError:
+        records = Records()
+    else:
+        records = codec.decode(data)["records"]
+    return (
+        codec.Snapshot.dump({"last_id": 0, "records": records}),
+        SearchIndex.build(records.values()),
+        QueryIndex.build(records.values()),
+    )
+
+
+def _load_json(storage: JsonStorage, workers: int) -> Loaded | None:
+    offsets = storage.offsets
+    # The journal of a write that was cut off is applied by the usual load.
+    if (
+        storage.journal_path.exists()
+        or storage._detect() != "json"
+        or not offsets.load()
+        or offsets.count < MIN_RECORDS
+    ):
+        return None
+
+    # Records are cut into runs in the order they're in the file.
+    entries = sorted(offsets.entries(), key=lambda entry: entry[1])
+    size = -(-len(entries) // (workers * PARTS_PER_WORKER))
+    arguments = []
+    for first in range(0, len(entries), size):
+        run = entries[first : first + size]
+        number, start, _ = run[0]
+        _, offset, length = run[-1]
+        head = b'{"last_id": 0, "records": {"lr-%d": ' % number
+        arguments.append((str(storage.path), head, start, offset + length))
+
+    try:
+        parts = _map(arguments, workers)
+    except ValueError:
+        # The file is recovered by the usual load.
+        return None
+
+    records = Records.merge(
+        codec.Snapshot.load(snapshot)["records"] for snapshot, _, _ in parts
+    )
+    return (
+        {"last_id": offsets.last_id, "records": records},
+        SearchIndex.merge(search for _, search, _ in parts),
+        QueryIndex.merge(query for _, _, query in parts),
+    )
+
+
+def _load_shards(storage: ShardedStorage, workers: int) -> Loaded | None:
+    db = storage.load()
+    records = db["records"]
+    keys = records.keys_between()
+    if sum(records.manifest[key]["count"] for key in keys) < MIN_RECORDS:
+        return None
+
+    parts = _map([(str(storage.shard_path(key)),) for key in keys], workers)
+    for key, (snapshot, _, query) in zip(keys, parts):
+        records.shards[key] = codec.Snapshot.load(snapshot)["records"]
+        records.indexes[key] = query
+    return (
+        db,
+        SearchIndex.merge(search for _, search, _ in parts),
+        QueryIndex.merge(query for _, _, query in parts),
+    )
+
+
+def _map(arguments: list[tuple], workers: int) -> list[Part]:
+    """Returns parts read by the workers, in the order of arguments."""
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(arguments)) or 1,
+        mp_context=multiprocessing.get_context("fork"),
+    ) as pool:
+        return list(pool.map(read_part, *zip(*arguments)))
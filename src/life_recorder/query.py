@@ -0,0 +1,405 @@
+"""
+Module that provides secondary indexes used to filter life records by tag
+and time range without scanning every record.
+
+The index is saved in a SQLite file next to the database, with a row of
+tag, time and number for every record, indexed so that a process filtering
+records once asks the file instead of parsing timestamps of all records.
+Changed records replace their rows, so writing a change costs only the
+changed records.
+"""
+
+import bisect
+import heapq
+import json
+import os
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .helper import parse_timestamp
+from .offsets import get_number
+from .record import Record
+
+if TYPE_CHECKING:
+    import sqlite3
+
+SCHEMA = (
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    "CREATE TABLE entries (id TEXT PRIMARY KEY, tag TEXT NOT NULL, "
+    "time INTEGER, number INTEGER NOT NULL) WITHOUT ROWID",
+    "CREATE INDEX entries_tag ON entries (tag, time, number)",
+    "CREATE INDEX entries_time ON entries (time, number)",
+)
+
+
+class QueryIndex:
+    """
+    Index of record identifiers by tag and a timeline of records sorted by
+    their timestamp.
+
+    Time values are seconds since epoch as returned by
+    `helper.parse_timestamp`. Records are returned in chronological order.
+    An index loaded from its file answers queries from it until it's
+    changed or preloaded.
+    """
+
+    VERSION = 1
+
+    def __init__(self):
+        self.tags: dict[str, set[str]] = {}
+        self.times: dict[str, int] = {}
+        self.timeline: list[tuple[int, int, str]] = []
+        self.dirty = False
+        self._parsed: dict[str, int | None] = {}
+        self._file: "sqlite3.Connection | None" = None
+
+    @classmethod
+    def build(cls, records: Iterable[Mapping[str, str]]) -> "QueryIndex":
+        """Build an index from scratch."""
+        index = cls()
+        for record in records:
+            index._add(record)
+        index.timeline.sort()
+        # Timestamps have minute precision and repeat a lot, so the cache
+        # of parsed values is useful only while building.
+        index._parsed.clear()
+        index.dirty = True
+        return index
+
+    @classmethod
+    def merge(cls, indexes: Iterable["QueryIndex"]) -> "QueryIndex":
+        """
+        Merge indexes of disjoint sets of records, e.g. built by worker
+        processes, into one. The indexes are left as they are.
+        """
+        merged = cls()
+        timelines = []
+        for index in indexes:
+            for tag, identifiers in index.tags.items():
+                merged.tags.setdefault(tag, set()).update(identifiers)
+            merged.times.update(index.times)
+            timelines.append(index.timeline)
+        merged.timeline = list(heapq.merge(*timelines))
+        merged.dirty = True
+        return merged
+
+    def add(self, record: Mapping[str, str]) -> None:
+        """Index the record."""
+        self.preload()
+        entry = self._add(record, timeline=False)
+        self._parsed.clear()
+        if entry is None:
+            return
+        if not self.timeline or self.timeline[-1] < entry:
+            self.timeline.append(entry)
+        else:
+            bisect.insort(self.timeline, entry)
+
+    def remove(self, record: Mapping[str, str]) -> None:
+        """Remove the record, as it was indexed, from the index."""
+        self.preload()
+        identifier = record["id"]
+        tagged = self.tags.get(record.get("tag") or "")
+        if tagged is not None:
+            tagged.discard(identifier)
+            if not tagged:
+                del self.tags[record.get("tag") or ""]
+
+        time = self.times.pop(identifier, None)
+        if time is None:
+            return
+        entry = (time, self._number(identifier), identifier)
+        position = bisect.bisect_left(self.timeline, entry)
+        if position < len(self.timeline) and self.timeline[position] == entry:
+            del self.timeline[position]
+
+    def query(
+        self,
+        tag: str | None = None,
+        since: int | None = None,
+        until: int | None = None,
+        limit: int | None = None,
+    ) -> list[str]:
+        """
+        Returns identifiers of records with the tag, created at or after
+        since and before until.
+        """
+        if self._file is not None:
+            return _select(self._file, tag, since, until, limit)
+
+        tagged = self.tags.get(tag, set()) if tag is not None else None
+
+        if tagged is not None and since is None and until is None:
+            if limit is None:
+                return sorted(tagged, key=self._order)
+            return heapq.nsmallest(limit, tagged, key=self._order)
+
+        start = 0
+        if since is not None:
+            start = bisect.bisect_left(self.timeline, (since,))
+        end = len(self.timeline)
+        if until is not None:
+            end = bisect.bisect_left(self.timeline, (until,), start)
+
+        if tagged is not None and len(tagged) < end - start:
+            matched = [
+                identifier
+                for identifier in tagged
+                if identifier in self.times
+                and (since is None or self.times[identifier] >= since)
+                and (until is None or self.times[identifier] < until)
+            ]
+            if limit is None:
+                return sorted(matched, key=self._order)
+            return heapq.nsmallest(limit, matched, key=self._order)
+
+        identifiers = []
+        for position in range(start, end):
+            identifier = self.timeline[position][2]
+            if tagged is not None and identifier not in tagged:
+                continue
+            identifiers.append(identifier)
+            if limit is not None and len(identifiers) >= limit:
+                break
+        return identifiers
+
+    def preload(self) -> None:
+        """Read the whole index from the file now and close it."""
+        if self._file is None:
+            return
+        for identifier, tag, time, number in self._file.execute(
+            "SELECT id, tag, time, number FROM entries"
+        ):
+            self.tags.setdefault(tag, set()).add(identifier)
+            if time is not None:
+                self.times[identifier] = time
+                self.timeline.append((time, number, identifier))
+        self.timeline.sort()
+        self.close()
+
+    def save(self, path: Path, stamp: list) -> None:
+        """Write the index with the stamp of the database it matches."""
+        import sqlite3
+
+        # The file replaces the one the index is read from.
+        self.preload()
+        temporary = path.with_name(path.name + ".tmp")
+        temporary.unlink(missing_ok=True)
+        connection = sqlite3.connect(temporary)
+        try:
+            with connection:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+                connection.executemany(
+                    "INSERT INTO meta (key, value) VALUES (?, ?)",
+                    _meta_rows(stamp),
+                )
+                connection.executemany(
+                    "INSERT INTO entries (id, tag, time, number) "
+                    "VALUES (?, ?, ?, ?)",
+                    (
+                        (
+                            identifier,
+                            tag,
+                            self.times.get(identifier),
+                            self._number(identifier),
+                        )
+                        for tag, identifiers in self.tags.items()
+                        for identifier in identifiers
+                    ),
+                )
+        finally:
+            connection.close()
+        os.replace(temporary, path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: Path, stamp: list) -> "QueryIndex | None":
+        """Open the index, return `None` if it doesn't match the database."""
+        import sqlite3
+
+        if not path.exists():
+            return None
+        # Queries of the daemon are made from its request threads, one at a
+        # time.
+        connection = sqlite3.connect(path, check_same_thread=False)
+        meta = _read_meta(connection)
+        if meta is None or meta["stamp"] != stamp:
+            connection.close()
+            return None
+
+        index = cls()
+        index._file = connection
+        return index
+
+    @staticmethod
+    def patch(
+        path: Path,
+        stamp: list,
+        new_stamp: list,
+        changes: Iterable[
+            tuple[Mapping[str, str] | None, Mapping[str, str] | None]
+        ],
+    ) -> bool:
+        """
+        Write changes of records, pairs of their old and new versions, to
+        the saved index with the stamp and stamp it with the new one.
+        Returns `False` if there is no saved index matching the stamp.
+        """
+        import sqlite3
+
+        if not path.exists():
+            return False
+        parser = QueryIndex()
+        connection = sqlite3.connect(path)
+        try:
+            meta = _read_meta(connection)
+            if meta is None or meta["stamp"] != stamp:
+                return False
+            removed = []
+            rows = []
+            for old_record, new_record in changes:
+                if new_record is not None:
+                    identifier = new_record["id"]
+                    rows.append(
+                        (
+                            identifier,
+                            new_record.get("tag") or "",
+                            parser._time(new_record),
+                            QueryIndex._number(identifier),
+                        )
+                    )
+                elif old_record is not None:
+                    removed.append((old_record["id"],))
+
+            with connection:
+                connection.executemany(
+                    "DELETE FROM entries WHERE id = ?", removed
+                )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO entries (id, tag, time, number) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                connection.executemany(
+                    "UPDATE meta SET value = ? WHERE key = ?",
+                    ((value, key) for key, value in _meta_rows(new_stamp)),
+                )
+        except sqlite3.DatabaseError:
+            return False
+        finally:
+            connection.close()
+        return True
+
+    @property
+    def lazy(self) -> bool:
+        """Whether queries are answered from the file."""
+        return self._file is not None
+
+    def close(self) -> None:
+        """
+        Close the file queries are answered from. The index is empty after
+        that, unless `preload` was called.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _add(
+        self, record: Mapping[str, str], timeline: bool = True
+    ) -> tuple[int, int, str] | None:
+        identifier = record["id"]
+        self.tags.setdefault(record.get("tag") or "", set()).add(identifier)
+
+        time = self._time(record)
+        if time is None:
+            return None
+        self.times[identifier] = time
+        entry = (time, self._number(identifier), identifier)
+        if timeline:
+            self.timeline.append(entry)
+        return entry
+
+    def _time(self, record: Mapping[str, str]) -> int | None:
+        if isinstance(record, Record) and record.epoch is not None:
+            return record.epoch
+        return self._parse(record.get("timestamp"))
+
+    def _parse(self, timestamp: str | None) -> int | None:
+        if timestamp is None:
+            return None
+        if timestamp not in self._parsed:
+            try:
+                self._parsed[timestamp] = parse_timestamp(timestamp)
+            except ValueError:
+                self._parsed[timestamp] = None
+        return self._parsed[timestamp]
+
+    def _order(self, identifier: str) -> tuple[int, int, str]:
+        return (
+            self.times.get(identifier, -1),
+            self._number(identifier),
+            identifier,
+        )
+
+    @staticmethod
+    def _number(identifier: str) -> int:
+        number = get_number(identifier)
+        return number if number is not None else -1
+
+
+def _select(
+    connection: "sqlite3.Connection",
+    tag: str | None,
+    since: int | None,
+    until: int | None,
+    limit: int | None,
+) -> list[str]:
+    """Answer `QueryIndex.query` from the saved index."""
+    conditions = []
+    parameters: list = []
+    if tag is not None:
+        conditions.append("tag = ?")
+        parameters.append(tag)
+    if since is None and until is None and tag is not None:
+        # Records without a time come first, as they do in the timeline.
+        order = "coalesce(time, -1), number, id"
+    else:
+        conditions.append("time IS NOT NULL")
+        order = "time, number, id"
+    if since is not None:
+        conditions.append("time >= ?")
+        parameters.append(since)
+    if until is not None:
+        conditions.append("time < ?")
+        parameters.append(until)
+    # A negative limit means no limit to SQLite.
+    parameters.append(-1 if limit is None else limit)
+    rows = connection.execute(
+        f"SELECT id FROM entries WHERE {' AND '.join(conditions)} "
+        f"ORDER BY {order} LIMIT ?",
+        parameters,
+    )
+    return [row[0] for row in rows]
+
+
+def _meta_rows(stamp: list) -> list[tuple[str, str]]:
+    return [
+        ("version", json.dumps(QueryIndex.VERSION)),
+        ("stamp", json.dumps(stamp)),
+    ]
+
+
+def _read_meta(connection: "sqlite3.Connection") -> dict | None:
+    """Returns metadata of the saved index, `None` if it's not readable."""
+    import sqlite3
+
+    try:
+        rows = connection.execute("SELECT key, value FROM meta").fetchall()
+    except sqlite3.DatabaseError:
+        return None
+    meta = {key: json.loads(value) for key, value in rows}
+    if meta.get("version") != QueryIndex.VERSION:
+        return None
+    return meta
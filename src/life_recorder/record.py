@@ -0,0 +1,449 @@
+"""
+Module that provides compact in-memory representation of life records.
+
+A record loaded into memory is a `Record` rather than a five-key dict: field
+names are not stored with every record, the numeric part of the identifier
+and the timestamp are packed into integers and tags are interned. `Record`
+is a read-only mapping, so it can be used wherever a record dict is read.
+Loaded records are kept in `Records`, which doesn't keep identifier strings
+as keys either.
+
+Long contents may be kept `Compressed`, in memory as well as in files, and
+are decompressed only when the `content` of the record is read.
+"""
+
+from collections.abc import (
+    ItemsView,
+    Iterable,
+    Iterator,
+    Mapping,
+    MutableMapping,
+    ValuesView,
+)
+from datetime import date
+from functools import lru_cache
+from sys import intern
+from typing import Any
+
+FIELDS = ("id", "timestamp", "tag", "title", "content")
+MONTHS = (
+    "Jan", "Feb", "Mar", "Apr", "May", "Jun",
+    "Jul", "Aug", "Sep", "Oct", "Nov", "Dec",
+)  # fmt: skip
+MONTH_NUMBERS = {name: number for number, name in enumerate(MONTHS, start=1)}
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+CLOCK = [f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(1440)]
+CLOCK_SECONDS = {text: minute * 60 for minute, text in enumerate(CLOCK)}
+
+
+class Record(Mapping):
+    """
+    Read-only life record with the `id`, `timestamp`, `tag`, `title` and
+    `content` fields. Identifier and timestamp are kept as strings when
+    they can't be packed without changing them.
+    """
+
+    __slots__ = ("_id", "_time", "tag", "title", "content")
+
+    def __init__(
+        self,
+        identifier: str,
+        timestamp: str,
+        tag: str,
+        title: str,
+        content: str,
+    ):
+        self._id = pack_identifier(identifier)
+        self._time = pack_timestamp(timestamp)
+        self.tag = intern(tag) if type(tag) is str else tag
+        self.title = title
+        self.content = content
+
+    @classmethod
+    def from_packed(
+        cls,
+        number: int,
+        epoch: int,
+        tag: str,
+        title: str,
+        content: str,
+    ) -> "Record":
+        """Returns record of `lr-<number>` identifier and packed timestamp."""
+        record = cls.__new__(cls)
+        record._id = number
+        record._time = epoch
+        record.tag = tag
+        record.title = title
+        record.content = content
+        return record
+
+    @property
+    def id(self) -> str:
+        if type(self._id) is int:
+            return f"lr-{self._id}"
+        return self._id
+
+    @property
+    def timestamp(self) -> str:
+        if type(self._time) is int:
+            return format_timestamp(self._time)
+        return self._time
+
+    @property
+    def number(self) -> int | None:
+        """Returns numeric part of `lr-N` identifier, if it's packed."""
+        return self._id if type(self._id) is int else None
+
+    @property
+    def epoch(self) -> int | None:
+        """Returns timestamp as seconds since epoch, if it's packed."""
+        return self._time if type(self._time) is int else None
+
+    def __getitem__(self, field: str) -> Any:
+        if field == "id":
+            return self.id
+        if field == "timestamp":
+            return self.timestamp
+        if field == "content":
+            content = self.content
+            if type(content) is Compressed:
+                return content.decompress()
+            return content
+        if field in ("tag", "title"):
+            return getattr(self, field)
+        raise KeyError(field)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def __contains__(self, field: object) -> bool:
+        return field in FIELDS
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is Record:
+            return (
+                self._id == other._id
+                and self._time == other._time
+                and self.tag == other.tag
+                and self.title == other.title
+                # The same content may be kept compressed by one record only.
+                and (
+                    self.content == other.content
+                    or self["content"] == other["content"]
+                )
+            )
+        return super().__eq__(other)
+
+    def __repr__(self) -> str:
+        return f"Record({self.to_dict()!r})"
+
+    def to_dict(self, decompress: bool = True) -> dict[str, str]:
+        """
+        Returns the record as a dict, with its content left `Compressed` if
+        `decompress` is not set.
+        """
+        content = self.content
+        if decompress and type(content) is Compressed:
+            content = content.decompress()
+        return {
+            "id": self.id,
+            "timestamp": self.timestamp,
+            "tag": self.tag,
+            "title": self.title,
+            "content": content,
+        }
+
+
+class Compressed:
+    """
+    Text compressed with `zlib` or `lzma`. In JSON it's kept as an object
+    with the method and base64 encoded data, see `to_json`.
+    """
+
+    __slots__ = ("method", "data")
+
+    METHODS = ("zlib", "lzma")
+
+    def __init__(self, method: str, data: bytes):
+        if method not in self.METHODS:
+            raise ValueError(
+                f"Unknown compression method: {method}. "
+                f"Available methods: {', '.join(self.METHODS)}"
+            )
+        self.method = method
+        self.data = data
+
+    @classmethod
+    def compress(cls, text: str, method: str = "zlib") -> "Compressed":
+        """Returns the text compressed with the method."""
+        data = text.encode("utf-8", "surrogatepass")
+        if method == "lzma":
+            # Imported only here, it's rarely used and slow to import.
+            import lzma
+
+            return cls(method, lzma.compress(data))
+        if method == "zlib":
+            import zlib
+
+            return cls(method, zlib.compress(data, 9))
+        # Raises for unknown methods.
+        return cls(method, data)
+
+    def decompress(self) -> str:
+        """Returns the original text."""
+        if self.method == "lzma":
+            import lzma
+
+            data = lzma.decompress(self.data)
+        else:
+            import zlib
+
+            data = zlib.decompress(self.data)
+        return data.decode("utf-8", "surrogatepass")
+
+    @classmethod
+    def from_json(cls, value: dict) -> "Compressed":
+        """Returns compressed text from its JSON object."""
+        import base64
+
+        try:
+            return cls(value["compressed"], base64.b64decode(value["data"]))
+        except (KeyError, TypeError) as error:
+            raise ValueError(f"Invalid compressed content: {value}") from error
+
+    def to_json(self) -> dict[str, str]:
+        """Returns JSON object of the compressed text."""
+        import base64
+
+        return {
+            "compressed": self.method,
+            "data": base64.b64encode(self.data).decode("ascii"),
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not Compressed:
+            return NotImplemented
+        return self.method == other.method and self.data == other.data
+
+    def __repr__(self) -> str:
+        return f"Compressed({self.method!r}, {len(self.data)} bytes)"
+
+
+class Records(MutableMapping):
+    """
+    Mapping of identifiers to records that keeps `lr-N` identifiers as the
+    numbers packed in the records rather than as strings.
+    """
+
+    __slots__ = ("_records",)
+
+    def __init__(self, records: Mapping[str, Mapping] | None = None):
+        self._records: dict[int | str, Mapping] = {}
+        if records is not None:
+            # Same as setting items one by one, without the method calls.
+            target = self._records
+            for identifier, record in records.items():
+                key = pack_identifier(identifier)
+                if type(record) is Record and record._id == key:
+                    key = record._id
+                target[key] = record
+
+    @classmethod
+    def of(cls, records: Iterable[Mapping]) -> "Records":
+        """Returns mapping of the records by their own identifiers."""
+        mapping = cls()
+        target = mapping._records
+        for record in records:
+            if type(record) is Record:
+                target[record._id] = record
+            else:
+                target[pack_identifier(record["id"])] = record
+        return mapping
+
+    @classmethod
+    def merge(cls, parts: Iterable["Records"]) -> "Records":
+        """Returns records of all parts, in their order."""
+        mapping = cls()
+        for part in parts:
+            mapping._records.update(part._records)
+        return mapping
+
+    def __getitem__(self, identifier: str) -> Mapping:
+        return self._records[pack_identifier(identifier)]
+
+    def __setitem__(self, identifier: str, record: Mapping) -> None:
+        key = pack_identifier(identifier)
+        if type(record) is Record and record._id == key:
+            # Share the number with the record instead of keeping a copy.
+            key = record._id
+        self._records[key] = record
+
+    def __delitem__(self, identifier: str) -> None:
+        del self._records[pack_identifier(identifier)]
+
+    def __contains__(self, identifier: object) -> bool:
+        return pack_identifier(identifier) in self._records
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self._records:
+            yield f"lr-{key}" if type(key) is int else key
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __repr__(self) -> str:
+        return f"Records({dict(self.items())!r})"
+
+    def values(self) -> ValuesView:
+        return _RecordValues(self)
+
+    def items(self) -> ItemsView:
+        return _RecordItems(self)
+
+    def copy(self) -> "Records":
+        """Returns a shallow copy of the mapping."""
+        records = Records()
+        records._records = self._records.copy()
+        return records
+
+
+class _RecordValues(ValuesView):
+    def __iter__(self) -> Iterator[Mapping]:
+        return iter(self._mapping._records.values())
+
+
+class _RecordItems(ItemsView):
+    def __iter__(self) -> Iterator[tuple[str, Mapping]]:
+        for key, record in self._mapping._records.items():
+            yield (f"lr-{key}" if type(key) is int else key), record
+
+
+def compact(record: dict) -> "Record | dict":
+    """
+    Returns record as `Record`, or the dict itself if it has other fields
+    than a `Record` can hold.
+    """
+    if len(record) != len(FIELDS):
+        return record
+    try:
+        content = record["content"]
+        if type(content) is dict:
+            content = Compressed.from_json(content)
+        return Record(
+            record["id"],
+            record["timestamp"],
+            record["tag"],
+            record["title"],
+            content,
+        )
+    except KeyError:
+        return record
+
+
+def compress(
+    record: "Record | dict", threshold: int, method: str = "zlib"
+) -> "Record | dict":
+    """
+    Returns record with its content compressed if it's longer than
+    threshold characters and gets smaller, `0` threshold turns it off.
+    """
+    if (
+        threshold <= 0
+        or type(record) is not Record
+        or type(record.content) is not str
+        or len(record.content) <= threshold
+    ):
+        return record
+    compressed = Compressed.compress(record.content, method)
+    # Base64 in JSON takes a third more than the compressed data.
+    if len(compressed.data) * 4 // 3 < len(record.content):
+        record.content = compressed
+    return record
+
+
+def pack_identifier(identifier: str) -> int | str:
+    """Returns numeric part of `lr-N` identifier, or identifier as is."""
+    if type(identifier) is str and identifier.startswith("lr-"):
+        number = identifier[3:]
+        if number.isascii() and number.isdigit() and number[0] != "0":
+            return int(number)
+    return identifier
+
+
+def pack_timestamp(timestamp: str) -> int | str:
+    """
+    Returns timestamp in `helper.TIMESTAMP_FORMAT` as seconds since epoch,
+    read as UTC time, or timestamp as is if it can't be restored from them.
+    """
+    if type(timestamp) is not str or len(timestamp) != 17:
+        return timestamp
+    # It's done for every loaded record, so dates and times are looked up
+    # separately instead of parsing timestamps with `strptime`.
+    day = _pack_date(timestamp[:12])
+    clock = CLOCK_SECONDS.get(timestamp[12:])
+    if day is None or clock is None:
+        return timestamp
+    return day + clock
+
+
+def format_timestamp(epoch: int) -> str:
+    """Returns packed timestamp in `helper.TIMESTAMP_FORMAT`."""
+    days, seconds = divmod(epoch, 86400)
+    return _format_date(days) + CLOCK[seconds // 60]
+
+
+@lru_cache(maxsize=4096)
+def _pack_date(text: str) -> int | None:
+    """Returns `DD-Mon-YYYY ` date as seconds since epoch or `None`."""
+    month = MONTH_NUMBERS.get(text[3:6])
+    digits = text[:2] + text[7:11]
+    if (
+        month is None
+        or text[2] != "-"
+        or text[6] != "-"
+        or text[11] != " "
+        or not (digits.isascii() and digits.isdigit())
+    ):
+        return None
+    try:
+        day = date(int(text[7:11]), month, int(text[:2]))
+    except ValueError:
+        return None
+    if day.year < 1000:
+        return None
+    return (day.toordinal() - EPOCH_ORDINAL) * 86400
+
+
+@lru_cache(maxsize=4096)
+def _format_date(days: int) -> str:
+    day = date.fromordinal(days + EPOCH_ORDINAL)
+    return f"{day.day:02d}-{MONTHS[day.month - 1]}-{day.year:04d} "
+
+
+def to_json(value: Any) -> dict:
+    """
+    `default` hook of JSON encoders that serializes records and mappings of
+    records as dicts, keeping compressed contents compressed.
+    """
+    if isinstance(value, Record):
+        return value.to_dict(decompress=False)
+    if isinstance(value, Compressed):
+        return value.to_json()
+    if isinstance(value, Mapping):
+        return dict(value.items())
+    raise TypeError(
+        f"Object of type {type(value).__name__} is not JSON serializable"
+    )
+
+
+def to_plain_json(value: Any) -> dict | str:
+    """Same as `to_json`, but decompresses compressed contents."""
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, Compressed):
+        return value.decompress()
+    return to_json(value)
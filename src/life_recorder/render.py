@@ -0,0 +1,116 @@
+"""
+Module that provides the cache of rendered records of the TUI, i.e. parsed
+Markdown of its viewing pane. CLI commands render every record once, they
+don't use it.
+
+Renderings are kept by the kind of rendering, record identifier and record
+version, see `feed.ChangeFeed.version_of`, so a changed record is rendered
+anew. Renderings of updated and deleted records are dropped right away when
+the cache listens to the feed.
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import TypeVar
+
+from . import config
+from .feed import DELETED, UPDATED, Change
+from .metrics import metrics
+
+T = TypeVar("T")
+
+Key = tuple[str, str, int]
+"""Kind of rendering, identifier and version of the record."""
+
+
+class RenderCache:
+    """Bounded cache of renderings that drops least recently used ones."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Key, object] = OrderedDict()
+        # Renderings may be made in worker threads, e.g. Markdown is parsed
+        # in an executor by Textual.
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        kind: str,
+        identifier: str,
+        version: int,
+        render: Callable[[], T],
+    ) -> T:
+        """
+        Returns rendering of the record version, made by render if it's not
+        cached.
+        """
+        key = (kind, identifier, version)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        rendering = render()
+        if self.maxsize <= 0:
+            return rendering
+        with self._lock:
+            self._entries[key] = rendering
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return rendering
+
+    def invalidate(self, identifier: str) -> None:
+        """Drop all renderings of the record."""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == identifier]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """Drop all renderings and reset statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def on_change(self, change: Change) -> None:
+        """Feed listener that drops renderings of changed records."""
+        if change.kind in (UPDATED, DELETED):
+            self.invalidate(change.identifier)
+
+    @property
+    def size(self) -> int:
+        """Return number of cached renderings."""
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """Return share of lookups that were answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict[str, int | float]:
+        """Returns size, bounds and hit statistics of the cache."""
+        return {
+            "size": self.size,
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+
+render_cache = RenderCache(config.RENDER_CACHE_SIZE)
+"""Cache of the TUI, the only user of it."""
+
+metrics.register(
+    lambda: {
+        "render_cache_hits_total": render_cache.hits,
+        "render_cache_misses_total": render_cache.misses,
+    }
+)
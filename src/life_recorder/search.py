@@ -0,0 +1,588 @@
+"""
+Module that provides full-text search index over life records.
+
+The index is an inverted index from terms of `title`, `content` and `tag`
+fields to the records containing them. It supports ranked (BM25) queries,
+prefix queries, e.g. `dre*`, and phrase queries, e.g. `"chased by a duck"`.
+All terms of a query must match a record for it to be found.
+
+Every posting keeps the weighted frequency of the term, the length of the
+record and the positions of the term in it, so phrases are matched without
+reading the records again.
+
+The index is saved in a SQLite file, with all postings of a term in a row
+of their own, so a search reads only the terms of its query. Changed records
+are appended as rows of their terms to the `changes` table, which is read
+together with the postings and merged into them once it grows, so writing a
+change costs only the terms of the changed records.
+"""
+
+import bisect
+import heapq
+import json
+import math
+import os
+import re
+import struct
+import sys
+from array import array
+from collections.abc import Iterable, Mapping
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import sqlite3
+
+TOKEN = re.compile(r"\w+")
+QUERY = re.compile(r'"([^"]*)"|(\S+)')
+
+FIELD_WEIGHTS = {"title": 3, "tag": 2, "content": 1}
+"""Term frequency multiplier for each indexed field."""
+
+MAX_EXPANSIONS = 50
+"""Maximum number of indexed terms a prefix query is expanded to."""
+
+COMPACT_CHANGES = 100_000
+"""Saved changes are merged into the postings once there are more rows."""
+
+K1 = 1.2
+B = 0.75
+
+POSTING = struct.Struct("<II")
+"""Frequency and length at the start of a posting, positions follow."""
+
+SCHEMA = (
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    "CREATE TABLE terms (term TEXT PRIMARY KEY, ids TEXT NOT NULL, "
+    "offsets BLOB NOT NULL, data BLOB NOT NULL) WITHOUT ROWID",
+    "CREATE TABLE changes ("
+    "term TEXT NOT NULL, id TEXT NOT NULL, posting BLOB)",
+    "CREATE INDEX changes_term ON changes (term)",
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Returns lowercased word tokens of text."""
+    return TOKEN.findall(text.lower())
+
+
+def record_terms(record: Mapping[str, str]) -> dict[str, int]:
+    """Returns weighted term frequencies of indexed record fields."""
+    terms: dict[str, int] = {}
+    get = terms.get
+    for field, weight in FIELD_WEIGHTS.items():
+        text = record.get(field)
+        if not text:
+            continue
+        for token in TOKEN.findall(text.lower()):
+            terms[token] = get(token, 0) + weight
+    return terms
+
+
+def record_postings(record: Mapping[str, str]) -> tuple[dict[str, bytes], int]:
+    """
+    Returns postings of the terms of indexed record fields, together with
+    the length of the record. Positions of the fields are a position apart,
+    so that phrases don't match across fields.
+    """
+    terms: dict[str, list[int]] = {}
+    get = terms.get
+    position = length = 0
+    for field, weight in FIELD_WEIGHTS.items():
+        text = record.get(field)
+        if not text:
+            continue
+        start = position
+        for token in TOKEN.findall(text.lower()):
+            entry = get(token)
+            if entry is None:
+                terms[token] = [weight, 0, position]
+            else:
+                entry[0] += weight
+                entry.append(position)
+            position += 1
+        length += weight * (position - start)
+        position += 1
+
+    postings = {}
+    for term, entry in terms.items():
+        entry[1] = length
+        postings[term] = _pack(entry)
+    return postings, length
+
+
+class SearchIndex:
+    """
+    Inverted index over indexed fields of records. An index loaded from its
+    file reads postings of terms when they're first needed.
+    """
+
+    VERSION = 2
+
+    def __init__(self):
+        self.postings: dict[str, dict[str, bytes]] = {}
+        self.count = 0
+        self.total_length = 0
+        self.dirty = False
+        self._sorted_terms: list[str] | None = None
+        self._file: "sqlite3.Connection | None" = None
+
+    @classmethod
+    def build(cls, records: Iterable[Mapping[str, str]]) -> "SearchIndex":
+        """Build an index from scratch."""
+        index = cls()
+        for record in records:
+            index.add(record)
+        index.dirty = True
+        return index
+
+    @classmethod
+    def merge(cls, indexes: Iterable["SearchIndex"]) -> "SearchIndex":
+        """
+        Merge indexes of disjoint sets of records, e.g. built by worker
+        processes, into one. The indexes are taken over, not copied.
+        """
+        merged = cls()
+        for index in indexes:
+            for term, postings in index.postings.items():
+                existing = merged.postings.get(term)
+                if existing is None:
+                    merged.postings[term] = postings
+                else:
+                    existing.update(postings)
+            merged.count += index.count
+            merged.total_length += index.total_length
+        merged.dirty = True
+        return merged
+
+    def add(self, record: Mapping[str, str]) -> None:
+        """Index the record."""
+        # Postings of a record share its identifier.
+        identifier = sys.intern(record["id"])
+        terms, length = record_postings(record)
+        self._fetch(terms)
+        for term, posting in terms.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+            if not postings:
+                self._sorted_terms = None
+            postings[identifier] = posting
+        self.count += 1
+        self.total_length += length
+
+    def remove(self, record: Mapping[str, str]) -> None:
+        """Remove the record, as it was indexed, from the index."""
+        identifier = record["id"]
+        terms = record_terms(record)
+        self._fetch(terms)
+        found = not terms
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is None or postings.pop(identifier, None) is None:
+                continue
+            found = True
+            if not postings:
+                self._sorted_terms = None
+                # Terms read from the file are kept, so they're not read
+                # again.
+                if self._file is None:
+                    del self.postings[term]
+        if found:
+            self.count -= 1
+            self.total_length -= sum(terms.values())
+
+    def replace(
+        self, old_record: Mapping[str, str], new_record: Mapping[str, str]
+    ) -> None:
+        """Reindex the updated record."""
+        self.remove(old_record)
+        self.add(new_record)
+
+    def search(self, query: str, limit: int | None = None) -> list[str]:
+        """
+        Returns identifiers of records matching the query, best match first.
+        """
+        groups, phrases = self._parse(query)
+        if not groups:
+            return []
+        self._fetch(term for group in groups for term in group)
+
+        candidates = None
+        for group in sorted(groups, key=self._group_size):
+            matched = set()
+            for term in group:
+                matched.update(self.postings.get(term, ()))
+            candidates = (
+                matched if candidates is None else candidates & matched
+            )
+            if not candidates:
+                return []
+
+        if phrases:
+            candidates = {
+                identifier
+                for identifier in candidates
+                if self._has_phrases(identifier, phrases)
+            }
+
+        scores = self._score(candidates, groups)
+        if limit is None:
+            return sorted(scores, key=lambda x: (-scores[x], x))
+        return heapq.nsmallest(limit, scores, key=lambda x: (-scores[x], x))
+
+    def preload(self) -> None:
+        """Read postings of all terms from the file now."""
+        if self._file is not None:
+            self._fetch(
+                row[0]
+                for row in self._file.execute(
+                    "SELECT term FROM terms UNION SELECT term FROM changes"
+                )
+            )
+
+    def save(self, path: Path, stamp: list) -> None:
+        """Write the index with the stamp of the database it matches."""
+        import sqlite3
+
+        # The file replaces the one postings are read from.
+        self.preload()
+        self.postings = {
+            term: postings
+            for term, postings in self.postings.items()
+            if postings
+        }
+        temporary = path.with_name(path.name + ".tmp")
+        temporary.unlink(missing_ok=True)
+        connection = sqlite3.connect(temporary)
+        try:
+            with connection:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+                connection.executemany(
+                    "INSERT INTO meta (key, value) VALUES (?, ?)",
+                    _meta_rows(stamp, self.count, self.total_length),
+                )
+                connection.executemany(
+                    "INSERT INTO terms (term, ids, offsets, data) "
+                    "VALUES (?, ?, ?, ?)",
+                    (
+                        (term, *_encode(postings))
+                        for term, postings in self.postings.items()
+                        if postings
+                    ),
+                )
+        finally:
+            connection.close()
+        os.replace(temporary, path)
+        self.close()
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: Path, stamp: list) -> "SearchIndex | None":
+        """Open the index, return `None` if it doesn't match the database."""
+        import sqlite3
+
+        if not path.exists():
+            return None
+        # Searches of the daemon are made from its request threads, one at a
+        # time.
+        connection = sqlite3.connect(path, check_same_thread=False)
+        meta = _read_meta(connection)
+        if meta is None or meta["stamp"] != stamp:
+            connection.close()
+            return None
+
+        index = cls()
+        index.count = meta["count"]
+        index.total_length = meta["total_length"]
+        index._file = connection
+        return index
+
+    @staticmethod
+    def patch(
+        path: Path,
+        stamp: list,
+        new_stamp: list,
+        changes: Iterable[
+            tuple[Mapping[str, str] | None, Mapping[str, str] | None]
+        ],
+    ) -> bool:
+        """
+        Write changes of records, pairs of their old and new versions, to
+        the saved index with the stamp and stamp it with the new one.
+        Returns `False` if there is no saved index matching the stamp.
+        """
+        import sqlite3
+
+        if not path.exists():
+            return False
+        connection = sqlite3.connect(path)
+        try:
+            meta = _read_meta(connection)
+            if meta is None or meta["stamp"] != stamp:
+                return False
+            count, total_length = meta["count"], meta["total_length"]
+            rows = []
+            for old_record, new_record in changes:
+                postings = {}
+                if new_record is not None:
+                    postings, length = record_postings(new_record)
+                    rows.extend(
+                        (term, new_record["id"], posting)
+                        for term, posting in postings.items()
+                    )
+                    count += 1
+                    total_length += length
+                if old_record is not None:
+                    terms = record_terms(old_record)
+                    rows.extend(
+                        (term, old_record["id"], None)
+                        for term in terms
+                        if term not in postings
+                    )
+                    count -= 1
+                    total_length -= sum(terms.values())
+
+            with connection:
+                connection.executemany(
+                    "INSERT INTO changes (term, id, posting) VALUES (?, ?, ?)",
+                    rows,
+                )
+                connection.executemany(
+                    "UPDATE meta SET value = ? WHERE key = ?",
+                    (
+                        (value, key)
+                        for key, value in _meta_rows(
+                            new_stamp, count, total_length
+                        )
+                    ),
+                )
+                (saved,) = connection.execute(
+                    "SELECT COUNT(*) FROM changes"
+                ).fetchone()
+                if saved > COMPACT_CHANGES:
+                    _compact(connection)
+        except sqlite3.DatabaseError:
+            return False
+        finally:
+            connection.close()
+        return True
+
+    @property
+    def lazy(self) -> bool:
+        """Whether postings are read from the file when they're needed."""
+        return self._file is not None
+
+    def close(self) -> None:
+        """
+        Close the file postings are read from. Postings that were not read
+        are not searched after that, unless `preload` was called.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _fetch(self, terms: Iterable[str]) -> None:
+        """Read postings of the terms from the file, unless they're read."""
+        if self._file is None:
+            return
+        for term in set(terms):
+            if term not in self.postings:
+                self.postings[term] = _read_term(self._file, term)
+                self._sorted_terms = None
+
+    def _parse(self, query: str) -> tuple[list[list[str]], list[list[str]]]:
+        """
+        Split query into groups of alternative terms, one of which must
+        match, and phrases that must match as they are.
+        """
+        groups = []
+        phrases = []
+        for phrase, word in QUERY.findall(query):
+            if phrase:
+                tokens = tokenize(phrase)
+                groups.extend([token] for token in tokens)
+                if len(tokens) > 1:
+                    phrases.append(tokens)
+            elif word.endswith("*"):
+                for token in tokenize(word[:-1]):
+                    groups.append(self._expand(token))
+            else:
+                groups.extend([token] for token in tokenize(word))
+        return groups, phrases
+
+    def _expand(self, prefix: str) -> list[str]:
+        """Returns indexed terms starting with prefix, up to the maximum."""
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(
+                term for term, postings in self.postings.items() if postings
+            )
+        terms = self._sorted_terms
+        last = prefix + "\U0010ffff"
+        start = bisect.bisect_left(terms, prefix)
+        end = bisect.bisect_left(terms, last, start)
+        expanded = terms[start : min(end, start + MAX_EXPANSIONS)]
+        if self._file is not None:
+            rows = self._file.execute(
+                "SELECT term FROM terms WHERE term >= ?1 AND term < ?2 "
+                "UNION SELECT term FROM changes "
+                "WHERE term >= ?1 AND term < ?2 ORDER BY term LIMIT ?3",
+                (prefix, last, MAX_EXPANSIONS),
+            )
+            expanded = sorted({*expanded, *(row[0] for row in rows)})
+        return expanded[:MAX_EXPANSIONS] or [prefix]
+
+    def _group_size(self, group: list[str]) -> int:
+        return sum(len(self.postings.get(term, ())) for term in group)
+
+    def _score(
+        self, candidates: set[str], groups: list[list[str]]
+    ) -> dict[str, float]:
+        count = self.count or 1
+        average = self.total_length / count or 1
+        unpack = POSTING.unpack_from
+        scores = dict.fromkeys(candidates, 0.0)
+        for group in groups:
+            for term in group:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(
+                    1 + (count - len(postings) + 0.5) / (len(postings) + 0.5)
+                )
+                if len(postings) < len(candidates):
+                    matches = (
+                        (identifier, posting)
+                        for identifier, posting in postings.items()
+                        if identifier in candidates
+                    )
+                else:
+                    matches = (
+                        (identifier, postings[identifier])
+                        for identifier in candidates
+                        if identifier in postings
+                    )
+                for identifier, posting in matches:
+                    frequency, length = unpack(posting)
+                    norm = 1 - B + B * length / average
+                    scores[identifier] += (
+                        idf * frequency * (K1 + 1) / (frequency + K1 * norm)
+                    )
+        return scores
+
+    def _has_phrases(self, identifier: str, phrases: list[list[str]]) -> bool:
+        for phrase in phrases:
+            # Positions the phrase would start at for every term of it.
+            starts = None
+            for offset, term in enumerate(phrase):
+                positions = _positions(self.postings[term][identifier])
+                shifted = {position - offset for position in positions}
+                starts = shifted if starts is None else starts & shifted
+                if not starts:
+                    return False
+        return True
+
+
+def _pack(values: Iterable[int]) -> bytes:
+    packed = array("I", values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(data: bytes) -> array:
+    values = array("I", data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _positions(posting: bytes) -> array:
+    return _unpack(posting[POSTING.size :])
+
+
+def _encode(postings: dict[str, bytes]) -> tuple[str, bytes, bytes]:
+    """Returns identifiers, offsets and data of postings of a term."""
+    offsets = [0]
+    for posting in postings.values():
+        offsets.append(offsets[-1] + len(posting))
+    return (
+        json.dumps(list(postings)),
+        _pack(offsets),
+        b"".join(postings.values()),
+    )
+
+
+def _read_term(
+    connection: "sqlite3.Connection", term: str
+) -> dict[str, bytes]:
+    """Returns saved postings of the term with its saved changes applied."""
+    postings = {}
+    row = connection.execute(
+        "SELECT ids, offsets, data FROM terms WHERE term = ?", (term,)
+    ).fetchone()
+    if row is not None:
+        ids, offsets, data = row
+        offsets = _unpack(offsets)
+        postings = {
+            identifier: data[start:end]
+            for identifier, start, end in zip(
+                json.loads(ids), offsets, islice(offsets, 1, None)
+            )
+        }
+    for identifier, posting in connection.execute(
+        "SELECT id, posting FROM changes WHERE term = ? ORDER BY rowid",
+        (term,),
+    ):
+        if posting is None:
+            postings.pop(identifier, None)
+        else:
+            postings[identifier] = posting
+    return postings
+
+
+def _compact(connection: "sqlite3.Connection") -> None:
+    """Merge saved changes into postings of their terms."""
+    terms = [
+        row[0]
+        for row in connection.execute("SELECT DISTINCT term FROM changes")
+    ]
+    for term in terms:
+        postings = _read_term(connection, term)
+        if postings:
+            connection.execute(
+                "INSERT OR REPLACE INTO terms (term, ids, offsets, data) "
+                "VALUES (?, ?, ?, ?)",
+                (term, *_encode(postings)),
+            )
+        else:
+            connection.execute("DELETE FROM terms WHERE term = ?", (term,))
+    connection.execute("DELETE FROM changes")
+
+
+def _meta_rows(
+    stamp: list, count: int, total_length: int
+) -> list[tuple[str, str]]:
+    return [
+        ("version", json.dumps(SearchIndex.VERSION)),
+        ("stamp", json.dumps(stamp)),
+        ("count", json.dumps(count)),
+        ("total_length", json.dumps(total_length)),
+    ]
+
+
+def _read_meta(connection: "sqlite3.Connection") -> dict | None:
+    """Returns metadata of the saved index, `None` if it's not readable."""
+    import sqlite3
+
+    try:
+        rows = connection.execute("SELECT key, value FROM meta").fetchall()
+    except sqlite3.DatabaseError:
+        # Not an index, or one saved by an older version as JSON.
+        return None
+    meta = {key: json.loads(value) for key, value in rows}
+    if meta.get("version") != SearchIndex.VERSION:
+        return None
+    return meta
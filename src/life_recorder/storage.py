@@ -0,0 +1,1344 @@
+"""
+Module that provides storage backends used by `LifeRecorder` to persist the
+database.
+
+Every backend works with the same database layout, i.e.
+`{"last_id": int, "records": {identifier: record}}`, and receives the set of
+changed records on each mutation so it can decide how much has to be written.
+"""
+
+import os
+import re
+import shutil
+import struct
+import threading
+from collections.abc import (
+    Callable,
+    ItemsView,
+    Iterator,
+    MutableMapping,
+    ValuesView,
+)
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, TextIO, TypeVar
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from . import codec, config
+from .helper import logger, parse_timestamp
+from .metrics import metrics
+from .offsets import (
+    LAST_ID_OFFSET,
+    OffsetIndex,
+    blank_records,
+    dump_database,
+    get_number,
+    is_slotted,
+    pad_last_id,
+    salvage_database,
+    slot,
+)
+from .query import QueryIndex
+from .record import (
+    EPOCH_ORDINAL,
+    Record,
+    Records,
+    compact,
+    pack_identifier,
+    pack_timestamp,
+)
+
+if TYPE_CHECKING:
+    import sqlite3
+
+T = TypeVar("T")
+
+Changes = dict[str, dict[str, str] | None]
+"""Mapping of changed record identifiers to new records, `None` if deleted."""
+
+Patch = tuple[int, bytes]
+"""Byte offset in the database file and bytes written there."""
+
+JOURNAL_MAGIC = b"LRJ1"
+JOURNAL_ENTRY = struct.Struct("<QI")
+JOURNAL_TRAILER = struct.Struct("<4sI")
+
+UNDATED = "undated"
+"""Key of the shard with records whose timestamps can't be parsed."""
+
+SHARD_PATTERN = re.compile(r"\d{4}-\d{2}")
+
+
+class Storage:
+    """Base class for storage backends."""
+
+    filename = "life_records.json"
+
+    def __init__(self, path: Path, lazy: bool = False):
+        self.path = path
+        self.lazy = lazy
+        self.lock_path = path.with_name(path.name + ".lock")
+        self._mutex = threading.Lock()
+
+    def init(self) -> None:
+        """Initialize an empty database at the storage path."""
+        raise NotImplementedError
+
+    def load(self) -> dict:
+        """Load the whole database."""
+        raise NotImplementedError
+
+    def save(self, db: dict) -> None:
+        """Persist the whole database."""
+        raise NotImplementedError
+
+    def write(self, db: dict, changes: Changes) -> None:
+        """Persist the given changes, by default with a full save."""
+        self.save(db)
+
+    def begin(self) -> None:
+        """Mark the start of changes that `discard` may revert."""
+
+    def discard(self) -> None:
+        """Discard changes made since the last `begin` call."""
+
+    def close(self) -> None:
+        """Release resources held by the backend."""
+
+    def query(
+        self,
+        tag: str | None,
+        since: int | None,
+        until: int | None,
+        limit: int | None,
+    ) -> dict[str, dict[str, str]] | None:
+        """
+        Returns records filtered natively by the backend, or `None` if the
+        backend relies on in-memory indexes of `LifeRecorder`.
+        """
+        return None
+
+    def files(self) -> list[Path]:
+        """Returns files that hold the state of the database."""
+        return [self.path]
+
+    @contextmanager
+    def lock(self, shared: bool = False) -> Iterator[None]:
+        """
+        Hold an advisory lock of the database, so that read-modify-write
+        cycles of other processes and threads don't interleave with ours.
+
+        Writers take an exclusive lock and create the lock file next to the
+        database, readers take a shared one if the lock file exists. Between
+        processes the lock works only where `fcntl` is available.
+        """
+        with self._mutex:
+            if shared and not self.lock_path.exists():
+                # Nothing has been written yet, there is nothing to guard.
+                yield
+                return
+            with open(self.lock_path, "a") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                yield
+
+    def stamp(self) -> list:
+        """
+        Returns size, modification time and inode of storage files, which
+        change whenever the database is written.
+        """
+        stamp = []
+        for path in self.files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stamp.append(None)
+            else:
+                stamp.append([stat.st_size, stat.st_mtime_ns, stat.st_ino])
+        return stamp
+
+
+class JsonStorage(Storage):
+    """
+    Backend that keeps the whole database in a single JSON file.
+
+    The file can also be kept as a binary snapshot, see `codec.Snapshot`.
+    The format of the file is detected on load and kept on save, unless the
+    format is given explicitly, in which case the file is converted on the
+    next save.
+
+    In lazy mode records are not parsed on load. Instead, an offset index is
+    kept in a sidecar file and single records are read straight from their
+    bytes in the database file, see `OffsetIndex`. It works only with JSON
+    files.
+
+    JSON files are saved together with the offset index, so that changes of
+    a few records are written in place: records that fit their slots are
+    overwritten, new ones are appended and deleted ones are blanked out with
+    spaces. Patches are written to a journal first. If writing them was
+    cut off, loads apply the journal in memory and the next write, which
+    holds the exclusive lock, replays it to the file. Everything else, e.g.
+    records that outgrow their slots, is written with a full save, which
+    also drops the blanked space.
+    """
+
+    def __init__(
+        self, path: Path, lazy: bool = False, format: str | None = None
+    ):
+        super().__init__(path, lazy)
+        self.offsets = OffsetIndex.for_database(path)
+        self.journal_path = path.with_name(path.name + ".journal")
+        self.requested_format = format or config.DATABASE_FORMAT or None
+        if self.requested_format not in (None, *codec.FORMATS):
+            raise ValueError(
+                f"Unknown database format: {self.requested_format}. "
+                f"Available formats: {', '.join(codec.FORMATS)}"
+            )
+        self.format = self.requested_format or "json"
+
+    def init(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = self._encode({"last_id": 0, "records": {}})
+        write_atomic(self.path, lambda f: f.write(data), binary=True)
+        self.offsets.remove()
+
+    def load(self) -> dict:
+        # Loads hold only a shared lock, so the journal of a write that was
+        # cut off is applied in memory, and replayed by the next write.
+        if (
+            self.lazy
+            and not self.journal_path.exists()
+            and self._detect() == "json"
+            and (self.offsets.load() or self.offsets.build())
+        ):
+            return {
+                "last_id": self.offsets.last_id,
+                "records": LazyJsonRecords(self),
+            }
+        return self.read()
+
+    def read(self) -> dict:
+        """
+        Parse the whole database file with the journal of a write that was
+        cut off applied, recovering the file if it's torn.
+        """
+        with open(self.path, "rb") as f:
+            data = f.read()
+        try:
+            patches = read_journal(self.journal_path)
+        except FileNotFoundError:
+            patches = None
+        if patches:
+            data = patch_data(data, patches)
+        self._detect(data)
+        try:
+            return codec.decode(data)
+        except ValueError as error:
+            return self.recover(error)
+
+    def save(self, db: dict) -> None:
+        self._replay_journal()
+        records = db["records"]
+        if isinstance(records, LazyJsonRecords):
+            db = {**db, "records": records.materialize()}
+
+        # Indented debug databases are kept without slots.
+        if config.DEBUG or self.format != "json":
+            data = self._encode(db)
+            write_atomic(
+                self.path, lambda f: f.write(data), config.BACKUPS, binary=True
+            )
+            self.offsets.remove()
+            return
+
+        indexed = write_atomic(
+            self.path,
+            lambda f: dump_database(db, f),
+            config.BACKUPS,
+            binary=True,
+        )
+        if indexed is None:
+            self.offsets.remove()
+        else:
+            self.offsets.write(*indexed)
+
+    def write(self, db: dict, changes: Changes) -> None:
+        self._replay_journal()
+        planned = self._plan(db, changes)
+        if planned is None:
+            self.save(db)
+            return
+
+        patches, appended, removed = planned
+        written = os.stat(self.path).st_mtime_ns
+        write_journal(self.journal_path, patches)
+        apply_patches(self.path, patches)
+        # The file keeps its inode and maybe its size, other processes see
+        # the change only if its modification time is different.
+        stat = os.stat(self.path)
+        if stat.st_mtime_ns <= written:
+            os.utime(self.path, ns=(stat.st_atime_ns, written + 1))
+        if removed:
+            entries = [
+                entry
+                for entry in self.offsets.entries()
+                if entry[0] not in removed
+            ]
+            self.offsets.write(db["last_id"], entries + appended)
+        else:
+            self.offsets.extend(db["last_id"], appended)
+        self.journal_path.unlink()
+        if metrics.enabled:
+            metrics.inc(
+                "bytes_written_total",
+                2 * sum(len(data) for _, data in patches),
+            )
+
+    def _replay_journal(self) -> None:
+        """
+        Finish a write that was cut off, with the exclusive lock held. The
+        database in memory was loaded with the journal applied already.
+        """
+        if replay_journal(self.journal_path, self.path):
+            self.offsets.remove()
+
+    def _plan(
+        self, db: dict, changes: Changes
+    ) -> tuple[list[Patch], list[tuple[int, int, int]], set[int]] | None:
+        """
+        Returns patches of the database file that write the changes in
+        place, together with offset index entries of appended records and
+        numbers of removed ones, or `None` if the database has to be saved
+        as a whole.
+        """
+        # Rolling backups are copies of whole files.
+        if config.DEBUG or config.BACKUPS > 0 or self.format != "json":
+            return None
+        if not self.offsets.load() or not is_slotted(self.path):
+            return None
+
+        patches = []
+        # Records created and deleted by the same batch are not in the file.
+        removed = {
+            get_number(identifier)
+            for identifier, record in changes.items()
+            if record is None and self.offsets.lookup(identifier) is not None
+        }
+        if removed:
+            for start, end in blank_records(self.offsets.entries(), removed):
+                patches.append((start, b" " * (end - start)))
+        kept = self.offsets.count - len(removed)
+
+        appended = []
+        last_number = self.offsets.last_number()
+        # New records replace the closing braces of the file.
+        tail = os.path.getsize(self.path) - 2
+        for identifier, record in changes.items():
+            if record is None:
+                continue
+            location = self.offsets.lookup(identifier)
+            value = codec.dumps(record)
+            if location is not None:
+                offset, length = location
+                if len(value) > length:
+                    return None
+                patches.append((offset, value.ljust(length)))
+                continue
+
+            number = get_number(identifier)
+            if number is None or number <= last_number:
+                return None
+            separator = b", " if kept or appended else b""
+            key = separator + codec.dumps(identifier) + b": "
+            value = slot(value)
+            patches.append((tail, key + value))
+            appended.append((number, tail + len(key), len(value)))
+            tail += len(key) + len(value)
+            last_number = number
+
+        if appended:
+            patches.append((tail, b"}}"))
+        patches.append((LAST_ID_OFFSET, pad_last_id(db["last_id"])))
+        return patches, appended, removed
+
+    def recover(self, error: ValueError) -> dict:
+        """
+        Repair the torn database file from the most recent complete copy,
+        i.e. a leftover temporary file or a backup, or from the records that
+        can be salvaged from it. The torn file is kept with `.corrupt`
+        suffix. Records can't be salvaged from a binary snapshot.
+        """
+        logger.warning(f"Database file {self.path} is torn: {error}")
+
+        candidates = []
+        for path in [temp_path(self.path), *backup_paths(self.path)]:
+            try:
+                with open(path, "rb") as f:
+                    db = codec.decode(f.read())
+            except (OSError, ValueError):
+                continue
+            if "last_id" in db:
+                candidates.append((db["last_id"], len(db["records"]), db))
+
+        if candidates:
+            db = max(candidates, key=lambda x: x[:2])[2]
+        else:
+            with open(self.path, "rb") as f:
+                data = f.read()
+            if codec.detect(data) == "binary":
+                raise ValueError(
+                    f"Database file {self.path} is damaged and there is "
+                    "no complete copy to recover it from."
+                ) from error
+            db = salvage_database(data.decode("utf-8", errors="replace"))
+            db["records"] = Records(
+                {
+                    identifier: compact(record)
+                    for identifier, record in db["records"].items()
+                }
+            )
+
+        os.replace(self.path, self.path.with_name(self.path.name + ".corrupt"))
+        data = self._encode(db)
+        write_atomic(self.path, lambda f: f.write(data), binary=True)
+        self.offsets.remove()
+        logger.warning(
+            f"Recovered {len(db['records'])} records into {self.path}"
+        )
+        return db
+
+    def _encode(self, db: dict) -> bytes:
+        return codec.encode(db, self.format, indent=config.DEBUG)
+
+    def _detect(self, data: bytes | None = None) -> str:
+        """
+        Returns format of the database file and keeps saving in it, unless
+        another format was requested.
+        """
+        if data is None:
+            try:
+                with open(self.path, "rb") as f:
+                    data = f.read(len(codec.Snapshot.MAGIC))
+            except FileNotFoundError:
+                return self.format
+        detected = codec.detect(data)
+        if self.requested_format is None:
+            self.format = detected
+        return detected
+
+
+class LazyJsonRecords(MutableMapping):
+    """
+    Mapping of records that reads single records and lists identifiers
+    through the offset index, and parses the whole database only when its
+    records are iterated or changed.
+    """
+
+    def __init__(self, storage: JsonStorage):
+        self._storage = storage
+        self._records: dict | None = None
+
+    def materialize(self) -> dict:
+        """Parse all records of the database, once."""
+        if self._records is None:
+            self._records = self._storage.read()["records"]
+        return self._records
+
+    def __getitem__(self, identifier: str) -> dict[str, str]:
+        if self._records is not None:
+            return self._records[identifier]
+        record = self._storage.offsets.read(identifier)
+        if record is None:
+            raise KeyError(identifier)
+        return compact(record)
+
+    def __contains__(self, identifier: object) -> bool:
+        if self._records is not None:
+            return identifier in self._records
+        if not isinstance(identifier, str):
+            return False
+        return self._storage.offsets.lookup(identifier) is not None
+
+    def __setitem__(self, identifier: str, record: dict[str, str]) -> None:
+        self.materialize()[identifier] = record
+
+    def __delitem__(self, identifier: str) -> None:
+        del self.materialize()[identifier]
+
+    def __iter__(self) -> Iterator[str]:
+        if self._records is not None:
+            return iter(self._records)
+        # Identifiers are listed by the index, in the order of records in
+        # the file, the same as if it was parsed.
+        entries = sorted(
+            self._storage.offsets.entries(), key=lambda entry: entry[1]
+        )
+        return (f"lr-{number}" for number, _, _ in entries)
+
+    def __len__(self) -> int:
+        if self._records is not None:
+            return len(self._records)
+        return self._storage.offsets.count
+
+    def values(self) -> ValuesView:
+        return self.materialize().values()
+
+    def items(self) -> ItemsView:
+        return self.materialize().items()
+
+
+class LogStorage(JsonStorage):
+    """
+    Backend that appends every mutation as a single line to a log file next
+    to the JSON snapshot.
+
+    The log is replayed on top of the snapshot on load and is compacted into
+    a new snapshot in a background thread once it grows past
+    `config.LOG_COMPACT_THRESHOLD` entries. The snapshot is written in the
+    same format as by `JsonStorage`, while the log is always JSON lines.
+
+    The log is reopened on every write, so processes sharing the database
+    never append to a log that another one has already compacted.
+    """
+
+    def __init__(
+        self, path: Path, lazy: bool = False, format: str | None = None
+    ):
+        super().__init__(path, lazy, format)
+        self.log_path = path.with_name(path.name + ".log")
+        self.compacting_path = path.with_name(path.name + ".log.compacting")
+        self._entries = 0
+        self._compactor: threading.Thread | None = None
+
+    def init(self) -> None:
+        super().init()
+        self.log_path.unlink(missing_ok=True)
+        self.compacting_path.unlink(missing_ok=True)
+
+    def load(self) -> dict:
+        # A running compaction doesn't have to be waited for, the snapshot
+        # together with both logs is complete at any point.
+        db = self.read()
+        self._entries = 0
+        for path in (self.compacting_path, self.log_path):
+            self._entries += self._replay(db, path)
+        return db
+
+    def save(self, db: dict) -> None:
+        super().save(db)
+        self.compacting_path.unlink(missing_ok=True)
+        self.log_path.unlink(missing_ok=True)
+        self._entries = 0
+
+    def write(self, db: dict, changes: Changes) -> None:
+        lines = []
+        for identifier, record in changes.items():
+            entry = {"last_id": db["last_id"]}
+            if record is None:
+                entry["delete"] = identifier
+            else:
+                entry["put"] = record
+            lines.append(codec.dumps(entry) + b"\n")
+        data = b"".join(lines)
+        with open(self.log_path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if metrics.enabled:
+            metrics.inc("bytes_written_total", len(data))
+
+        self._entries += len(lines)
+        if self._entries >= config.LOG_COMPACT_THRESHOLD:
+            self.compact(db)
+
+    def compact(self, db: dict) -> None:
+        """Fold the log into a new snapshot in a background thread."""
+        if self.compacting_path.exists():
+            # A compaction of this or another process is still running.
+            return
+
+        # Records are replaced rather than mutated in place, so a shallow copy
+        # is a consistent view even while new mutations keep coming in.
+        snapshot = {"last_id": db["last_id"], "records": db["records"].copy()}
+        os.replace(self.log_path, self.compacting_path)
+        self._entries = 0
+
+        self._compactor = threading.Thread(
+            target=self._finish_compaction, args=(snapshot,)
+        )
+        self._compactor.start()
+
+    def wait(self) -> None:
+        """Block until a running compaction has finished."""
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def close(self) -> None:
+        self.wait()
+
+    def files(self) -> list[Path]:
+        return [self.path, self.compacting_path, self.log_path]
+
+    def _finish_compaction(self, snapshot: dict) -> None:
+        with self.lock():
+            # A full save in the meantime already includes the snapshot.
+            if self.compacting_path.exists():
+                JsonStorage.save(self, snapshot)
+                self.compacting_path.unlink()
+
+    @staticmethod
+    def _replay(db: dict, path: Path) -> int:
+        """Apply log entries from path to db, return number of entries."""
+        if not path.exists():
+            return 0
+
+        entries = 0
+        records = db["records"]
+        with open(path, "rb") as f:
+            lines = f.readlines()
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = codec.loads(line)
+            except ValueError:
+                if number < len(lines):
+                    raise
+                # Last entry was cut off by a crash while it was appended.
+                logger.warning(f"Dropping torn last entry of {path}")
+                with open(path, "r+b") as f:
+                    f.truncate(sum(len(x) for x in lines[:-1]))
+                break
+            if "put" in entry:
+                records[entry["put"]["id"]] = compact(entry["put"])
+            else:
+                records.pop(entry["delete"], None)
+            db["last_id"] = max(db["last_id"], entry["last_id"])
+            entries += 1
+        return entries
+
+
+class SqliteRecords(MutableMapping):
+    """
+    Mapping of records that reads and writes single rows of the SQLite
+    database instead of keeping records in memory.
+    """
+
+    COLUMNS = ("id", "timestamp", "tag", "title", "content")
+
+    def __init__(self, connection: "sqlite3.Connection"):
+        self._connection = connection
+
+    def __getitem__(self, identifier: str) -> dict[str, str]:
+        row = self._connection.execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM records WHERE id = ?",
+            (identifier,),
+        ).fetchone()
+        if row is None:
+            raise KeyError(identifier)
+        return dict(zip(self.COLUMNS, row))
+
+    def __setitem__(self, identifier: str, record: dict[str, str]) -> None:
+        self._connection.execute(
+            "INSERT INTO records (id, timestamp, ts, tag, title, content) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET timestamp = excluded.timestamp, "
+            "ts = excluded.ts, tag = excluded.tag, title = excluded.title, "
+            "content = excluded.content",
+            self.to_row(identifier, record),
+        )
+
+    def __delitem__(self, identifier: str) -> None:
+        cursor = self._connection.execute(
+            "DELETE FROM records WHERE id = ?", (identifier,)
+        )
+        if cursor.rowcount == 0:
+            raise KeyError(identifier)
+
+    def __contains__(self, identifier: object) -> bool:
+        row = self._connection.execute(
+            "SELECT 1 FROM records WHERE id = ?", (identifier,)
+        ).fetchone()
+        return row is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for (identifier,) in self._connection.execute(
+            "SELECT id FROM records ORDER BY rowid"
+        ):
+            yield identifier
+
+    def __len__(self) -> int:
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM records"
+        ).fetchone()[0]
+
+    def values(self) -> ValuesView:
+        return _SqliteValues(self)
+
+    def items(self) -> ItemsView:
+        return _SqliteItems(self)
+
+    def rows(self) -> Iterator[dict[str, str]]:
+        """Iterate over all records with a single query."""
+        for row in self._connection.execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM records ORDER BY rowid"
+        ):
+            yield dict(zip(self.COLUMNS, row))
+
+    @staticmethod
+    def to_row(identifier: str, record: dict[str, str]) -> tuple:
+        try:
+            ts = parse_timestamp(record["timestamp"])
+        except (KeyError, ValueError):
+            ts = None
+        return (
+            identifier,
+            record.get("timestamp"),
+            ts,
+            record.get("tag"),
+            record.get("title"),
+            record.get("content"),
+        )
+
+
+class _SqliteValues(ValuesView):
+    def __iter__(self) -> Iterator[dict[str, str]]:
+        yield from self._mapping.rows()
+
+
+class _SqliteItems(ItemsView):
+    def __iter__(self) -> Iterator[tuple[str, dict[str, str]]]:
+        for record in self._mapping.rows():
+            yield record["id"], record
+
+
+class SqliteStorage(Storage):
+    """
+    Backend that keeps records in a local SQLite database.
+
+    Records are not loaded on startup; `SqliteRecords` reads and writes only
+    the rows that are accessed, and changes are committed on every write.
+    """
+
+    filename = "life_records.db"
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS meta ("
+        "key TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS records ("
+        "id TEXT NOT NULL UNIQUE, timestamp TEXT, ts INTEGER, "
+        "tag TEXT, title TEXT, content TEXT)",
+        "CREATE INDEX IF NOT EXISTS records_tag ON records (tag)",
+        "CREATE INDEX IF NOT EXISTS records_ts ON records (ts)",
+    )
+
+    def __init__(self, path: Path, lazy: bool = False):
+        super().__init__(path, lazy)
+        self._connection: "sqlite3.Connection | None" = None
+
+    def init(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = self.connection
+        for statement in self.SCHEMA:
+            connection.execute(statement)
+        connection.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('last_id', 0)"
+        )
+        connection.commit()
+
+    def load(self) -> dict:
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'last_id'"
+        ).fetchone()
+        return {
+            "last_id": row[0] if row else 0,
+            "records": SqliteRecords(self.connection),
+        }
+
+    def save(self, db: dict) -> None:
+        records = db["records"]
+        if not isinstance(records, SqliteRecords):
+            self.connection.execute("DELETE FROM records")
+            self.connection.executemany(
+                "INSERT INTO records (id, timestamp, ts, tag, title, content) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    SqliteRecords.to_row(identifier, record)
+                    for identifier, record in records.items()
+                ),
+            )
+        self._commit(db)
+
+    def write(self, db: dict, changes: Changes) -> None:
+        # Rows were already written through `SqliteRecords`.
+        self._commit(db)
+
+    def begin(self) -> None:
+        # Savepoints nest, so changes of earlier batches that are not
+        # committed yet survive a discarded batch.
+        self.connection.execute("SAVEPOINT batch")
+
+    def discard(self) -> None:
+        self.connection.execute("ROLLBACK TO batch")
+        self.connection.execute("RELEASE batch")
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def query(
+        self,
+        tag: str | None,
+        since: int | None,
+        until: int | None,
+        limit: int | None,
+    ) -> dict[str, dict[str, str]]:
+        conditions = []
+        parameters: list = []
+        if tag is not None:
+            conditions.append("tag = ?")
+            parameters.append(tag)
+        if since is not None:
+            conditions.append("ts >= ?")
+            parameters.append(since)
+        if until is not None:
+            conditions.append("ts < ?")
+            parameters.append(until)
+        statement = (
+            f"SELECT {', '.join(SqliteRecords.COLUMNS)} FROM records"
+            f"{' WHERE ' + ' AND '.join(conditions) if conditions else ''}"
+            " ORDER BY ts, rowid"
+        )
+        if limit is not None:
+            statement += " LIMIT ?"
+            parameters.append(limit)
+
+        records = {}
+        for row in self.connection.execute(statement, parameters):
+            record = dict(zip(SqliteRecords.COLUMNS, row))
+            records[record["id"]] = record
+        return records
+
+    def _commit(self, db: dict) -> None:
+        self.connection.execute(
+            "UPDATE meta SET value = ? WHERE key = 'last_id'",
+            (db["last_id"],),
+        )
+        self.connection.commit()
+
+    @property
+    def connection(self) -> "sqlite3.Connection":
+        if self._connection is None:
+            # Imported only here, most commands never open a SQLite database.
+            import sqlite3
+
+            # Changes may be committed from a background thread, see
+            # `LifeRecorder.flush`; access is serialized by `LifeRecorder`.
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False
+            )
+        return self._connection
+
+
+class ShardedRecords(MutableMapping):
+    """
+    Mapping of records split into shards, each of which is read from its
+    file when a record of it is first accessed.
+
+    Shards are found by the manifest, which keeps for every shard the number
+    of its records, the range of numbers of its `lr-N` identifiers and its
+    tags. Changed shards are kept in `dirty` until they're written.
+    """
+
+    def __init__(self, storage: "ShardedStorage", manifest: dict[str, dict]):
+        self._storage = storage
+        self.manifest = manifest
+        self.shards: dict[str, Records] = {}
+        self.indexes: dict[str, QueryIndex] = {}
+        self.dirty: set[str] = set()
+
+    def shard(self, key: str) -> Records:
+        """Return records of the shard, read from its file once."""
+        records = self.shards.get(key)
+        if records is None:
+            records = self.shards[key] = self._storage.read_shard(key)
+        return records
+
+    def index(self, key: str) -> QueryIndex:
+        """Return tag and timeline index of the shard, built once."""
+        index = self.indexes.get(key)
+        if index is None:
+            index = self.indexes[key] = QueryIndex.build(
+                self.shard(key).values()
+            )
+        return index
+
+    def keys_between(
+        self, since: int | None = None, until: int | None = None
+    ) -> list[str]:
+        """
+        Returns keys of shards in chronological order, only the ones that
+        may hold records created at or after since and before until if any
+        of them is given.
+        """
+        keys = sorted(self.manifest, key=lambda key: (key != UNDATED, key))
+        if since is None and until is None:
+            return keys
+        first = shard_key(since) if since is not None else ""
+        last = shard_key(until - 1) if until is not None else "9999-99"
+        return [key for key in keys if key != UNDATED and first <= key <= last]
+
+    def find(self, identifier: str) -> str | None:
+        """Returns key of the shard holding the record, if any."""
+        number = pack_identifier(identifier)
+        for key, entry in self.manifest.items():
+            ids = entry["ids"]
+            # Shards with only `lr-N` identifiers can't hold others.
+            if ids is not None and (
+                type(number) is not int
+                or not ids
+                or not ids[0] <= number <= ids[1]
+            ):
+                continue
+            if identifier in self.shard(key):
+                return key
+        return None
+
+    def __getitem__(self, identifier: str) -> dict[str, str]:
+        key = self.find(identifier) if isinstance(identifier, str) else None
+        if key is None:
+            raise KeyError(identifier)
+        return self.shards[key][identifier]
+
+    def __contains__(self, identifier: object) -> bool:
+        return (
+            isinstance(identifier, str) and self.find(identifier) is not None
+        )
+
+    def __setitem__(self, identifier: str, record: dict[str, str]) -> None:
+        key = shard_key(record_epoch(record))
+        old_key = self.find(identifier)
+        if old_key is not None and old_key != key:
+            del self[identifier]
+        shard = self.shard(key)
+        entry = self.manifest.setdefault(
+            key, {"count": 0, "ids": [], "tags": []}
+        )
+        if identifier not in shard:
+            entry["count"] += 1
+        shard[identifier] = record
+        self.indexes.pop(key, None)
+
+        # The entry may only grow until the shard is written, which is
+        # enough for lookups to find the record.
+        number = pack_identifier(identifier)
+        if entry["ids"] is not None and type(number) is not int:
+            entry["ids"] = None
+        elif entry["ids"] == []:
+            entry["ids"] = [number, number]
+        elif entry["ids"] is not None:
+            entry["ids"] = [
+                min(entry["ids"][0], number),
+                max(entry["ids"][1], number),
+            ]
+        tag = record.get("tag") or ""
+        if tag not in entry["tags"]:
+            entry["tags"] = [*entry["tags"], tag]
+        self.dirty.add(key)
+
+    def __delitem__(self, identifier: str) -> None:
+        key = self.find(identifier)
+        if key is None:
+            raise KeyError(identifier)
+        del self.shards[key][identifier]
+        self.indexes.pop(key, None)
+        self.manifest[key]["count"] -= 1
+        self.dirty.add(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.keys_between():
+            yield from self.shard(key)
+
+    def __len__(self) -> int:
+        return sum(entry["count"] for entry in self.manifest.values())
+
+    def values(self) -> ValuesView:
+        return _ShardedValues(self)
+
+    def items(self) -> ItemsView:
+        return _ShardedItems(self)
+
+
+class _ShardedValues(ValuesView):
+    def __iter__(self) -> Iterator[dict[str, str]]:
+        for key in self._mapping.keys_between():
+            yield from self._mapping.shard(key).values()
+
+
+class _ShardedItems(ItemsView):
+    def __iter__(self) -> Iterator[tuple[str, dict[str, str]]]:
+        for key in self._mapping.keys_between():
+            yield from self._mapping.shard(key).items()
+
+
+class ShardedStorage(Storage):
+    """
+    Backend that splits records into a shard file per month of their
+    timestamps, next to a manifest with `last_id` and a summary of shards.
+
+    Only shards of the changed records are rewritten on every change, and
+    shards are read only once a record of them is accessed, or a query
+    touches their time range or tag. Shard files are written in the format
+    of `JsonStorage`, see `config.DATABASE_FORMAT`.
+    """
+
+    filename = os.path.join("life_records", "manifest.json")
+
+    def __init__(self, path: Path, lazy: bool = False):
+        super().__init__(path, lazy)
+        self.format = config.DATABASE_FORMAT or "json"
+        if self.format not in codec.FORMATS:
+            raise ValueError(
+                f"Unknown database format: {self.format}. "
+                f"Available formats: {', '.join(codec.FORMATS)}"
+            )
+        self._records: ShardedRecords | None = None
+        self._dirty: set[str] = set()
+
+    def init(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        for shard in self.shard_paths():
+            shard.unlink()
+        self._write_manifest({"last_id": 0, "shards": {}})
+
+    def load(self) -> dict:
+        with open(self.path, "rb") as f:
+            manifest = codec.loads(f.read())
+        self._records = ShardedRecords(self, manifest["shards"])
+        return {"last_id": manifest["last_id"], "records": self._records}
+
+    def save(self, db: dict) -> None:
+        records = db["records"]
+        if records is not self._records:
+            # Records of another backend, every shard is written anew.
+            shards: dict[str, Records] = {}
+            for identifier, record in records.items():
+                if type(record) is dict:
+                    record = compact(record)
+                key = shard_key(record_epoch(record))
+                if key not in shards:
+                    shards[key] = Records()
+                shards[key][identifier] = record
+            # Entries of the manifest are made when shards are written.
+            sharded = ShardedRecords(self, {})
+            # Shards that are left without records are removed.
+            sharded.shards = {key: Records() for key in self.shard_keys()}
+            sharded.shards.update(shards)
+            sharded.dirty.update(sharded.shards)
+            records = self._records = sharded
+        self.write({**db, "records": records}, {})
+
+    def write(self, db: dict, changes: Changes) -> None:
+        records = self._records
+        for key in sorted(records.dirty):
+            shard = records.shards[key]
+            path = self.shard_path(key)
+            if not shard:
+                path.unlink(missing_ok=True)
+                records.manifest.pop(key, None)
+                continue
+            records.manifest[key] = summarize(shard)
+            data = codec.encode(
+                {"last_id": db["last_id"], "records": shard},
+                self.format,
+                indent=config.DEBUG,
+            )
+            write_atomic(path, lambda f: f.write(data), binary=True)
+        records.dirty.clear()
+        # The manifest is written last, so a crash leaves it describing
+        # shards that are at least as new as it.
+        self._write_manifest(
+            {"last_id": db["last_id"], "shards": records.manifest}
+        )
+
+    def begin(self) -> None:
+        if self._records is not None:
+            self._dirty = set(self._records.dirty)
+
+    def discard(self) -> None:
+        # Changed records were already reverted by `LifeRecorder`, shards
+        # they made dirty are the same as on disk again.
+        if self._records is not None:
+            self._records.dirty = self._dirty
+
+    def query(
+        self,
+        tag: str | None,
+        since: int | None,
+        until: int | None,
+        limit: int | None,
+    ) -> dict[str, dict[str, str]]:
+        # Shards partition records by time, so shards are queried one by one
+        # in chronological order until there are enough records.
+        records = self._records
+        found = {}
+        for key in records.keys_between(since, until):
+            if tag is not None and tag not in records.manifest[key]["tags"]:
+                continue
+            shard = records.shard(key)
+            index = records.index(key)
+            remaining = limit - len(found) if limit is not None else None
+            for identifier in index.query(tag, since, until, remaining):
+                found[identifier] = shard[identifier]
+            if limit is not None and len(found) >= limit:
+                break
+        return found
+
+    def files(self) -> list[Path]:
+        # The manifest is rewritten on every change.
+        return [self.path]
+
+    def shard_path(self, key: str) -> Path:
+        """Returns path of the shard file."""
+        return self.path.with_name(f"{key}.json")
+
+    def shard_paths(self) -> list[Path]:
+        """Returns paths of existing shard files."""
+        return [
+            path
+            for path in self.path.parent.glob("*.json")
+            if path.stem == UNDATED or SHARD_PATTERN.fullmatch(path.stem)
+        ]
+
+    def shard_keys(self) -> list[str]:
+        """Returns keys of existing shard files."""
+        return [path.stem for path in self.shard_paths()]
+
+    def read_shard(self, key: str) -> Records:
+        """Returns records of the shard, empty if it has no file yet."""
+        try:
+            with open(self.shard_path(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return Records()
+        return codec.decode(data)["records"]
+
+    def _write_manifest(self, manifest: dict) -> None:
+        data = codec.dumps(manifest, indent=config.DEBUG)
+        write_atomic(self.path, lambda f: f.write(data), binary=True)
+
+
+def shard_key(epoch: int | str | None) -> str:
+    """Returns key of the monthly shard of packed timestamp."""
+    if type(epoch) is not int:
+        return UNDATED
+    day = date.fromordinal(epoch // 86400 + EPOCH_ORDINAL)
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+def record_epoch(record: dict[str, str]) -> int | str | None:
+    """Returns timestamp of the record packed as seconds since epoch."""
+    if type(record) is Record and record.epoch is not None:
+        return record.epoch
+    return pack_timestamp(record.get("timestamp"))
+
+
+def summarize(records: Records) -> dict:
+    """Returns manifest entry of the shard with records."""
+    numbers = []
+    tags = set()
+    for identifier, record in records.items():
+        numbers.append(pack_identifier(identifier))
+        tags.add(record.get("tag") or "")
+    packed = all(type(number) is int for number in numbers)
+    return {
+        "count": len(records),
+        "ids": [min(numbers), max(numbers)] if packed else None,
+        "tags": sorted(tags),
+    }
+
+
+def temp_path(path: Path) -> Path:
+    """Returns path of the temporary file used to write path atomically."""
+    return path.with_name(path.name + ".tmp")
+
+
+def backup_path(path: Path, number: int) -> Path:
+    """Returns path of the backup of path, `1` being the most recent."""
+    return path.with_name(f"{path.name}.bak.{number}")
+
+
+def backup_paths(path: Path) -> list[Path]:
+    """Returns paths of existing backups of path, most recent first."""
+    backups = []
+    for backup in path.parent.glob(f"{path.name}.bak.*"):
+        number = backup.name.rsplit(".", 1)[-1]
+        if number.isdigit():
+            backups.append((int(number), backup))
+    return [backup for _, backup in sorted(backups)]
+
+
+def write_atomic(
+    path: Path,
+    dump: Callable[[TextIO], T] | Callable[[BinaryIO], T],
+    backups: int = 0,
+    binary: bool = False,
+) -> T:
+    """
+    Write path through `dump` into a temporary file, flush it to disk and
+    rename it over path, so path always holds either the old or the new
+    content. The old content is kept in up to `backups` rolling backups.
+    """
+    temp = temp_path(path)
+    with open(temp, "wb" if binary else "w") as f:
+        result = dump(f)
+        f.flush()
+        os.fsync(f.fileno())
+        if metrics.enabled:
+            metrics.inc("bytes_written_total", f.tell())
+
+    if backups > 0 and path.exists():
+        for number in range(backups - 1, 0, -1):
+            if backup_path(path, number).exists():
+                os.replace(
+                    backup_path(path, number), backup_path(path, number + 1)
+                )
+        latest = backup_path(path, 1)
+        latest.unlink(missing_ok=True)
+        try:
+            os.link(path, latest)
+        except OSError:
+            shutil.copy2(path, latest)
+
+    os.replace(temp, path)
+    _fsync_directory(path.parent)
+    return result
+
+
+def write_journal(path: Path, patches: list[Patch]) -> None:
+    """
+    Write patches to the journal and flush it to disk. The journal ends
+    with a trailer, so a journal cut off by a crash is told apart.
+    """
+    data = [
+        JOURNAL_ENTRY.pack(offset, len(patch)) + patch
+        for offset, patch in patches
+    ]
+    data.append(JOURNAL_TRAILER.pack(JOURNAL_MAGIC, len(patches)))
+    with open(path, "wb") as f:
+        f.write(b"".join(data))
+        f.flush()
+        os.fsync(f.fileno())
+    _fsync_directory(path.parent)
+
+
+def read_journal(path: Path) -> list[Patch] | None:
+    """Returns patches of a complete journal, `None` if it's incomplete."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < JOURNAL_TRAILER.size:
+        return None
+    magic, count = JOURNAL_TRAILER.unpack_from(
+        data, len(data) - JOURNAL_TRAILER.size
+    )
+    if magic != JOURNAL_MAGIC:
+        return None
+
+    patches = []
+    position = 0
+    for _ in range(count):
+        if position + JOURNAL_ENTRY.size > len(data):
+            return None
+        offset, length = JOURNAL_ENTRY.unpack_from(data, position)
+        position += JOURNAL_ENTRY.size
+        patches.append((offset, data[position : position + length]))
+        position += length
+    if position != len(data) - JOURNAL_TRAILER.size:
+        return None
+    return patches
+
+
+def replay_journal(path: Path, path_to_db: Path) -> bool:
+    """
+    Apply patches left in the journal by a write that was cut off, then
+    remove it. Returns `True` if the database file was patched.
+    """
+    try:
+        patches = read_journal(path)
+    except FileNotFoundError:
+        return False
+    # A journal that wasn't written completely wasn't applied either.
+    if patches is not None:
+        logger.warning(f"Replaying {len(patches)} patches of {path}")
+        apply_patches(path_to_db, patches)
+    path.unlink(missing_ok=True)
+    return patches is not None
+
+
+def patch_data(data: bytes, patches: list[Patch]) -> bytes:
+    """Returns contents of the file as `apply_patches` would leave it."""
+    patched = bytearray(data)
+    for offset, patch in patches:
+        if offset > len(patched):
+            patched.extend(bytes(offset - len(patched)))
+        patched[offset : offset + len(patch)] = patch
+    return bytes(patched)
+
+
+def apply_patches(path: Path, patches: list[Patch]) -> None:
+    """Write patches in place and flush the file to disk."""
+    with open(path, "r+b") as f:
+        for offset, data in patches:
+            f.seek(offset)
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _fsync_directory(path: Path) -> None:
+    """Flush the rename of a file in the directory to disk, if supported."""
+    try:
+        descriptor = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+STORAGES: dict[str, type[Storage]] = {
+    "json": JsonStorage,
+    "log": LogStorage,
+    "sqlite": SqliteStorage,
+    "sharded": ShardedStorage,
+}
+
+
+def get_storage(name: str) -> type[Storage]:
+    """Return the storage backend class registered under the given name."""
+    if name not in STORAGES:
+        raise ValueError(
+            f"Unknown storage backend: {name}. "
+            f"Available backends: {', '.join(STORAGES)}"
+        )
+    return STORAGES[name]
+
+
+def migrate_database(source: Storage, target: Storage) -> int:
+    """
+    Copy every record from source storage into target storage, replacing
+    its content. Returns the number of migrated records.
+    """
+    db = source.load()
+    target.save(db)
+    return len(db["records"])
@@ -0,0 +1,121 @@
+"""
+Module that provides streaming import and export of life records in NDJSON
+and CSV formats.
+
+Records are processed in chunks, so only a single chunk is buffered by the
+pipeline at a time, no matter how many records are moved.
+"""
+
+import csv
+import json
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from itertools import islice
+from pathlib import Path
+from typing import TextIO
+
+from .base import LifeRecorder
+
+FORMATS = ("ndjson", "csv")
+FIELDS = ("id", "timestamp", "tag", "title", "content")
+CHUNK_SIZE = 10_000
+
+Progress = Callable[[int], None]
+"""Callback receiving the number of records processed so far."""
+
+
+def guess_format(path: str | Path) -> str:
+    """Returns the format of the file based on its extension."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        return "csv"
+    if suffix in (".ndjson", ".jsonl"):
+        return "ndjson"
+    raise ValueError(
+        f"Can't guess format of {path}, use one of: {', '.join(FORMATS)}"
+    )
+
+
+def read_records(f: TextIO, format: str) -> Iterator[dict[str, str]]:
+    """Yields records from the file one by one."""
+    if format == "ndjson":
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError(f"Line {number} is not a JSON object.")
+            yield record
+    elif format == "csv":
+        for record in csv.DictReader(f):
+            yield {key: value or "" for key, value in record.items()}
+    else:
+        raise ValueError(f"Unknown format: {format}")
+
+
+def write_records(
+    records: Iterable[Mapping[str, str]],
+    f: TextIO,
+    format: str,
+    chunk_size: int = CHUNK_SIZE,
+    progress: Progress | None = None,
+) -> int:
+    """
+    Write records to the file, a chunk at a time. Returns the number of
+    written records.
+    """
+    if format == "csv":
+        writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        encode = None
+    elif format == "ndjson":
+        writer = None
+        encode = json.dumps
+    else:
+        raise ValueError(f"Unknown format: {format}")
+
+    count = 0
+    records = iter(records)
+    while chunk := list(islice(records, chunk_size)):
+        if writer is not None:
+            writer.writerows(chunk)
+        else:
+            f.write("".join(f"{encode(dict(record))}\n" for record in chunk))
+        count += len(chunk)
+        if progress is not None:
+            progress(count)
+    return count
+
+
+def import_records(
+    life_recorder: LifeRecorder,
+    records: Iterable[dict[str, str]],
+    chunk_size: int = CHUNK_SIZE,
+    progress: Progress | None = None,
+) -> int:
+    """
+    Create records in the database, a chunk at a time. Each chunk gets new
+    identifiers at once and is saved with a single write; timestamps of
+    imported records are kept. Returns the number of imported records.
+    """
+    count = 0
+    records = iter(records)
+    while chunk := list(islice(records, chunk_size)):
+        life_recorder.create_many(
+            (_to_record(record) for record in chunk), keep_timestamps=True
+        )
+        count += len(chunk)
+        if progress is not None:
+            progress(count)
+    return count
+
+
+def _to_record(record: Mapping[str, str]) -> dict[str, str]:
+    """Returns record fields known to the database, missing ones empty."""
+    new_record = {
+        "tag": record.get("tag") or "",
+        "title": record.get("title") or "",
+        "content": record.get("content") or "",
+    }
+    if record.get("timestamp"):
+        new_record["timestamp"] = record["timestamp"]
+    return new_record
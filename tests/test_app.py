@@ -0,0 +1,96 @@
+import asyncio
+import shutil
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# The app imports the package as it's installed, not from `src`.
+SOURCE = str(Path(__file__).parent.parent / "src")
+if SOURCE not in sys.path:
+    sys.path.insert(0, SOURCE)
+
+from textual.widgets import ListView  # noqa: E402
+
+from life_recorder import config  # noqa: E402
+from life_recorder.app import LifeRecorderApp, Notes  # noqa: E402
+from life_recorder.base import LifeRecorder  # noqa: E402
+from life_recorder.storage import JsonStorage  # noqa: E402
+
+
+class TestNotesPaging(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = Path("test_app_db")
+        self.directory.mkdir()
+        self.addCleanup(shutil.rmtree, self.directory)
+        for patch in (
+            mock.patch.object(config, "DEBUG", False),
+            mock.patch.object(Notes, "PAGE_SIZE", 6),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.path = self.directory / "db.json"
+        JsonStorage(self.path).init()
+        LifeRecorder(self.path).create_many(
+            {"tag": "", "title": f"Note {number}", "content": "Content"}
+            for number in range(1, 41)
+        )
+        return super().setUp()
+
+    def assertMounted(self, notes: Notes, list_view: ListView) -> None:
+        self.assertLessEqual(len(list_view.children), 18)
+        self.assertEqual(
+            [item.id for item in list_view.children],
+            notes.identifiers[notes.start : notes.loaded],
+        )
+
+    def test_window_of_notes(self):
+        asyncio.run(self.scroll_window_of_notes())
+
+    async def scroll_window_of_notes(self):
+        life_recorder = LifeRecorder(self.path, write_behind=True, lazy=True)
+        app = LifeRecorderApp(life_recorder)
+        async with app.run_test(size=(100, 40)) as pilot:
+            # Only the first page is read, records are not loaded.
+            self.assertIsNone(life_recorder.records._records)
+            notes = app.query_one(Notes)
+            list_view = app.query_one("#list-view", ListView)
+            self.assertEqual(len(list_view.children), 6)
+
+            # The cursor at either end of the window mounts another page.
+            list_view.focus()
+            for _ in range(4):
+                list_view.index = len(list_view.children) - 1
+                await pilot.pause()
+            self.assertMounted(notes, list_view)
+            self.assertEqual(notes.start, 12)
+            self.assertEqual(list_view.highlighted_child.id, "lr-24")
+
+            list_view.index = 0
+            await pilot.pause()
+            self.assertMounted(notes, list_view)
+            self.assertEqual(notes.start, 6)
+            # The highlighted note is the same, further down the list.
+            self.assertEqual(list_view.highlighted_child.id, "lr-13")
+
+            for _ in range(12):
+                list_view.scroll_end(animate=False, immediate=True)
+                await pilot.pause()
+            self.assertMounted(notes, list_view)
+            self.assertEqual(notes.loaded, 40)
+            for _ in range(12):
+                list_view.scroll_home(animate=False, immediate=True)
+                await pilot.pause()
+            self.assertMounted(notes, list_view)
+            self.assertEqual(notes.start, 0)
+
+            loaded = notes.loaded
+            life_recorder.delete("lr-1")
+            await pilot.pause()
+            self.assertMounted(notes, list_view)
+            self.assertEqual(notes.loaded, loaded - 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,7 @@
 # responsibility for each method and keep them small and focused in single
 # class.
 
+import glob
 import json
 import os
 from pathlib import Path
@@ -28,8 +29,8 @@ class TestLifeRecorder(unittest.TestCase):
         return super().setUp()
 
     def tearDown(self) -> None:
-        if os.path.exists(self.path_to_temp_db):
-            os.remove(self.path_to_temp_db)
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
         return super().tearDown()
 
     def assertDictContainsSubset(self, subset: dict, dictionary: dict) -> None:
@@ -203,6 +204,121 @@ class TestLifeRecorder(unittest.TestCase):
                 {"tag": "test", "title": "Test", "content": "Test"},
             )
 
+    def test_batch_saves_once(self):
+        life_recorder = LifeRecorder(path_to_db=self.path_to_temp_db)
+        with patch.object(
+            life_recorder, "_save_database", wraps=life_recorder._save_database
+        ) as save_database:
+            with life_recorder.batch():
+                life_recorder.create(
+                    {"tag": "a", "title": "First", "content": "1"}
+                )
+                life_recorder.update(
+                    "lr-1", {"tag": "b", "title": "Second", "content": "2"}
+                )
+                life_recorder.delete("lr-2")
+                self.assertIn("lr-4", life_recorder.records)
+            save_database.assert_called_once()
+
+        life_recorder = LifeRecorder(path_to_db=self.path_to_temp_db)
+        self.assertEqual(life_recorder.db["last_id"], 4)
+        self.assertEqual(list(life_recorder.records), ["lr-1", "lr-3", "lr-4"])
+        self.assertEqual(life_recorder.records["lr-1"]["title"], "Second")
+
+    def test_batch_is_rolled_back_on_error(self):
+        life_recorder = LifeRecorder(path_to_db=self.path_to_temp_db)
+        with self.assertRaises(ValueError):
+            with life_recorder.batch():
+                life_recorder.create(
+                    {"tag": "a", "title": "First", "content": "1"}
+                )
+                life_recorder.update(
+                    "lr-1", {"tag": "b", "title": "Second", "content": "2"}
+                )
+                life_recorder.delete("lr-2")
+                life_recorder.delete("non_existent")
+
+        self.assertEqual(life_recorder.db, self.db)
+        with open(self.path_to_temp_db, "r") as f:
+            self.assertEqual(json.load(f), self.db)
+
+    def test_create_many(self):
+        life_recorder = LifeRecorder(path_to_db=self.path_to_temp_db)
+        records = life_recorder.create_many(
+            {"tag": "bulk", "title": f"Note {i}", "content": "..."}
+            for i in range(3)
+        )
+        self.assertEqual(
+            [record["id"] for record in records], ["lr-4", "lr-5", "lr-6"]
+        )
+
+        life_recorder = LifeRecorder(path_to_db=self.path_to_temp_db)
+        self.assertEqual(life_recorder.db["last_id"], 6)
+        self.assertEqual(life_recorder.records["lr-6"]["title"], "Note 2")
+
+        with self.assertRaises(ValueError):
+            life_recorder.create_many(
+                [{"tag": "bulk", "title": "Ok", "content": "..."}, {}]
+            )
+        self.assertEqual(life_recorder.db["last_id"], 6)
+        self.assertNotIn("lr-7", life_recorder.records)
+
+    def test_update_many(self):
+        life_recorder = LifeRecorder(path_to_db=self.path_to_temp_db)
+        updated_data = {"tag": "bulk", "title": "Updated", "content": "..."}
+        life_recorder.update_many({"lr-1": updated_data, "lr-3": updated_data})
+
+        life_recorder = LifeRecorder(path_to_db=self.path_to_temp_db)
+        self.assertDictContainsSubset(
+            updated_data, life_recorder.records["lr-1"]
+        )
+        self.assertDictContainsSubset(
+            updated_data, life_recorder.records["lr-3"]
+        )
+
+    def test_delete_many(self):
+        life_recorder = LifeRecorder(path_to_db=self.path_to_temp_db)
+        life_recorder.delete_many(["lr-1", "lr-3"])
+
+        life_recorder = LifeRecorder(path_to_db=self.path_to_temp_db)
+        self.assertEqual(list(life_recorder.records), ["lr-2"])
+
+        with self.assertRaises(ValueError):
+            life_recorder.delete_many(["lr-2", "lr-2"])
+        self.assertIn("lr-2", life_recorder.records)
+
+    def test_write_behind_saves_on_flush(self):
+        life_recorder = LifeRecorder(
+            path_to_db=self.path_to_temp_db, write_behind=True
+        )
+        with patch.object(
+            life_recorder, "_save_database", wraps=life_recorder._save_database
+        ) as save_database:
+            life_recorder.create(
+                {"tag": "a", "title": "First", "content": "1"}
+            )
+            life_recorder.delete("lr-1")
+            with self.assertRaises(ValueError):
+                life_recorder.delete("non_existent")
+            self.assertTrue(life_recorder.unsaved)
+            self.assertIn("lr-4", life_recorder.read())
+            save_database.assert_not_called()
+            with open(self.path_to_temp_db, "r") as f:
+                self.assertEqual(json.load(f), self.db)
+
+            self.assertTrue(life_recorder.flush())
+            self.assertFalse(life_recorder.flush())
+            save_database.assert_called_once()
+        self.assertFalse(life_recorder.unsaved)
+
+        life_recorder.update(
+            "lr-2", {"tag": "b", "title": "New", "content": ""}
+        )
+        life_recorder.close()
+        life_recorder = LifeRecorder(path_to_db=self.path_to_temp_db)
+        self.assertEqual(list(life_recorder.records), ["lr-2", "lr-3", "lr-4"])
+        self.assertEqual(life_recorder.records["lr-2"]["title"], "New")
+
 
 if __name__ == "__main__":
     unittest.main()
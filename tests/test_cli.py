@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+SOURCE = str(Path(__file__).parent.parent / "src")
+
+
+class TestStartup(unittest.TestCase):
+    def run_cli(self, *arguments: str) -> subprocess.CompletedProcess:
+        with tempfile.TemporaryDirectory() as directory:
+            return subprocess.run(
+                [sys.executable, "-m", "life_recorder.cli", *arguments],
+                cwd=directory,
+                env={**os.environ, "PYTHONPATH": SOURCE, "DEBUG": "1"},
+                capture_output=True,
+                text=True,
+            )
+
+    def test_heavy_modules_are_not_imported(self):
+        process = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, life_recorder.cli; "
+                "print(*sorted(set(sys.argv[1:]) & set(sys.modules)))",
+                "loguru",
+                "rich",
+                "sqlite3",
+                "orjson",
+                "textual",
+            ],
+            env={**os.environ, "PYTHONPATH": SOURCE},
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(process.stderr, "")
+        self.assertEqual(process.stdout.strip(), "")
+
+    def test_profile_startup(self):
+        process = self.run_cli("--profile-startup", "read", "lr-1")
+        self.assertEqual(process.returncode, 0)
+        self.assertIn("didn't match", process.stdout)
+        self.assertIn("life_recorder.base", process.stderr)
+        self.assertNotIn("import time:", process.stderr)
+
+    def test_read_formats(self):
+        process = self.run_cli("read", "--format", "json", "--sort", "id")
+        self.assertEqual(process.returncode, 0)
+        self.assertEqual(process.stdout, "[]\n")
+        process = self.run_cli("read", "--format", "xml")
+        self.assertEqual(process.returncode, 2)
+        self.assertIn("'xml' is not one of", process.stderr)
+
+    def test_stats(self):
+        process = self.run_cli("stats")
+        self.assertEqual(process.returncode, 0)
+        self.assertIn("No metrics were collected", process.stdout)
+
+    def test_history(self):
+        process = self.run_cli("history", "lr-1")
+        self.assertEqual(process.returncode, 0)
+        self.assertIn("didn't match", process.stdout)
+        process = self.run_cli("history", "--prune", "--keep", "1")
+        self.assertEqual(process.returncode, 0)
+        self.assertIn("Dropped 0 old revisions.", process.stdout)
+        process = self.run_cli("revert", "lr-1", "0")
+        self.assertEqual(process.returncode, 2)
@@ -0,0 +1,231 @@
+import glob
+import json
+import os
+import shutil
+import unittest
+from pathlib import Path
+from unittest.mock import ANY, patch
+
+from src.life_recorder import codec, config
+from src.life_recorder.base import LifeRecorder
+from src.life_recorder.record import Compressed
+from src.life_recorder.storage import JsonStorage, LogStorage
+
+
+class TestCodec(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open("./tests/fixtures/db.json", "r") as f:
+            cls.db = json.load(f)
+
+    def test_json_roundtrip(self):
+        data = codec.encode(codec.decode(json.dumps(self.db).encode()), "json")
+        self.assertEqual(json.loads(data), self.db)
+
+    def test_json_without_orjson(self):
+        with patch.object(codec, "JSON_LIBRARY", "json"):
+            data = codec.encode(self.db, "json")
+            self.assertEqual(codec.decode(data), self.db)
+        self.assertEqual(json.loads(data), self.db)
+
+    def test_indented_json(self):
+        data = codec.encode(self.db, "json", indent=True)
+        self.assertEqual(data.decode(), json.dumps(self.db, indent=4))
+
+    def test_binary_roundtrip(self):
+        data = codec.encode(self.db, "binary")
+        self.assertEqual(codec.detect(data), "binary")
+        db = codec.decode(data)
+        self.assertEqual(db, self.db)
+        self.assertEqual(list(db["records"]), list(self.db["records"]))
+
+    def test_binary_keeps_records_it_cannot_pack(self):
+        records = {
+            "lr-1": {
+                "id": "lr-1",
+                "timestamp": "10-Aug-2025 16:06",
+                "tag": "ünïcode",
+                "title": "Emoji 🐋",
+                "content": "Lone surrogate \ud800",
+            },
+            "custom": {"id": "custom", "title": "No timestamp"},
+            "lr-2": {
+                "id": "lr-2",
+                "timestamp": "yesterday",
+                "tag": "",
+                "title": "",
+                "content": "",
+            },
+            "lr-3": {
+                "id": "lr-3",
+                "timestamp": "11-Aug-2025 07:32",
+                "tag": None,
+                "title": "",
+                "content": "",
+            },
+            "lr-4": {
+                "id": "lr-9",
+                "timestamp": "11-Aug-2025 07:32",
+                "tag": "",
+                "title": "",
+                "content": "",
+            },
+        }
+        db = codec.decode(
+            codec.encode({"last_id": 4, "records": records}, "binary")
+        )
+        self.assertEqual(db["last_id"], 4)
+        self.assertEqual(list(db["records"]), list(records))
+        self.assertEqual(db["records"], records)
+
+    def test_damaged_binary_is_rejected(self):
+        data = codec.encode(self.db, "binary")
+        with self.assertRaises(ValueError):
+            codec.decode(data[:-1])
+        with self.assertRaises(ValueError):
+            codec.decode(data[:4] + b"\x02" + data[5:])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            codec.encode(self.db, "xml")
+        with self.assertRaises(ValueError):
+            JsonStorage(Path("db.json"), format="xml")
+
+
+class TestDatabaseFormat(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.path_to_db = "./tests/fixtures/db.json"
+        with open(cls.path_to_db, "r") as f:
+            cls.db = json.load(f)
+
+    def setUp(self) -> None:
+        self.path_to_temp_db = shutil.copy(
+            self.path_to_db, "test_format_db.json"
+        )
+        patcher = patch("src.life_recorder.storage.logger")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
+        return super().tearDown()
+
+    def read_format(self) -> str:
+        with open(self.path_to_temp_db, "rb") as f:
+            return codec.detect(f.read())
+
+    def new_note(self) -> dict[str, str]:
+        return {"tag": "format", "title": "New", "content": ""}
+
+    @patch.object(config, "DATABASE_FORMAT", "binary")
+    def test_database_is_converted_on_save(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        self.assertEqual(self.read_format(), "json")
+        life_recorder.create(self.new_note())
+        self.assertEqual(self.read_format(), "binary")
+
+        with patch.object(config, "DATABASE_FORMAT", ""):
+            life_recorder = LifeRecorder(self.path_to_temp_db)
+        self.assertEqual(len(life_recorder.records), 4)
+        # Format of the file is kept if no other one is requested.
+        life_recorder.delete("lr-4")
+        self.assertEqual(self.read_format(), "binary")
+        self.assertEqual(life_recorder.records, self.db["records"])
+
+    def test_lazy_load_of_binary_database(self):
+        JsonStorage(Path(self.path_to_temp_db), format="binary").save(self.db)
+        life_recorder = LifeRecorder(self.path_to_temp_db, lazy=True)
+        self.assertEqual(
+            life_recorder.read_one("lr-2"), self.db["records"]["lr-2"]
+        )
+
+    def test_log_with_binary_snapshot(self):
+        storage = LogStorage(Path(self.path_to_temp_db), format="binary")
+        db = storage.load()
+        storage.save(db)
+        self.assertEqual(self.read_format(), "binary")
+
+        life_recorder = LifeRecorder(self.path_to_temp_db, storage="log")
+        life_recorder.create(self.new_note())
+        life_recorder.close()
+        life_recorder = LifeRecorder(self.path_to_temp_db, storage="log")
+        self.assertEqual(life_recorder.read_one("lr-4")["tag"], "format")
+        self.assertEqual(self.read_format(), "binary")
+
+    @patch.object(config, "BACKUPS", 1)
+    @patch.object(config, "DATABASE_FORMAT", "binary")
+    def test_damaged_binary_is_recovered_from_backup(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        life_recorder.create(self.new_note())
+        life_recorder.create(self.new_note())
+        with open(self.path_to_temp_db, "r+b") as f:
+            f.truncate(40)
+
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        self.assertEqual(life_recorder.db["last_id"], 4)
+        self.assertIn("lr-4", life_recorder.records)
+        self.assertEqual(self.read_format(), "binary")
+
+        os.remove(f"{self.path_to_temp_db}.bak.1")
+        with open(self.path_to_temp_db, "r+b") as f:
+            f.truncate(40)
+        with self.assertRaises(ValueError):
+            LifeRecorder(self.path_to_temp_db)
+
+
+@patch.object(config, "COMPRESS_THRESHOLD", 1000)
+class TestCompression(unittest.TestCase):
+    def setUp(self) -> None:
+        self.path_to_temp_db = shutil.copy(
+            "./tests/fixtures/db.json", "test_compression_db.json"
+        )
+        self.note = {
+            "tag": "logs",
+            "title": "Pasted log",
+            "content": "GET /index.html 200\n" * 500,
+        }
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
+        return super().tearDown()
+
+    def test_content_is_decompressed_when_read(self):
+        for storage, database_format in (
+            ("json", "json"), ("json", "binary"), ("log", "json")
+        ):  # fmt: skip
+            with self.subTest(storage=storage, format=database_format):
+                with patch.object(config, "DATABASE_FORMAT", database_format):
+                    created = LifeRecorder(
+                        self.path_to_temp_db, storage=storage
+                    ).create(self.note)
+                    life_recorder = LifeRecorder(
+                        self.path_to_temp_db, storage=storage
+                    )
+                identifier = created["id"]
+                record = life_recorder.records[identifier]
+                self.assertIsInstance(record.content, Compressed)
+                self.assertEqual(
+                    life_recorder.read_one(identifier),
+                    {**self.note, "id": identifier, "timestamp": ANY},
+                )
+                self.assertIn(
+                    identifier,
+                    [found["id"] for found in life_recorder.search("index")],
+                )
+                self.assertLess(os.path.getsize(self.path_to_temp_db), 3000)
+
+    def test_lazy_read_one(self):
+        created = LifeRecorder(self.path_to_temp_db).create(self.note)
+        life_recorder = LifeRecorder(self.path_to_temp_db, lazy=True)
+        life_recorder.read_one("lr-1")
+        life_recorder.create({"tag": "", "title": "Index", "content": ""})
+        life_recorder = LifeRecorder(self.path_to_temp_db, lazy=True)
+        self.assertEqual(
+            life_recorder.read_one(created["id"])["content"],
+            self.note["content"],
+        )
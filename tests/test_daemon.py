@@ -0,0 +1,113 @@
+import glob
+import json
+import os
+import shutil
+import socket
+import threading
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from src.life_recorder.base import LifeRecorder
+from src.life_recorder.daemon import Daemon, connect, socket_path
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix sockets")
+class TestDaemon(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.path_to_db = "./tests/fixtures/db.json"
+        with open(cls.path_to_db, "r") as f:
+            cls.db = json.load(f)
+
+    def setUp(self) -> None:
+        self.path_to_temp_db = shutil.copy(
+            self.path_to_db, "test_daemon_db.json"
+        )
+        self.daemon = Daemon(LifeRecorder(self.path_to_temp_db))
+        self.daemon.start()
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+        self.client = connect(Path(self.path_to_temp_db))
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.daemon.shutdown()
+        self.thread.join()
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
+        return super().tearDown()
+
+    def new_note(self, title: str = "Served") -> dict[str, str]:
+        return {"tag": "daemon", "title": title, "content": "From daemon."}
+
+    def test_reads_are_served_from_memory(self):
+        self.assertTrue(self.client.ping())
+        self.assertEqual(self.client.read(), self.db["records"])
+        self.assertEqual(
+            self.client.read_one("lr-2"), self.db["records"]["lr-2"]
+        )
+        self.assertIsNone(self.client.read_one("lr-9"))
+        self.assertEqual(
+            list(self.client.read(since=datetime(2025, 8, 1), limit=1)),
+            list(LifeRecorder(self.path_to_temp_db).read(
+                since=datetime(2025, 8, 1), limit=1
+            )),
+        )  # fmt: skip
+
+    def test_changes_are_saved(self):
+        created = self.client.create(self.new_note())
+        self.client.update("lr-1", self.new_note("Updated"))
+        self.client.delete("lr-2")
+
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        self.assertEqual(life_recorder.read_one(created["id"]), created)
+        self.assertEqual(life_recorder.read_one("lr-1")["title"], "Updated")
+        self.assertNotIn("lr-2", life_recorder.records)
+        self.assertEqual(
+            self.client.search("updated")[0]["id"], "lr-1"
+        )  # fmt: skip
+
+    def test_records_are_created_at_once(self):
+        imported = {
+            **self.new_note("Imported"),
+            "timestamp": "01-Jan-2025 10:00",
+        }
+        created = self.client.create_many(
+            [self.new_note(), imported], keep_timestamps=True
+        )
+        self.assertEqual(
+            [record["id"] for record in created], ["lr-4", "lr-5"]
+        )
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        self.assertEqual(
+            life_recorder.read_one("lr-5")["timestamp"], "01-Jan-2025 10:00"
+        )
+
+    def test_changes_of_other_processes_are_seen(self):
+        LifeRecorder(self.path_to_temp_db).create(self.new_note("Direct"))
+        self.assertEqual(self.client.read_one("lr-4")["title"], "Direct")
+
+    def test_errors_are_raised_by_client(self):
+        with self.assertRaises(ValueError):
+            self.client.delete("lr-9")
+        with self.assertRaises(TypeError):
+            self.client.create(["not", "a", "record"])
+        with self.assertRaises(ValueError):
+            self.client._call("unknown")
+        self.assertTrue(self.client.ping())
+
+    def test_single_daemon_per_database(self):
+        with self.assertRaises(RuntimeError):
+            Daemon(LifeRecorder(self.path_to_temp_db)).start()
+
+
+class TestConnect(unittest.TestCase):
+    def test_no_daemon(self):
+        path = Path("test_connect_db.json")
+        self.assertIsNone(connect(path))
+        # A socket left behind by a killed daemon is ignored.
+        socket_path(path).touch()
+        self.addCleanup(socket_path(path).unlink)
+        self.assertIsNone(connect(path))
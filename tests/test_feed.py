@@ -0,0 +1,130 @@
+import glob
+import os
+import shutil
+import unittest
+
+from src.life_recorder.base import LifeRecorder
+from src.life_recorder.feed import (
+    CREATED,
+    DELETED,
+    UPDATED,
+    Change,
+    ChangeFeed,
+    diff,
+)
+from src.life_recorder.record import compact
+
+
+class TestChangeFeed(unittest.TestCase):
+    def test_publish(self):
+        feed = ChangeFeed()
+        received = []
+        unsubscribe = feed.subscribe(received.append)
+        self.assertTrue(feed.active)
+
+        published = feed.publish([(CREATED, "lr-1"), (UPDATED, "lr-2")])
+        self.assertEqual(
+            published, [Change(CREATED, "lr-1", 1), Change(UPDATED, "lr-2", 2)]
+        )
+        self.assertEqual(received, published)
+        self.assertEqual(feed.version_of("lr-2"), 2)
+
+        feed.publish([(UPDATED, "lr-1"), (DELETED, "lr-2")])
+        self.assertEqual(feed.version_of("lr-1"), 3)
+        self.assertEqual(feed.version_of("lr-2"), 0)
+
+        unsubscribe()
+        unsubscribe()
+        feed.publish([(CREATED, "lr-3")])
+        self.assertEqual(len(received), 4)
+        self.assertFalse(feed.active)
+
+    def test_diff(self):
+        def record(identifier: str, title: str):
+            return compact(
+                {
+                    "id": identifier,
+                    "timestamp": "01 Aug 2025, 10:00",
+                    "tag": "",
+                    "title": title,
+                    "content": "",
+                }
+            )
+
+        old = {"lr-1": record("lr-1", "A"), "lr-2": record("lr-2", "B")}
+        new = {
+            "lr-1": record("lr-1", "A"),
+            "lr-2": record("lr-2", "Changed"),
+            "lr-3": record("lr-3", "C"),
+        }
+        self.assertEqual(
+            sorted(diff(old, new)), [(CREATED, "lr-3"), (UPDATED, "lr-2")]
+        )
+        self.assertEqual(
+            list(diff(new, old)), [(UPDATED, "lr-2"), (DELETED, "lr-3")]
+        )
+
+
+class TestLifeRecorderFeed(unittest.TestCase):
+    def setUp(self) -> None:
+        self.path_to_temp_db = shutil.copy(
+            "./tests/fixtures/db.json", "test_feed_db.json"
+        )
+        self.life_recorder = LifeRecorder(self.path_to_temp_db)
+        self.changes = []
+        self.life_recorder.subscribe(self.changes.append)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
+        return super().tearDown()
+
+    def new_note(self, title: str = "Title") -> dict[str, str]:
+        return {"tag": "feed", "title": title, "content": "Content."}
+
+    def test_own_changes(self):
+        self.life_recorder.create(self.new_note())
+        self.life_recorder.update("lr-1", self.new_note())
+        self.life_recorder.delete("lr-2")
+        self.assertEqual(
+            self.changes,
+            [
+                Change(CREATED, "lr-4", 1),
+                Change(UPDATED, "lr-1", 2),
+                Change(DELETED, "lr-2", 3),
+            ],
+        )
+        self.assertEqual(self.life_recorder.feed.version_of("lr-1"), 2)
+
+    def test_batch(self):
+        with self.life_recorder.batch():
+            created = self.life_recorder.create(self.new_note())
+            self.life_recorder.update(created["id"], self.new_note("New"))
+            self.life_recorder.delete(created["id"])
+            self.life_recorder.delete("lr-3")
+            self.assertEqual(self.changes, [])
+        self.assertEqual(self.changes, [Change(DELETED, "lr-3", 1)])
+
+        with self.assertRaises(ValueError):
+            with self.life_recorder.batch():
+                self.life_recorder.delete("lr-1")
+                self.life_recorder.delete("lr-9")
+        self.assertEqual(len(self.changes), 1)
+
+    def test_changes_of_other_processes(self):
+        other = LifeRecorder(self.path_to_temp_db)
+        other.create(self.new_note())
+        other.update("lr-2", self.new_note())
+        other.delete("lr-3")
+
+        self.assertTrue(self.life_recorder.refresh())
+        self.assertEqual(
+            sorted(change[:2] for change in self.changes),
+            [(CREATED, "lr-4"), (DELETED, "lr-3"), (UPDATED, "lr-2")],
+        )
+        self.assertEqual(
+            sorted(change.version for change in self.changes), [1, 2, 3]
+        )
+        self.assertFalse(self.life_recorder.refresh())
+        self.assertEqual(len(self.changes), 3)
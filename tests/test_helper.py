@@ -2,7 +2,7 @@ import unittest
 from unittest.mock import patch
 
 from src.life_recorder import config
-from src.life_recorder.helper import get_user
+from src.life_recorder.helper import catch, get_user
 
 
 class TestHelper(unittest.TestCase):
@@ -16,6 +16,18 @@ class TestHelper(unittest.TestCase):
         mock_expanduser.return_value = "/home/life_user"
         self.assertEqual(get_user(), "life_user")
 
+    @patch("src.life_recorder.helper.logger")
+    def test_catch_logs_and_swallows_exceptions(self, mock_logger):
+        @catch
+        def fail(value):
+            raise ValueError(value)
+
+        self.assertIsNone(fail("failed"))
+        error = mock_logger.opt.call_args.kwargs["exception"]
+        self.assertIsInstance(error, ValueError)
+        mock_logger.opt.return_value.error.assert_called_once()
+        self.assertEqual(catch(lambda: 1)(), 1)
+
 
 if __name__ == "__main__":
     unittest.main()
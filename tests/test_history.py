@@ -0,0 +1,154 @@
+import glob
+import os
+import shutil
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from src.life_recorder import config, history
+from src.life_recorder.base import LifeRecorder
+from src.life_recorder.history import (
+    History,
+    apply_delta,
+    make_delta,
+    make_revision,
+)
+
+
+def make_record(title: str, content: str, tag: str = "tag") -> dict:
+    return {
+        "id": "lr-1",
+        "timestamp": "10-Aug-2025 16:06",
+        "tag": tag,
+        "title": title,
+        "content": content,
+    }
+
+
+class TestDelta(unittest.TestCase):
+    def test_delta_restores_old_version(self):
+        old = make_record("Dream", "I was chased by a duck.\nIt was big.")
+        new = make_record("Dream", "I was chased by a goose.\nIt was big!", "")
+        delta = make_delta(new, old)
+        self.assertNotIn("title", delta)
+        self.assertEqual(
+            delta["content"], [[18, 25, "duck.\n"], [32, 36, "big."]]
+        )
+        self.assertEqual(apply_delta(new, delta), old)
+        self.assertEqual(apply_delta(old, make_delta(old, new)), new)
+
+        self.assertIsNone(make_revision(old, dict(old), "saved"))
+
+    def test_history_of_versions(self):
+        path = Path("test_history.history")
+        self.addCleanup(path.unlink, missing_ok=True)
+        log = History(path)
+        first = make_record("First", "Content")
+        second = make_record("Second", "Content")
+        third = make_record("Third", "More content")
+        log.append([make_revision(first, second, "11-Aug-2025 10:00")])
+        # A change that failed to be saved and a line cut off after it.
+        log.append([make_revision(second, first, "12-Aug-2025 10:00")])
+        with open(path, "ab") as f:
+            f.write(b'{"id": "lr-1", "sav')
+        log.append([make_revision(second, third, "13-Aug-2025 10:00")])
+
+        versions = log.versions(third)
+        self.assertEqual(
+            [(version["title"], version["saved"]) for version in versions],
+            [
+                ("Third", "13-Aug-2025 10:00"),
+                ("Second", "11-Aug-2025 10:00"),
+                ("First", "10-Aug-2025 16:06"),
+            ],
+        )
+        self.assertEqual(len(log.versions(third, limit=1)), 2)
+
+        self.assertEqual(log.prune(1, {"lr-1"}), 2)
+        self.assertEqual(len(log.versions(third)), 2)
+        self.assertEqual(log.prune(1, set()), 1)
+        self.assertEqual(len(log.versions(third)), 1)
+
+    def test_pruned_once_grown(self):
+        path = Path("test_history.history")
+        self.addCleanup(path.unlink, missing_ok=True)
+        log = History(path)
+        self.assertFalse(log.oversized())
+        revision = make_revision(
+            make_record("Old", "Content"), make_record("New", "Content"), ""
+        )
+        with mock.patch.object(history, "PRUNE_SIZE", 1000):
+            log.append([revision] * 10)
+            self.assertFalse(log.oversized())
+            log.append([revision] * 10)
+            self.assertTrue(log.oversized())
+            log.prune(15, {"lr-1"})
+            # Kept revisions don't make it oversized on their own.
+            self.assertFalse(log.oversized())
+            log.append([revision] * 10)
+            self.assertFalse(log.oversized())
+
+
+class TestLifeRecorderHistory(unittest.TestCase):
+    def setUp(self) -> None:
+        self.path_to_temp_db = shutil.copy(
+            "./tests/fixtures/db.json", "test_history_db.json"
+        )
+        self.life_recorder = LifeRecorder(self.path_to_temp_db)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
+        return super().tearDown()
+
+    def update(self, life_recorder: LifeRecorder, title: str) -> None:
+        record = life_recorder.read_one("lr-1")
+        life_recorder.update("lr-1", {**record, "title": title})
+
+    def titles(self, life_recorder: LifeRecorder) -> list[tuple[int, str]]:
+        return [
+            (version["revision"], version["title"])
+            for version in life_recorder.history("lr-1")
+        ]
+
+    def test_history_and_revert(self):
+        original = self.life_recorder.read_one("lr-1")["title"]
+        self.update(self.life_recorder, "Second")
+        self.update(self.life_recorder, "Third")
+        self.assertEqual(
+            self.titles(self.life_recorder),
+            [(0, "Third"), (1, "Second"), (2, original)],
+        )
+
+        reverted = self.life_recorder.revert("lr-1", 2)
+        self.assertEqual(reverted["title"], original)
+        self.assertEqual(
+            self.titles(LifeRecorder(self.path_to_temp_db)),
+            [(0, original), (1, "Third"), (2, "Second"), (3, original)],
+        )
+        with self.assertRaises(ValueError):
+            self.life_recorder.revert("lr-1", 4)
+        with self.assertRaises(ValueError):
+            self.life_recorder.history("lr-9")
+
+        with mock.patch.object(config, "HISTORY_LIMIT", 1):
+            self.assertEqual(len(self.life_recorder.history("lr-1")), 2)
+        self.life_recorder.delete("lr-2")
+        self.assertEqual(self.life_recorder.prune_history(keep=2), 1)
+        self.assertEqual(len(self.life_recorder.history("lr-1")), 3)
+
+    def test_write_behind(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db, write_behind=True)
+        self.update(life_recorder, "Second")
+        self.update(life_recorder, "Third")
+        self.assertFalse(os.path.exists(f"{self.path_to_temp_db}.history"))
+        self.assertEqual(len(life_recorder.history("lr-1")), 3)
+        life_recorder.flush()
+        self.assertEqual(len(self.life_recorder.history("lr-1")), 3)
+
+    def test_disabled(self):
+        with mock.patch.object(config, "HISTORY_LIMIT", 0):
+            self.update(self.life_recorder, "Second")
+        self.assertFalse(os.path.exists(f"{self.path_to_temp_db}.history"))
+        self.assertEqual(len(self.life_recorder.history("lr-1")), 1)
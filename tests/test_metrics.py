@@ -0,0 +1,136 @@
+import glob
+import json
+import os
+import shutil
+import unittest
+from pathlib import Path
+
+from src.life_recorder.base import LifeRecorder
+from src.life_recorder.metrics import (
+    BUCKETS,
+    Metrics,
+    guess_format,
+    load,
+    merge,
+    metrics,
+    metrics_path,
+    to_prometheus,
+    to_text,
+)
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.path = Path("test_metrics.json.metrics")
+        self.addCleanup(self.path.unlink, missing_ok=True)
+        return super().setUp()
+
+    def test_snapshot(self):
+        collected = Metrics()
+        collected.inc("bytes_written_total", 10)
+        collected.inc("bytes_written_total", 5)
+        collected.observe("save_seconds", 0.002)
+        collected.observe("save_seconds", 10)
+
+        snapshot = collected.snapshot()
+        self.assertEqual(snapshot["counters"], {"bytes_written_total": 15})
+        histogram = snapshot["histograms"]["save_seconds"]
+        self.assertEqual(histogram["count"], 2)
+        self.assertEqual(histogram["counts"][BUCKETS.index(0.005)], 1)
+        self.assertEqual(histogram["counts"][-1], 1)
+
+        text = to_prometheus(snapshot)
+        self.assertIn("life_recorder_bytes_written_total 15\n", text)
+        self.assertIn('life_recorder_save_seconds_bucket{le="0.01"} 1\n', text)
+        self.assertIn('life_recorder_save_seconds_bucket{le="+Inf"} 2\n', text)
+        self.assertIn("life_recorder_save_seconds_count 2\n", text)
+        self.assertIn("save", to_text(snapshot))
+
+    def test_guess_format(self):
+        self.assertEqual(guess_format("metrics.prom"), "prometheus")
+        self.assertEqual(guess_format("metrics.txt"), "text")
+        self.assertEqual(guess_format("metrics.JSON"), "json")
+        with self.assertRaises(ValueError):
+            guess_format("metrics.csv")
+
+    def test_collectors(self):
+        collected = Metrics()
+        cache = {"hits": 3}
+        collected.register(lambda: {"cache_hits_total": cache["hits"]})
+        self.assertEqual(
+            collected.snapshot()["counters"], {"cache_hits_total": 3}
+        )
+        collected.reset()
+        self.assertEqual(collected.snapshot()["counters"], {})
+        cache["hits"] = 5
+        self.assertEqual(
+            collected.snapshot()["counters"], {"cache_hits_total": 2}
+        )
+
+    def test_metrics_of_processes_are_added_up(self):
+        self.assertEqual(load(self.path), {"counters": {}, "histograms": {}})
+        for _ in range(2):
+            collected = Metrics()
+            collected.inc("records_written_total", 2)
+            collected.observe("load_seconds", 0.1)
+            collected.save(self.path)
+            self.assertEqual(collected.counters, {})
+
+        saved = load(self.path)
+        self.assertEqual(saved["counters"], {"records_written_total": 4})
+        self.assertEqual(saved["histograms"]["load_seconds"]["count"], 2)
+        self.assertEqual(
+            merge(saved, saved)["histograms"]["load_seconds"]["sum"], 0.4
+        )
+
+        self.path.write_text("{broken")
+        self.assertEqual(load(self.path)["counters"], {})
+
+
+class TestLifeRecorderMetrics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.path_to_temp_db = shutil.copy(
+            "./tests/fixtures/db.json", "test_metrics_db.json"
+        )
+        metrics.reset()
+        metrics.enabled = True
+        self.life_recorder = LifeRecorder(self.path_to_temp_db)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        metrics.enabled = False
+        # Metrics aren't saved into the test database when tests exit.
+        metrics.path = None
+        metrics.reset()
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
+        return super().tearDown()
+
+    def test_operations_are_measured(self):
+        self.life_recorder.create({"tag": "", "title": "A", "content": "B"})
+        self.life_recorder.read_one("lr-1")
+        with self.assertRaises(ValueError):
+            self.life_recorder.delete("lr-9")
+
+        snapshot = metrics.snapshot()
+        histograms = snapshot["histograms"]
+        for name in ("load", "save", "create", "read_one", "delete"):
+            self.assertEqual(histograms[f"{name}_seconds"]["count"], 1)
+        self.assertEqual(snapshot["counters"]["delete_errors_total"], 1)
+        self.assertEqual(snapshot["counters"]["records_written_total"], 1)
+        self.assertEqual(
+            snapshot["counters"]["bytes_written_total"],
+            os.path.getsize(self.path_to_temp_db),
+        )
+
+        metrics.save(metrics_path(self.life_recorder.path_to_db))
+        with open(f"{self.path_to_temp_db}.metrics") as f:
+            self.assertIn("create_seconds", json.load(f)["histograms"])
+
+    def test_disabled(self):
+        metrics.enabled = False
+        metrics.reset()
+        self.life_recorder.create({"tag": "", "title": "A", "content": "B"})
+        self.assertEqual(
+            metrics.snapshot(), {"counters": {}, "histograms": {}}
+        )
@@ -0,0 +1,124 @@
+import glob
+import json
+import os
+import shutil
+import unittest
+from pathlib import Path
+
+from src.life_recorder.base import LifeRecorder
+from src.life_recorder.offsets import (
+    SLOT,
+    OffsetIndex,
+    dump_database,
+    is_slotted,
+    scan_database,
+)
+from src.life_recorder.storage import LazyJsonRecords
+
+
+class TestOffsetIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.path_to_db = "./tests/fixtures/db.json"
+        with open(cls.path_to_db, "r") as f:
+            cls.db = json.load(f)
+
+    def setUp(self) -> None:
+        self.path_to_temp_db = shutil.copy(
+            self.path_to_db, "test_lazy_db.json"
+        )
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
+        return super().tearDown()
+
+    def test_scan_finds_record_bytes(self):
+        last_id, entries = scan_database(Path(self.path_to_temp_db))
+        self.assertEqual(last_id, 3)
+        self.assertEqual([entry[0] for entry in entries], [1, 2, 3])
+
+        with open(self.path_to_temp_db, "rb") as f:
+            data = f.read()
+        for number, offset, length in entries:
+            self.assertEqual(
+                json.loads(data[offset : offset + length]),
+                self.db["records"][f"lr-{number}"],
+            )
+
+    def test_scan_handles_non_ascii_content(self):
+        db = {"last_id": 2, "records": {}}
+        for number, content in ((1, "çay və şəkər"), (2, "plain")):
+            db["records"][f"lr-{number}"] = {
+                "id": f"lr-{number}",
+                "content": content,
+            }
+        with open(self.path_to_temp_db, "w", encoding="utf-8") as f:
+            json.dump(db, f, ensure_ascii=False, indent=4)
+
+        index = OffsetIndex.for_database(Path(self.path_to_temp_db))
+        self.assertTrue(index.build())
+        self.assertEqual(index.read("lr-1"), db["records"]["lr-1"])
+        self.assertEqual(index.read("lr-2"), db["records"]["lr-2"])
+
+    def test_dump_keeps_records_in_slots(self):
+        with open(self.path_to_temp_db, "wb") as f:
+            _, entries = dump_database(self.db, f)
+        with open(self.path_to_temp_db, "rb") as f:
+            data = f.read()
+        self.assertEqual(json.loads(data), self.db)
+        self.assertTrue(is_slotted(Path(self.path_to_temp_db)))
+        self.assertEqual(entries, scan_database(Path(self.path_to_temp_db))[1])
+        for _, offset, length in entries:
+            self.assertEqual(length % SLOT, 0)
+            self.assertTrue(data[offset : offset + length].endswith(b" "))
+
+    def test_scan_rejects_unknown_identifiers(self):
+        with open(self.path_to_temp_db, "w") as f:
+            json.dump({"last_id": 0, "records": {"custom": {}}}, f)
+        self.assertIsNone(scan_database(Path(self.path_to_temp_db)))
+
+    def test_lazy_read_one(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db, lazy=True)
+        self.assertIsInstance(life_recorder.records, LazyJsonRecords)
+        self.assertTrue(os.path.exists(f"{self.path_to_temp_db}.idx"))
+        self.assertEqual(life_recorder.db["last_id"], 3)
+        self.assertEqual(len(life_recorder.records), 3)
+        self.assertEqual(
+            life_recorder.read_one("lr-2"), self.db["records"]["lr-2"]
+        )
+        self.assertIsNone(life_recorder.read_one("lr-9"))
+        self.assertIsNone(life_recorder.read_one("non_existent"))
+        # Identifiers are listed without parsing the database.
+        self.assertEqual(life_recorder.identifiers(), ["lr-1", "lr-2", "lr-3"])
+        self.assertIsNone(life_recorder.records._records)
+
+    def test_lazy_mutations_keep_index_up_to_date(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db, lazy=True)
+        life_recorder.create({"tag": "idx", "title": "New", "content": "Ok"})
+        life_recorder.delete("lr-1")
+
+        life_recorder = LifeRecorder(self.path_to_temp_db, lazy=True)
+        self.assertEqual(life_recorder.db["last_id"], 4)
+        self.assertEqual(life_recorder.read_one("lr-4")["title"], "New")
+        self.assertIsNone(life_recorder.read_one("lr-1"))
+
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        self.assertEqual(list(life_recorder.records), ["lr-2", "lr-3", "lr-4"])
+
+    def test_stale_index_is_rebuilt(self):
+        LifeRecorder(self.path_to_temp_db, lazy=True)
+        db = json.loads(json.dumps(self.db))
+        db["records"]["lr-2"]["title"] = "Changed elsewhere"
+        with open(self.path_to_temp_db, "w") as f:
+            json.dump(db, f, indent=2)
+
+        life_recorder = LifeRecorder(self.path_to_temp_db, lazy=True)
+        self.assertEqual(
+            life_recorder.read_one("lr-2")["title"], "Changed elsewhere"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
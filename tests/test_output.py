@@ -0,0 +1,115 @@
+import io
+import json
+import unittest
+
+from src.life_recorder.output import chunks, format_records, select, write
+from src.life_recorder.record import Records, compact
+
+
+def make_record(number: int, timestamp: str, tag: str, title: str) -> dict:
+    return {
+        "id": f"lr-{number}",
+        "timestamp": timestamp,
+        "tag": tag,
+        "title": title,
+        "content": f"Content\tof {title}.\nSecond line.",
+    }
+
+
+class TestOutput(unittest.TestCase):
+    def setUp(self) -> None:
+        self.records = Records.of(
+            compact(record)
+            for record in (
+                make_record(2, "01-Aug-2025 10:00", "b", "Beta"),
+                make_record(10, "02-Aug-2025 09:00", "a", "alpha"),
+                make_record(3, "01-Jul-2025 12:00", "c", "Gamma"),
+            )
+        )
+        return super().setUp()
+
+    def identifiers(self, records) -> list[str]:
+        return [record["id"] for record in records]
+
+    def test_select(self):
+        self.assertEqual(
+            self.identifiers(select(self.records)), ["lr-2", "lr-10", "lr-3"]
+        )
+        self.assertEqual(
+            self.identifiers(select(self.records, reverse=True, offset=1)),
+            ["lr-10", "lr-2"],
+        )
+        self.assertEqual(
+            self.identifiers(select(self.records, sort="id")),
+            ["lr-2", "lr-3", "lr-10"],
+        )
+        self.assertEqual(
+            self.identifiers(select(self.records, sort="timestamp", limit=2)),
+            ["lr-3", "lr-2"],
+        )
+        self.assertEqual(
+            self.identifiers(
+                select(self.records, "title", True, offset=1, limit=1)
+            ),
+            ["lr-2"],
+        )
+        # Records of the daemon are plain dicts.
+        plain = {key: dict(value) for key, value in self.records.items()}
+        self.assertEqual(
+            self.identifiers(select(plain, sort="timestamp")),
+            self.identifiers(select(self.records, sort="timestamp")),
+        )
+
+    def test_formats(self):
+        records = list(self.records.values())[:2]
+        pretty = "".join(format_records(records, "pretty"))
+        self.assertTrue(pretty.startswith("Id: #lr-2 \nTimestamp:"))
+        self.assertNotIn("\x1b[", pretty)
+        self.assertIn(
+            "\x1b[", "".join(format_records(records, "pretty", True))
+        )
+
+        self.assertEqual(
+            json.loads("".join(format_records(records, "json"))),
+            [dict(record) for record in records],
+        )
+        self.assertEqual("".join(format_records([], "json")), "[]\n")
+        self.assertEqual(
+            [
+                json.loads(line)["id"]
+                for line in format_records(records, "ndjson")
+            ],
+            ["lr-2", "lr-10"],
+        )
+
+        lines = "".join(format_records(records, "plain")).splitlines()
+        self.assertEqual(
+            lines[0].split("\t"),
+            [
+                "lr-2",
+                "01-Aug-2025 10:00",
+                "b",
+                "Beta",
+                "Content\\tof Beta.\\nSecond line.",
+            ],
+        )
+
+        table = "".join(format_records(records, "table", width=90))
+        header, first, second = table.splitlines()
+        self.assertTrue(header.startswith("Id "))
+        self.assertTrue(first.startswith("lr-2 "))
+        self.assertLessEqual(max(map(len, (header, first, second))), 90)
+        self.assertTrue(first.endswith("…"))
+
+        with self.assertRaises(ValueError):
+            list(format_records(records, "xml"))
+
+    def test_written_in_chunks(self):
+        self.assertEqual(
+            list(chunks(["ab", "c", "de", "f"], size=3)), ["abc", "def"]
+        )
+        self.assertEqual(list(chunks(["ab"], size=3)), ["ab"])
+
+        f = io.StringIO()
+        write(self.records.values(), f, "ndjson")
+        self.assertEqual(len(f.getvalue().splitlines()), 3)
@@ -0,0 +1,98 @@
+import shutil
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from src.life_recorder import config, parallel
+from src.life_recorder.base import LifeRecorder
+from src.life_recorder.query import QueryIndex
+from src.life_recorder.search import SearchIndex
+from src.life_recorder.storage import JsonStorage, ShardedStorage
+
+
+def make_db(count: int) -> dict:
+    records = {}
+    for number in range(1, count + 1):
+        month = ("Jan", "Feb", "Mar")[number % 3]
+        records[f"lr-{number}"] = {
+            "id": f"lr-{number}",
+            "timestamp": f"{number % 28 + 1:02}-{month}-2025 10:{number:02}",
+            "tag": ("dream", "work", "")[number % 3],
+            "title": f"Title {number}",
+            "content": f"Content of record {number} with ünïcode",
+        }
+    return {"last_id": count, "records": records}
+
+
+class TestParallelLoad(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = Path("test_parallel_db")
+        self.directory.mkdir()
+        self.addCleanup(shutil.rmtree, self.directory)
+        for patch in (
+            mock.patch.object(config, "DEBUG", False),
+            mock.patch.object(config, "LOAD_WORKERS", 2),
+            mock.patch.object(parallel, "MIN_RECORDS", 0),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        return super().setUp()
+
+    def assertLoadedSame(self, path: Path, storage: str) -> None:
+        loaded = LifeRecorder(path, storage=storage, indexed=True)
+        self.assertIsNotNone(loaded._search_index)
+        with mock.patch.object(config, "LOAD_WORKERS", 0):
+            expected = LifeRecorder(path, storage=storage, indexed=True)
+        self.assertIsNone(expected._search_index)
+
+        self.assertEqual(loaded.db["last_id"], expected.db["last_id"])
+        self.assertEqual(
+            list(loaded.records.items()), list(expected.records.items())
+        )
+        search = SearchIndex.build(expected.records.values())
+        self.assertEqual(loaded.search_index.postings, search.postings)
+        self.assertEqual(loaded.search_index.count, search.count)
+        self.assertEqual(loaded.search_index.total_length, search.total_length)
+        query = QueryIndex.build(expected.records.values())
+        self.assertEqual(loaded.query_index.tags, query.tags)
+        self.assertEqual(loaded.query_index.times, query.times)
+        self.assertEqual(loaded.query_index.timeline, query.timeline)
+
+        self.assertEqual(
+            loaded.search("ünïcode 7", limit=3),
+            expected.search("ünïcode 7", limit=3),
+        )
+        loaded.create({"tag": "new", "title": "New", "content": "Content"})
+        self.assertEqual(list(loaded.read("new")), ["lr-51"])
+
+    def test_json(self):
+        path = self.directory / "db.json"
+        storage = JsonStorage(path)
+        storage.init()
+        storage.save(make_db(50))
+        self.assertLoadedSame(path, "json")
+
+    def test_shards(self):
+        path = self.directory / "manifest.json"
+        storage = ShardedStorage(path)
+        storage.init()
+        storage.save(make_db(50))
+        self.assertLoadedSame(path, "sharded")
+        # Every shard is read, the new record made one for this month.
+        records = LifeRecorder(path, storage="sharded", indexed=True).records
+        self.assertEqual(len(records.shards), 4)
+        self.assertEqual(len(records.indexes), 4)
+
+    def test_loaded_as_usual(self):
+        path = self.directory / "db.json"
+        shutil.copy("./tests/fixtures/db.json", path)
+        # The file has no offset index until it's saved.
+        self.assertIsNone(parallel.load(JsonStorage(path), 2))
+        self.assertEqual(len(LifeRecorder(path, indexed=True).records), 3)
+        # Only databases whose indexes are wanted are loaded by workers.
+        LifeRecorder(path).create({"tag": "", "title": "A", "content": ""})
+        self.assertIsNotNone(parallel.load(JsonStorage(path), 2))
+        self.assertIsNone(LifeRecorder(path)._search_index)
+
+        with mock.patch.object(parallel, "MIN_RECORDS", 100):
+            self.assertIsNone(parallel.load(JsonStorage(path), 2))
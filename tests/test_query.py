@@ -0,0 +1,182 @@
+import glob
+import json
+import os
+import shutil
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+from src.life_recorder.base import LifeRecorder
+from src.life_recorder.helper import parse_timestamp
+from src.life_recorder.query import QueryIndex
+from src.life_recorder.storage import JsonStorage, SqliteStorage
+
+
+class TestQueryIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.records = [
+            {"id": "lr-1", "tag": "a", "timestamp": "10-Aug-2025 16:06"},
+            {"id": "lr-2", "tag": "b", "timestamp": "11-Aug-2025 07:32"},
+            {"id": "lr-3", "tag": "a", "timestamp": "10-Aug-2025 16:06"},
+            {"id": "lr-4", "tag": "a", "timestamp": "09-Aug-2025 12:00"},
+            {"id": "lr-5", "tag": "b", "timestamp": "not a timestamp"},
+        ]
+        self.index = QueryIndex.build(self.records)
+        return super().setUp()
+
+    def test_query_by_tag(self):
+        self.assertEqual(self.index.query(tag="a"), ["lr-4", "lr-1", "lr-3"])
+        self.assertEqual(self.index.query(tag="a", limit=2), ["lr-4", "lr-1"])
+        self.assertEqual(self.index.query(tag="b"), ["lr-5", "lr-2"])
+        self.assertEqual(self.index.query(tag="missing"), [])
+
+    def test_query_by_time_range(self):
+        since = parse_timestamp("10-Aug-2025 00:00")
+        until = parse_timestamp("11-Aug-2025 00:00")
+        self.assertEqual(
+            self.index.query(since=since), ["lr-1", "lr-3", "lr-2"]
+        )
+        self.assertEqual(
+            self.index.query(until=until), ["lr-4", "lr-1", "lr-3"]
+        )
+        self.assertEqual(
+            self.index.query(since=since, until=until, limit=1), ["lr-1"]
+        )
+        self.assertEqual(self.index.query(tag="b", since=since), ["lr-2"])
+        self.assertEqual(self.index.query(tag="a", until=since), ["lr-4"])
+
+    def test_mutations(self):
+        self.index.remove(self.records[0])
+        self.index.add(
+            {"id": "lr-6", "tag": "a", "timestamp": "01-Jan-2025 00:00"}
+        )
+        self.index.add(
+            {"id": "lr-7", "tag": "c", "timestamp": "01-Jan-2026 00:00"}
+        )
+        self.assertEqual(self.index.query(tag="a"), ["lr-6", "lr-4", "lr-3"])
+        self.assertEqual(
+            self.index.query(since=parse_timestamp("11-Aug-2025 00:00")),
+            ["lr-2", "lr-7"],
+        )
+
+        self.index.remove(self.records[1])
+        self.assertEqual(self.index.query(tag="b"), ["lr-5"])
+        self.index.remove(self.records[4])
+        self.assertNotIn("b", self.index.tags)
+
+    def assertSameQueries(self, loaded: QueryIndex) -> None:
+        since = parse_timestamp("10-Aug-2025 00:00")
+        until = parse_timestamp("11-Aug-2025 00:00")
+        for tag in (None, "a", "b", "c", "missing"):
+            for bounds in ((None, None), (since, None), (None, until)):
+                for limit in (None, 1):
+                    self.assertEqual(
+                        loaded.query(tag, *bounds, limit),
+                        self.index.query(tag, *bounds, limit),
+                    )
+
+    def test_save_and_load(self):
+        path = Path("test_query_index.query")
+        self.addCleanup(path.unlink, missing_ok=True)
+        self.index.save(path, [[1, 2, 3]])
+        self.assertIsNone(QueryIndex.load(path, [[1, 2, 4]]))
+
+        loaded = QueryIndex.load(path, [[1, 2, 3]])
+        self.assertTrue(loaded.lazy)
+        self.assertSameQueries(loaded)
+        loaded.preload()
+        self.assertFalse(loaded.lazy)
+        self.assertEqual(loaded.tags, self.index.tags)
+        self.assertEqual(loaded.times, self.index.times)
+        self.assertEqual(loaded.timeline, self.index.timeline)
+
+        changes = [
+            (self.records[0], None),
+            (self.records[1], {**self.records[1], "tag": "a"}),
+            (
+                None,
+                {"id": "lr-6", "tag": "c", "timestamp": "01-Jan-2025 00:00"},
+            ),
+        ]
+        self.assertFalse(QueryIndex.patch(path, [[0]], [[1]], changes))
+        self.assertTrue(QueryIndex.patch(path, [[1, 2, 3]], [[2]], changes))
+        for old_record, new_record in changes:
+            if old_record is not None:
+                self.index.remove(old_record)
+            if new_record is not None:
+                self.index.add(new_record)
+
+        loaded = QueryIndex.load(path, [[2]])
+        self.assertSameQueries(loaded)
+        self.assertEqual(loaded.query(tag="a"), ["lr-4", "lr-3", "lr-2"])
+        # Changing a loaded index reads it whole first.
+        loaded.remove(self.records[3])
+        self.assertFalse(loaded.lazy)
+        self.assertEqual(loaded.query(tag="a"), ["lr-3", "lr-2"])
+
+
+class TestLifeRecorderFilters(unittest.TestCase):
+    def setUp(self) -> None:
+        self.path_to_temp_db = shutil.copy(
+            "./tests/fixtures/db.json", "test_query_db.json"
+        )
+        with open(self.path_to_temp_db, "r") as f:
+            self.db = json.load(f)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for pattern in (self.path_to_temp_db, "test_query_db.db"):
+            for path in glob.glob(f"{pattern}*"):
+                os.remove(path)
+        return super().tearDown()
+
+    def assertFilters(self, life_recorder: LifeRecorder) -> None:
+        records = life_recorder.read(tag="hhh")
+        self.assertEqual(records, {"lr-2": self.db["records"]["lr-2"]})
+        records = life_recorder.read(since=datetime(2025, 8, 11))
+        self.assertEqual(list(records), ["lr-2"])
+        records = life_recorder.read(until=datetime(2025, 8, 11), limit=1)
+        self.assertEqual(list(records), ["lr-1"])
+        records = life_recorder.read(tag="tag", since=datetime(2025, 8, 11))
+        self.assertEqual(records, {})
+        self.assertEqual(list(life_recorder.read(limit=2)), ["lr-1", "lr-2"])
+
+    def test_read_with_filters(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        self.assertFilters(life_recorder)
+
+        life_recorder.create({"tag": "hhh", "title": "New", "content": "!"})
+        life_recorder.delete("lr-2")
+        self.assertEqual(list(life_recorder.read(tag="hhh")), ["lr-4"])
+
+    def test_saved_index_follows_writes(self):
+        LifeRecorder(self.path_to_temp_db).read(tag="hhh")
+        # Writes of other processes bring the saved index up to date.
+        LifeRecorder(self.path_to_temp_db).create(
+            {"tag": "hhh", "title": "New", "content": "!"}
+        )
+        LifeRecorder(self.path_to_temp_db).delete("lr-2")
+
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        with mock.patch.object(QueryIndex, "build") as build:
+            self.assertEqual(list(life_recorder.read(tag="hhh")), ["lr-4"])
+            self.assertEqual(
+                list(life_recorder.read(since=datetime(2025, 8, 11))),
+                ["lr-4"],
+            )
+        build.assert_not_called()
+
+    def test_read_with_filters_from_sqlite(self):
+        storage = SqliteStorage(Path("test_query_db.db"))
+        storage.init()
+        storage.save(JsonStorage(Path(self.path_to_temp_db)).load())
+        storage.close()
+
+        life_recorder = LifeRecorder("test_query_db.db", storage="sqlite")
+        self.assertFilters(life_recorder)
+        life_recorder.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+import json
+import unittest
+
+from src.life_recorder.helper import parse_timestamp
+from src.life_recorder.record import (
+    Compressed,
+    Record,
+    Records,
+    compact,
+    compress,
+    format_timestamp,
+    pack_identifier,
+    pack_timestamp,
+    to_json,
+    to_plain_json,
+)
+
+
+class TestRecord(unittest.TestCase):
+    def setUp(self) -> None:
+        self.fields = {
+            "id": "lr-7",
+            "timestamp": "10-Aug-2025 16:06",
+            "tag": "work",
+            "title": "Title",
+            "content": "Content",
+        }
+        self.record = compact(self.fields)
+        return super().setUp()
+
+    def test_record_reads_like_dict(self):
+        self.assertIsInstance(self.record, Record)
+        self.assertEqual(self.record, self.fields)
+        self.assertEqual(dict(self.record), self.fields)
+        self.assertEqual(self.record["timestamp"], "10-Aug-2025 16:06")
+        self.assertEqual(self.record.get("missing", "-"), "-")
+        self.assertIn("title", self.record)
+        with self.assertRaises(KeyError):
+            self.record["missing"]
+
+    def test_epoch_matches_parsed_timestamp(self):
+        self.assertEqual(
+            self.record.epoch, parse_timestamp(self.fields["timestamp"])
+        )
+
+    def test_compact_keeps_dicts_it_cannot_hold(self):
+        extra = {**self.fields, "extra": "field"}
+        self.assertIs(compact(extra), extra)
+        missing = {"id": "lr-1", "title": "Title"}
+        self.assertIs(compact(missing), missing)
+
+    def test_unpackable_values_are_kept_as_is(self):
+        for identifier in ["lr-01", "lr-", "note-1", "lr-١"]:
+            self.assertEqual(pack_identifier(identifier), identifier)
+        for timestamp in [
+            "not a timestamp",
+            "31-Feb-2025 10:00",
+            "10-Aug-2025 24:00",
+            "10-aug-2025 10:00",
+            "10-Aug-0999 10:00",
+        ]:
+            self.assertEqual(pack_timestamp(timestamp), timestamp)
+
+        record = compact(
+            {**self.fields, "id": "note-1", "timestamp": "yesterday"}
+        )
+        self.assertEqual(record["id"], "note-1")
+        self.assertEqual(record["timestamp"], "yesterday")
+        self.assertIsNone(record.epoch)
+
+    def test_timestamp_roundtrip(self):
+        for timestamp in [
+            "01-Jan-1970 00:00",
+            "29-Feb-2024 23:59",
+            "10-Aug-2025 16:06",
+            "31-Dec-9999 12:30",
+        ]:
+            self.assertEqual(
+                format_timestamp(pack_timestamp(timestamp)), timestamp
+            )
+
+
+class TestCompressed(unittest.TestCase):
+    def setUp(self) -> None:
+        self.fields = {
+            "id": "lr-7",
+            "timestamp": "10-Aug-2025 16:06",
+            "tag": "logs",
+            "title": "Pasted log",
+            "content": "GET /index.html 200 ✓\n" * 100,
+        }
+        return super().setUp()
+
+    def test_roundtrip(self):
+        for method in Compressed.METHODS:
+            with self.subTest(method=method):
+                compressed = Compressed.compress(
+                    self.fields["content"], method
+                )
+                self.assertLess(len(compressed.data), 200)
+                self.assertEqual(
+                    compressed.decompress(), self.fields["content"]
+                )
+                self.assertEqual(
+                    Compressed.from_json(compressed.to_json()), compressed
+                )
+        with self.assertRaises(ValueError):
+            Compressed.compress("text", "zip")
+        with self.assertRaises(ValueError):
+            Compressed.from_json({"data": ""})
+
+    def test_long_content_is_compressed(self):
+        record = compress(compact(self.fields), 1000)
+        self.assertIsInstance(record.content, Compressed)
+        self.assertEqual(record, self.fields)
+        self.assertEqual(dict(record), self.fields)
+        self.assertEqual(record, compact(self.fields))
+        self.assertEqual(compact(self.fields), record)
+        self.assertNotEqual(record, compact({**self.fields, "content": ""}))
+
+        stored = json.loads(json.dumps(record, default=to_json))
+        self.assertEqual(stored["content"]["compressed"], "zlib")
+        self.assertEqual(compact(stored), record)
+        self.assertEqual(
+            json.loads(json.dumps(record, default=to_plain_json)), self.fields
+        )
+
+    def test_short_content_is_kept(self):
+        for threshold in (0, 5000):
+            record = compress(compact(self.fields), threshold)
+            self.assertIs(type(record.content), str)
+        # Content that doesn't get smaller is kept as well.
+        record = compress(compact({**self.fields, "content": "abc"}), 1)
+        self.assertEqual(record.content, "abc")
+
+
+class TestRecords(unittest.TestCase):
+    def setUp(self) -> None:
+        self.plain = {
+            f"lr-{i}": {
+                "id": f"lr-{i}",
+                "timestamp": "10-Aug-2025 16:06",
+                "tag": "",
+                "title": f"Title {i}",
+                "content": "",
+            }
+            for i in range(1, 4)
+        }
+        self.plain["custom"] = {"id": "custom", "title": "Custom"}
+        self.records = Records(
+            {key: compact(record) for key, record in self.plain.items()}
+        )
+        return super().setUp()
+
+    def test_records_read_like_dict(self):
+        self.assertEqual(list(self.records), list(self.plain))
+        self.assertEqual(self.records, self.plain)
+        self.assertIn("lr-2", self.records)
+        self.assertIn("custom", self.records)
+        self.assertNotIn("lr-02", self.records)
+
+        del self.records["lr-2"]
+        self.records["lr-9"] = {"id": "lr-9"}
+        self.assertEqual(
+            list(self.records), ["lr-1", "lr-3", "custom", "lr-9"]
+        )
+
+    def test_copy_is_independent(self):
+        copy = self.records.copy()
+        del copy["lr-1"]
+        self.assertIn("lr-1", self.records)
+        self.assertNotIn("lr-1", copy)
+
+    def test_json_matches_dict_form(self):
+        db = {"last_id": 3, "records": self.records}
+        self.assertEqual(
+            json.dumps(db, default=to_json),
+            json.dumps({"last_id": 3, "records": self.plain}),
+        )
+        with self.assertRaises(TypeError):
+            json.dumps(object(), default=to_json)
@@ -0,0 +1,59 @@
+import unittest
+
+from src.life_recorder.feed import CREATED, DELETED, UPDATED, ChangeFeed
+from src.life_recorder.render import RenderCache
+
+
+class TestRenderCache(unittest.TestCase):
+    def test_least_recently_used_are_dropped(self):
+        cache = RenderCache(maxsize=2)
+        renders = []
+
+        def render(identifier: str, version: int = 0) -> str:
+            return cache.get(
+                "text",
+                identifier,
+                version,
+                lambda: renders.append(identifier) or identifier.upper(),
+            )
+
+        self.assertEqual(render("lr-1"), "LR-1")
+        render("lr-2")
+        self.assertEqual(render("lr-1"), "LR-1")
+        render("lr-3")
+        render("lr-1")
+        render("lr-2")
+        self.assertEqual(renders, ["lr-1", "lr-2", "lr-3", "lr-2"])
+        self.assertEqual(cache.size, 2)
+
+        # Another version is rendered anew.
+        render("lr-2", 1)
+        self.assertEqual(renders[-1], "lr-2")
+        self.assertEqual(
+            cache.stats(),
+            {
+                "size": 2,
+                "maxsize": 2,
+                "hits": 2,
+                "misses": 5,
+                "hit_rate": 2 / 7,
+            },
+        )
+
+    def test_changed_records_are_dropped(self):
+        cache = RenderCache()
+        feed = ChangeFeed()
+        feed.subscribe(cache.on_change)
+        for identifier in ("lr-1", "lr-2", "lr-3"):
+            cache.get("text", identifier, 0, lambda: identifier)
+
+        feed.publish([(CREATED, "lr-4"), (UPDATED, "lr-1"), (DELETED, "lr-2")])
+        self.assertEqual(cache.size, 1)
+        cache.clear()
+        self.assertEqual((cache.size, cache.hits, cache.misses), (0, 0, 0))
+        self.assertEqual(cache.hit_rate, 0.0)
+
+    def test_disabled_cache(self):
+        cache = RenderCache(maxsize=0)
+        self.assertEqual(cache.get("text", "lr-1", 0, lambda: "text"), "text")
+        self.assertEqual(cache.size, 0)
@@ -0,0 +1,222 @@
+import glob
+import os
+import shutil
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from src.life_recorder import search
+from src.life_recorder.base import LifeRecorder
+from src.life_recorder.search import SearchIndex, tokenize
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.records = {
+            "lr-1": {
+                "id": "lr-1",
+                "tag": "dream",
+                "title": "Note from a dream",
+                "content": "I was chased by a duck in a tuxedo.",
+            },
+            "lr-2": {
+                "id": "lr-2",
+                "tag": "life",
+                "title": "Dreaming of ducks",
+                "content": "A tuxedo duck chased nobody.",
+            },
+            "lr-3": {
+                "id": "lr-3",
+                "tag": "work",
+                "title": "Standup",
+                "content": "Talked about the duck.",
+            },
+        }
+        self.index = SearchIndex.build(self.records.values())
+        return super().setUp()
+
+    def test_tokenize(self):
+        self.assertEqual(
+            tokenize("Hello, World! 42"), ["hello", "world", "42"]
+        )
+
+    def test_terms_must_all_match(self):
+        self.assertCountEqual(
+            self.index.search("duck tuxedo"), ["lr-1", "lr-2"]
+        )
+        self.assertEqual(self.index.search("duck standup"), ["lr-3"])
+        self.assertEqual(self.index.search("nothing"), [])
+        self.assertEqual(self.index.search(""), [])
+
+    def test_results_are_ranked(self):
+        # Match in the title and tag weighs more than in the content.
+        self.assertEqual(self.index.search("dream"), ["lr-1"])
+        self.assertEqual(self.index.search("standup duck", limit=1), ["lr-3"])
+
+    def test_prefix_query(self):
+        self.assertEqual(self.index.search("dream*"), ["lr-1", "lr-2"])
+        self.assertEqual(self.index.search("stand*"), ["lr-3"])
+
+    def test_phrase_query(self):
+        self.assertEqual(self.index.search('"chased by a duck"'), ["lr-1"])
+        self.assertEqual(self.index.search('"duck chased"'), ["lr-2"])
+        # Phrases don't match across fields, e.g. the title and the tag.
+        self.assertEqual(self.index.search('"dream dream"'), [])
+        self.assertEqual(self.index.search('"a duck"'), ["lr-1"])
+
+    def test_incremental_changes(self):
+        old_record = self.records["lr-3"]
+        new_record = {**old_record, "title": "Retro", "content": "Nothing."}
+        self.records["lr-3"] = new_record
+        self.index.replace(old_record, new_record)
+        self.assertEqual(self.index.search("standup"), [])
+        self.assertEqual(self.index.search("retro"), ["lr-3"])
+
+        self.index.remove(self.records.pop("lr-1"))
+        self.assertEqual(self.index.search("tuxedo"), ["lr-2"])
+        self.assertNotIn("from", self.index.postings)
+
+    def test_save_and_load(self):
+        path = Path("test_search.index")
+        self.addCleanup(path.unlink, missing_ok=True)
+        self.index.save(path, [1, 2])
+        self.assertIsNone(SearchIndex.load(path, [1, 3]))
+
+        index = SearchIndex.load(path, [1, 2])
+        self.addCleanup(index.close)
+        self.assertEqual(index.search("duck"), self.index.search("duck"))
+        self.assertEqual(
+            index.search('tux* "a duck"'), self.index.search('tux* "a duck"')
+        )
+        # Only terms of the queries are read.
+        self.assertEqual(index.postings["duck"], self.index.postings["duck"])
+        self.assertNotIn("standup", index.postings)
+        index.preload()
+        self.assertEqual(index.postings, self.index.postings)
+
+    def test_patch_saved_index(self):
+        path = Path("test_search.index")
+        self.addCleanup(path.unlink, missing_ok=True)
+        self.index.save(path, [1])
+        old_record = self.records["lr-3"]
+        new_record = {**old_record, "title": "Retro", "content": "Nothing."}
+        created = {"id": "lr-4", "tag": "", "title": "Duck", "content": ""}
+        changes = [
+            (old_record, new_record),
+            (self.records["lr-1"], None),
+            (None, created),
+        ]
+        self.assertFalse(SearchIndex.patch(path, [2], [3], changes))
+        with mock.patch.object(search, "COMPACT_CHANGES", 10):
+            self.assertTrue(SearchIndex.patch(path, [1], [2], changes[:1]))
+            self.assertTrue(SearchIndex.patch(path, [2], [3], changes[1:]))
+
+        self.index.replace(old_record, new_record)
+        self.index.remove(self.records["lr-1"])
+        self.index.add(created)
+        index = SearchIndex.load(path, [3])
+        self.addCleanup(index.close)
+        for query in ("duck", "standup", "retro", "tux*", '"tuxedo duck"'):
+            self.assertEqual(index.search(query), self.index.search(query))
+        self.assertEqual(
+            (index.count, index.total_length),
+            (self.index.count, self.index.total_length),
+        )
+
+
+class TestLifeRecorderSearch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.path_to_temp_db = shutil.copy(
+            "./tests/fixtures/db.json", "test_search_db.json"
+        )
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
+        return super().tearDown()
+
+    def test_search(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        records = life_recorder.search("note")
+        self.assertEqual(len(records), 3)
+        self.assertEqual(
+            [record["id"] for record in life_recorder.search("lovely")],
+            ["lr-3"],
+        )
+        self.assertTrue(os.path.exists(f"{self.path_to_temp_db}.search"))
+
+        with self.assertRaises(TypeError):
+            life_recorder.search(None)  # type: ignore
+
+    def test_index_follows_mutations(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        life_recorder.search("note")
+        life_recorder.create(
+            {"tag": "sea", "title": "Whale song", "content": "Deep blue."}
+        )
+        life_recorder.update(
+            "lr-1", {"tag": "tag", "title": "Remembered", "content": "Ok."}
+        )
+        life_recorder.delete("lr-2")
+        self.assertEqual(
+            [record["id"] for record in life_recorder.search("whale")],
+            ["lr-4"],
+        )
+        self.assertEqual(life_recorder.search("forget"), [])
+        self.assertEqual(life_recorder.search("cherish"), [])
+        life_recorder.close()
+
+        # The saved index matches the database and is reused.
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        index = SearchIndex.load(
+            Path(f"{self.path_to_temp_db}.search"), life_recorder._stamp
+        )
+        self.assertEqual(index.search("whale"), ["lr-4"])
+        index.close()
+        self.assertEqual(
+            [record["id"] for record in life_recorder.search("remembered")],
+            ["lr-1"],
+        )
+
+    def test_stale_index_is_rebuilt(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        life_recorder.search("note")
+
+        other_recorder = LifeRecorder(self.path_to_temp_db)
+        other_recorder.create(
+            {"tag": "sea", "title": "Whale song", "content": "Deep blue."}
+        )
+
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        self.assertEqual(len(life_recorder.search("whale")), 1)
+
+    def test_saved_index_follows_writes(self):
+        LifeRecorder(self.path_to_temp_db).search("note")
+        inode = os.stat(f"{self.path_to_temp_db}.search").st_ino
+        # Writes of other processes bring the saved index up to date.
+        LifeRecorder(self.path_to_temp_db).create(
+            {"tag": "sea", "title": "Whale song", "content": "Deep blue."}
+        )
+        LifeRecorder(self.path_to_temp_db).update(
+            "lr-1", {"tag": "tag", "title": "Remembered", "content": "Ok."}
+        )
+        LifeRecorder(self.path_to_temp_db).delete("lr-2")
+
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        with mock.patch.object(SearchIndex, "build") as build:
+            self.assertEqual(
+                [record["id"] for record in life_recorder.search("whale")],
+                ["lr-4"],
+            )
+            self.assertEqual(len(life_recorder.search("remembered")), 1)
+            self.assertEqual(life_recorder.search("cherish"), [])
+        build.assert_not_called()
+        # Writes patch the saved index rather than save it anew.
+        self.assertEqual(
+            os.stat(f"{self.path_to_temp_db}.search").st_ino, inode
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,555 @@
+import glob
+import json
+import multiprocessing
+import os
+import shutil
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+from src.life_recorder import config
+from src.life_recorder.base import LifeRecorder
+from src.life_recorder.storage import (
+    JsonStorage,
+    LogStorage,
+    ShardedStorage,
+    SqliteStorage,
+    backup_paths,
+    get_storage,
+    migrate_database,
+    write_atomic,
+)
+
+
+class TestLogStorage(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.path_to_db = "./tests/fixtures/db.json"
+        with open(cls.path_to_db, "r") as f:
+            cls.db = json.load(f)
+
+    def setUp(self) -> None:
+        self.path_to_temp_db = shutil.copy(self.path_to_db, "test_log_db.json")
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
+        return super().tearDown()
+
+    def new_note(self, title: str = "Logged") -> dict[str, str]:
+        return {"tag": "log", "title": title, "content": "Appended."}
+
+    def test_get_storage(self):
+        self.assertIs(get_storage("log"), LogStorage)
+        with self.assertRaises(ValueError):
+            get_storage("unknown")
+
+    def test_mutations_are_appended_to_log(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db, storage="log")
+        life_recorder.create(self.new_note())
+        life_recorder.update("lr-1", self.new_note("Updated"))
+        life_recorder.delete("lr-2")
+        life_recorder.close()
+
+        # The snapshot is left untouched, only the log grows.
+        with open(self.path_to_temp_db, "r") as f:
+            self.assertEqual(json.load(f), self.db)
+        with open(f"{self.path_to_temp_db}.log", "r") as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+    def test_log_is_replayed_on_load(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db, storage="log")
+        life_recorder.create(self.new_note())
+        life_recorder.update("lr-1", self.new_note("Updated"))
+        life_recorder.delete("lr-2")
+        life_recorder.close()
+
+        life_recorder = LifeRecorder(self.path_to_temp_db, storage="log")
+        self.assertEqual(life_recorder.db["last_id"], 4)
+        self.assertIn("lr-4", life_recorder.records)
+        self.assertNotIn("lr-2", life_recorder.records)
+        self.assertEqual(life_recorder.records["lr-1"]["title"], "Updated")
+
+    @patch.object(config, "LOG_COMPACT_THRESHOLD", 2)
+    def test_log_is_compacted_into_snapshot(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db, storage="log")
+        life_recorder.create(self.new_note("First"))
+        life_recorder.create(self.new_note("Second"))
+        life_recorder.create(self.new_note("Third"))
+        life_recorder.close()
+
+        with open(self.path_to_temp_db, "r") as f:
+            snapshot = json.load(f)
+        self.assertEqual(snapshot["last_id"], 5)
+        self.assertIn("lr-5", snapshot["records"])
+        self.assertFalse(
+            os.path.exists(f"{self.path_to_temp_db}.log.compacting")
+        )
+
+        life_recorder = LifeRecorder(self.path_to_temp_db, storage="log")
+        self.assertEqual(life_recorder.db["last_id"], 6)
+        self.assertEqual(life_recorder.records["lr-6"]["title"], "Third")
+
+    def test_torn_last_entry_is_dropped(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db, storage="log")
+        life_recorder.create(self.new_note())
+        life_recorder.close()
+        with open(f"{self.path_to_temp_db}.log", "a") as f:
+            f.write('{"last_id": 5, "put": {"id": "lr-5", "ti')
+
+        with patch("src.life_recorder.storage.logger"):
+            life_recorder = LifeRecorder(self.path_to_temp_db, storage="log")
+        self.assertEqual(life_recorder.db["last_id"], 4)
+        self.assertNotIn("lr-5", life_recorder.records)
+        with open(f"{self.path_to_temp_db}.log", "r") as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+
+class TestAtomicSave(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.path_to_db = "./tests/fixtures/db.json"
+        with open(cls.path_to_db, "r") as f:
+            cls.db = json.load(f)
+
+    def setUp(self) -> None:
+        self.path_to_temp_db = shutil.copy(
+            self.path_to_db, "test_atomic_db.json"
+        )
+        patcher = patch("src.life_recorder.storage.logger")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
+        return super().tearDown()
+
+    def test_failed_write_keeps_old_content(self):
+        def dump(f):
+            f.write('{"last_id": ')
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            write_atomic(Path(self.path_to_temp_db), dump)
+        with open(self.path_to_temp_db, "r") as f:
+            self.assertEqual(json.load(f), self.db)
+
+    @patch.object(config, "BACKUPS", 2)
+    def test_rolling_backups(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        for title in ("First", "Second", "Third"):
+            life_recorder.create({"tag": "", "title": title, "content": ""})
+
+        backups = backup_paths(Path(self.path_to_temp_db))
+        self.assertEqual(len(backups), 2)
+        with open(backups[0], "r") as f:
+            self.assertEqual(json.load(f)["last_id"], 5)
+        with open(backups[1], "r") as f:
+            self.assertEqual(json.load(f)["last_id"], 4)
+
+    @patch.object(config, "BACKUPS", 1)
+    def test_torn_file_is_recovered_from_backup(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        life_recorder.create({"tag": "", "title": "New", "content": ""})
+        life_recorder.delete("lr-4")
+        with open(self.path_to_temp_db, "r+") as f:
+            f.truncate(40)
+
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        self.assertEqual(life_recorder.db["last_id"], 4)
+        self.assertIn("lr-4", life_recorder.records)
+        self.assertTrue(os.path.exists(f"{self.path_to_temp_db}.corrupt"))
+        with open(self.path_to_temp_db, "r") as f:
+            self.assertEqual(json.load(f), life_recorder.db)
+
+    def test_torn_file_is_salvaged(self):
+        with open(self.path_to_temp_db, "r") as f:
+            content = f.read()
+        with open(self.path_to_temp_db, "w") as f:
+            f.write(content[: content.index('"lr-3"') + 20])
+
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        self.assertEqual(life_recorder.db["last_id"], 3)
+        self.assertEqual(list(life_recorder.records), ["lr-1", "lr-2"])
+
+    def test_empty_file_is_recovered(self):
+        open(self.path_to_temp_db, "w").close()
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        self.assertEqual(life_recorder.db, {"last_id": 0, "records": {}})
+
+
+class TestInPlaceWrites(unittest.TestCase):
+    def setUp(self) -> None:
+        self.path_to_temp_db = shutil.copy(
+            "./tests/fixtures/db.json", "test_in_place_db.json"
+        )
+        patcher = patch("src.life_recorder.storage.logger")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.life_recorder = LifeRecorder(self.path_to_temp_db)
+        # The first save rewrites the database with records in slots.
+        self.life_recorder.update("lr-1", self.new_note("First"))
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
+        return super().tearDown()
+
+    def new_note(self, title: str) -> dict[str, str]:
+        return {"tag": "patch", "title": title, "content": "In place."}
+
+    def inode(self) -> int:
+        return os.stat(self.path_to_temp_db).st_ino
+
+    def test_small_changes_are_written_in_place(self):
+        inode = self.inode()
+        size = os.path.getsize(self.path_to_temp_db)
+        self.life_recorder.update("lr-2", self.new_note("Patched"))
+        self.assertEqual(os.path.getsize(self.path_to_temp_db), size)
+        with self.life_recorder.batch():
+            self.life_recorder.create(self.new_note("Appended"))
+            self.life_recorder.create(self.new_note("Again"))
+            created = self.life_recorder.create(self.new_note("Dropped"))
+            self.life_recorder.delete(created["id"])
+        self.assertEqual(self.inode(), inode)
+
+        for lazy in (False, True):
+            life_recorder = LifeRecorder(self.path_to_temp_db, lazy=lazy)
+            self.assertEqual(life_recorder.db["last_id"], 6)
+            self.assertEqual(len(life_recorder.records), 5)
+            self.assertEqual(
+                life_recorder.read_one("lr-2")["title"], "Patched"
+            )
+            self.assertEqual(life_recorder.read_one("lr-5")["title"], "Again")
+            self.assertIsNone(life_recorder.read_one("lr-6"))
+        with open(self.path_to_temp_db, "r") as f:
+            self.assertEqual(
+                list(json.load(f)["records"]),
+                ["lr-1", "lr-2", "lr-3", "lr-4", "lr-5"],
+            )
+
+    def test_other_changes_are_saved_whole(self):
+        inode = self.inode()
+        self.life_recorder.update("lr-2", self.new_note("Grown" * 100))
+        self.assertNotEqual(self.inode(), inode)
+
+    def test_deletions_are_blanked_in_place(self):
+        def assertRecords(identifiers: list[str]) -> None:
+            with open(self.path_to_temp_db, "r") as f:
+                self.assertEqual(list(json.load(f)["records"]), identifiers)
+            for lazy in (False, True):
+                life_recorder = LifeRecorder(self.path_to_temp_db, lazy=lazy)
+                self.assertEqual(list(life_recorder.records), identifiers)
+
+        inode = self.inode()
+        size = os.path.getsize(self.path_to_temp_db)
+        with self.life_recorder.batch():
+            for _ in range(4):
+                self.life_recorder.create(self.new_note("Appended"))
+        self.life_recorder.delete("lr-3")
+        assertRecords(["lr-1", "lr-2", "lr-4", "lr-5", "lr-6", "lr-7"])
+        # Runs of records, at the start and at the end of the file.
+        with self.life_recorder.batch():
+            for identifier in ("lr-1", "lr-2", "lr-6", "lr-7"):
+                self.life_recorder.delete(identifier)
+        assertRecords(["lr-4", "lr-5"])
+        with self.life_recorder.batch():
+            self.life_recorder.delete("lr-4")
+            self.life_recorder.delete("lr-5")
+            self.life_recorder.create(self.new_note("Only"))
+        assertRecords(["lr-8"])
+        self.assertEqual(self.inode(), inode)
+        self.assertGreater(os.path.getsize(self.path_to_temp_db), size)
+        self.assertIsNone(LifeRecorder(self.path_to_temp_db).read_one("lr-4"))
+
+        # A full save drops the blanked space.
+        size = os.path.getsize(self.path_to_temp_db)
+        self.life_recorder.update("lr-8", self.new_note("Grown" * 20))
+        self.assertNotEqual(self.inode(), inode)
+        self.assertLess(os.path.getsize(self.path_to_temp_db), size)
+        assertRecords(["lr-8"])
+
+    def test_interrupted_write_is_replayed(self):
+        with patch(
+            "src.life_recorder.storage.apply_patches",
+            side_effect=KeyboardInterrupt,
+        ):
+            with self.assertRaises(KeyboardInterrupt):
+                self.life_recorder.update("lr-2", self.new_note("Journaled"))
+        self.assertTrue(os.path.exists(f"{self.path_to_temp_db}.journal"))
+
+        # Readers apply the journal in memory, they hold only a shared lock.
+        for lazy in (False, True):
+            life_recorder = LifeRecorder(self.path_to_temp_db, lazy=lazy)
+            self.assertEqual(
+                life_recorder.read_one("lr-2")["title"], "Journaled"
+            )
+        self.assertTrue(os.path.exists(f"{self.path_to_temp_db}.journal"))
+
+        life_recorder.update("lr-3", self.new_note("Written"))
+        self.assertFalse(os.path.exists(f"{self.path_to_temp_db}.journal"))
+        life_recorder = LifeRecorder(self.path_to_temp_db, lazy=True)
+        self.assertEqual(life_recorder.read_one("lr-2")["title"], "Journaled")
+        self.assertEqual(life_recorder.read_one("lr-3")["title"], "Written")
+
+    def test_incomplete_journal_is_dropped(self):
+        with open(f"{self.path_to_temp_db}.journal", "wb") as f:
+            f.write(b"\x00" * 7)
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        self.assertEqual(life_recorder.read_one("lr-1")["title"], "First")
+        life_recorder.update("lr-2", self.new_note("Written"))
+        self.assertFalse(os.path.exists(f"{self.path_to_temp_db}.journal"))
+
+
+class TestSqliteStorage(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.path_to_db = "./tests/fixtures/db.json"
+        with open(cls.path_to_db, "r") as f:
+            cls.db = json.load(f)
+
+    def setUp(self) -> None:
+        self.path_to_temp_db = "test_sqlite_db.db"
+        storage = SqliteStorage(Path(self.path_to_temp_db))
+        storage.init()
+        migrate_database(JsonStorage(Path(self.path_to_db)), storage)
+        storage.close()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
+        return super().tearDown()
+
+    def test_migrated_records_are_loaded(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db, storage="sqlite")
+        self.assertEqual(life_recorder.db["last_id"], 3)
+        self.assertEqual(dict(life_recorder.records), self.db["records"])
+        self.assertEqual(
+            list(life_recorder.read().values()),
+            list(self.db["records"].values()),
+        )
+        life_recorder.close()
+
+    def test_read_one(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db, storage="sqlite")
+        self.assertEqual(
+            life_recorder.read_one("lr-2"), self.db["records"]["lr-2"]
+        )
+        self.assertIsNone(life_recorder.read_one("non_existent"))
+        life_recorder.close()
+
+    def test_mutations_persist(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db, storage="sqlite")
+        life_recorder.create({"tag": "sql", "title": "New", "content": "Row"})
+        life_recorder.update(
+            "lr-1", {"tag": "sql", "title": "Updated", "content": "Row"}
+        )
+        life_recorder.delete("lr-2")
+        life_recorder.close()
+
+        life_recorder = LifeRecorder(self.path_to_temp_db, storage="sqlite")
+        self.assertEqual(life_recorder.db["last_id"], 4)
+        self.assertEqual(list(life_recorder.records), ["lr-1", "lr-3", "lr-4"])
+        self.assertEqual(life_recorder.records["lr-1"]["title"], "Updated")
+        self.assertEqual(
+            life_recorder.records["lr-1"]["timestamp"],
+            self.db["records"]["lr-1"]["timestamp"],
+        )
+        with self.assertRaises(ValueError):
+            life_recorder.delete("lr-2")
+        life_recorder.close()
+
+    def test_write_behind_keeps_changes_of_failed_batch(self):
+        life_recorder = LifeRecorder(
+            self.path_to_temp_db, storage="sqlite", write_behind=True
+        )
+        life_recorder.create({"tag": "sql", "title": "Kept", "content": ""})
+        with self.assertRaises(ValueError):
+            life_recorder.delete_many(["lr-1", "non_existent"])
+        life_recorder.close()
+
+        life_recorder = LifeRecorder(self.path_to_temp_db, storage="sqlite")
+        self.assertEqual(life_recorder.db["last_id"], 4)
+        self.assertEqual(
+            list(life_recorder.records), ["lr-1", "lr-2", "lr-3", "lr-4"]
+        )
+        life_recorder.close()
+
+
+class TestShardedStorage(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.path_to_db = "./tests/fixtures/db.json"
+        with open(cls.path_to_db, "r") as f:
+            cls.db = json.load(f)
+        cls.db["records"]["lr-4"] = {
+            "id": "lr-4",
+            "timestamp": "02-Sep-2025 09:15",
+            "tag": "hi",
+            "title": "Note of September",
+            "content": "",
+        }
+        cls.db["last_id"] = 4
+
+    def setUp(self) -> None:
+        self.directory = Path("test_sharded_db")
+        self.path_to_temp_db = str(self.directory / "manifest.json")
+        storage = ShardedStorage(Path(self.path_to_temp_db))
+        storage.init()
+        storage.save(self.db)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+        return super().tearDown()
+
+    def open(self, **kwargs) -> LifeRecorder:
+        return LifeRecorder(self.path_to_temp_db, storage="sharded", **kwargs)
+
+    def test_records_are_split_by_month(self):
+        self.assertEqual(
+            sorted(path.name for path in self.directory.glob("2*")),
+            ["2025-08.json", "2025-09.json"],
+        )
+        life_recorder = self.open()
+        self.assertEqual(life_recorder.db["last_id"], 4)
+        self.assertEqual(len(life_recorder.records), 4)
+        self.assertEqual(dict(life_recorder.records), self.db["records"])
+
+    def test_shards_are_read_when_accessed(self):
+        life_recorder = self.open()
+        self.assertEqual(life_recorder.records.shards, {})
+        self.assertEqual(
+            life_recorder.read_one("lr-4"), self.db["records"]["lr-4"]
+        )
+        self.assertEqual(list(life_recorder.records.shards), ["2025-09"])
+        self.assertIsNone(life_recorder.read_one("lr-9"))
+        self.assertEqual(list(life_recorder.records.shards), ["2025-09"])
+
+        life_recorder = self.open()
+        self.assertEqual(
+            list(life_recorder.read(since=datetime(2025, 8, 11))),
+            ["lr-2", "lr-4"],
+        )
+        self.assertEqual(list(life_recorder.read(tag="hi")), ["lr-3", "lr-4"])
+        self.assertEqual(list(life_recorder.read(tag="hi", limit=1)), ["lr-3"])
+        life_recorder = self.open()
+        self.assertEqual(
+            list(life_recorder.read(since=datetime(2025, 9, 1))), ["lr-4"]
+        )
+        self.assertEqual(list(life_recorder.records.shards), ["2025-09"])
+
+    def test_only_changed_shards_are_written(self):
+        august = self.directory / "2025-08.json"
+        september = self.directory / "2025-09.json"
+        written = os.stat(august).st_ino
+
+        life_recorder = self.open()
+        life_recorder.update(
+            "lr-4", {"tag": "hi", "title": "Updated", "content": ""}
+        )
+        self.assertEqual(os.stat(august).st_ino, written)
+
+        life_recorder.delete("lr-4")
+        self.assertFalse(september.exists())
+        created = life_recorder.create(
+            {"tag": "", "title": "New", "content": ""}
+        )
+        life_recorder.close()
+
+        life_recorder = self.open()
+        self.assertEqual(life_recorder.db["last_id"], 5)
+        self.assertEqual(
+            sorted(life_recorder.records), ["lr-1", "lr-2", "lr-3", "lr-5"]
+        )
+        self.assertEqual(life_recorder.read_one("lr-5"), created)
+        self.assertEqual(os.stat(august).st_ino, written)
+
+    def test_write_behind_keeps_changes_of_failed_batch(self):
+        life_recorder = self.open(write_behind=True)
+        life_recorder.update(
+            "lr-1", {"tag": "", "title": "Kept", "content": ""}
+        )
+        with self.assertRaises(ValueError):
+            life_recorder.delete_many(["lr-2", "non_existent"])
+        life_recorder.close()
+
+        life_recorder = self.open()
+        self.assertEqual(len(life_recorder.records), 4)
+        self.assertEqual(life_recorder.read_one("lr-1")["title"], "Kept")
+
+
+def create_notes(path_to_db: str, storage: str, count: int) -> None:
+    life_recorder = LifeRecorder(path_to_db, storage=storage)
+    for number in range(count):
+        life_recorder.create({"tag": "", "title": str(number), "content": ""})
+    life_recorder.close()
+
+
+class TestConcurrentAccess(unittest.TestCase):
+    def setUp(self) -> None:
+        self.path_to_temp_db = shutil.copy(
+            "./tests/fixtures/db.json", "test_concurrent_db.json"
+        )
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
+        return super().tearDown()
+
+    def test_changes_of_other_instance_are_seen(self):
+        first = LifeRecorder(self.path_to_temp_db)
+        second = LifeRecorder(self.path_to_temp_db)
+        self.assertFalse(second.refresh())
+
+        first.create({"tag": "", "title": "First", "content": ""})
+        self.assertEqual(second.read_one("lr-4")["title"], "First")
+        self.assertFalse(second.refresh())
+
+        second.create({"tag": "", "title": "Second", "content": ""})
+        second.update("lr-1", {"tag": "", "title": "Updated", "content": ""})
+        self.assertEqual(len(first.read()), 5)
+        self.assertEqual(first.read_one("lr-5")["title"], "Second")
+        self.assertEqual(first.search("updated")[0]["id"], "lr-1")
+
+        first.delete("lr-5")
+        with self.assertRaises(ValueError):
+            second.delete("lr-5")
+
+    def test_concurrent_processes_dont_lose_changes(self):
+        try:
+            context = multiprocessing.get_context("fork")
+        except ValueError:
+            self.skipTest("Processes can't be forked on this platform")
+
+        for storage in ("json", "log"):
+            with self.subTest(storage=storage):
+                path_to_db = shutil.copy(
+                    self.path_to_temp_db, f"{self.path_to_temp_db}.{storage}"
+                )
+                processes = [
+                    context.Process(
+                        target=create_notes, args=(path_to_db, storage, 20)
+                    )
+                    for _ in range(4)
+                ]
+                for process in processes:
+                    process.start()
+                for process in processes:
+                    process.join()
+
+                life_recorder = LifeRecorder(path_to_db, storage=storage)
+                self.assertEqual(len(life_recorder.records), 83)
+                self.assertEqual(life_recorder.db["last_id"], 83)
+                life_recorder.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import glob
+import io
+import json
+import os
+import shutil
+import unittest
+from unittest.mock import patch
+
+from src.life_recorder.base import LifeRecorder
+from src.life_recorder.transfer import (
+    guess_format,
+    import_records,
+    read_records,
+    write_records,
+)
+
+
+class TestTransfer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.path_to_db = "./tests/fixtures/db.json"
+        with open(cls.path_to_db, "r") as f:
+            cls.db = json.load(f)
+
+    def setUp(self) -> None:
+        self.path_to_temp_db = shutil.copy(
+            self.path_to_db, "test_transfer_db.json"
+        )
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        for path in glob.glob(f"{self.path_to_temp_db}*"):
+            os.remove(path)
+        return super().tearDown()
+
+    def test_guess_format(self):
+        self.assertEqual(guess_format("notes.csv"), "csv")
+        self.assertEqual(guess_format("notes.ndjson"), "ndjson")
+        self.assertEqual(guess_format("notes.jsonl"), "ndjson")
+        with self.assertRaises(ValueError):
+            guess_format("notes.txt")
+
+    def test_round_trip(self):
+        records = list(self.db["records"].values())
+        for file_format in ("ndjson", "csv"):
+            f = io.StringIO()
+            progress = []
+            count = write_records(
+                records, f, file_format, chunk_size=2, progress=progress.append
+            )
+            self.assertEqual(count, 3)
+            self.assertEqual(progress, [2, 3])
+
+            f.seek(0)
+            self.assertEqual(list(read_records(f, file_format)), records)
+
+    def test_import_records(self):
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        records = [
+            {"tag": "a", "title": f"Note {i}", "content": "...", "id": "x"}
+            for i in range(5)
+        ]
+        records[0]["timestamp"] = "01-Jan-2020 10:00"
+
+        with patch.object(
+            life_recorder, "_save_database", wraps=life_recorder._save_database
+        ) as save_database:
+            count = import_records(life_recorder, records, chunk_size=2)
+        self.assertEqual(count, 5)
+        self.assertEqual(save_database.call_count, 3)
+
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        self.assertEqual(life_recorder.db["last_id"], 8)
+        self.assertEqual(
+            [life_recorder.records[f"lr-{i}"]["title"] for i in range(4, 9)],
+            [f"Note {i}" for i in range(5)],
+        )
+        self.assertEqual(
+            life_recorder.records["lr-4"]["timestamp"], "01-Jan-2020 10:00"
+        )
+        self.assertEqual(life_recorder.records["lr-5"]["id"], "lr-5")
+
+    def test_import_rejects_invalid_lines(self):
+        f = io.StringIO('{"title": "Ok"}\n[1, 2]\n')
+        life_recorder = LifeRecorder(self.path_to_temp_db)
+        with self.assertRaises(ValueError):
+            import_records(life_recorder, read_records(f, "ndjson"))
+        self.assertEqual(life_recorder.db, self.db)
+
+
+if __name__ == "__main__":
+    unittest.main()